@@ -1,180 +1,1189 @@
+import os
+import time
 import uuid
 import logging
-from crypto_utils import CryptoManager
+import threading
+from datetime import date, datetime
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from dataclasses import replace
+from itertools import islice
+import numpy as np
+from crypto_utils import CryptoManager, derive_password_hash
 from database import Database
-from models import User, Account
+from end_of_day import EndOfDayPolicy, compute_postings, posting_time
+from export import FORMATS, ledger_chunks, write_export
+from logging_setup import lazy
+from metrics import (METRICS, DENIED, ERROR, INSUFFICIENT_FUNDS, INVALID, UNKNOWN_USER, VELOCITY_LIMIT,
+                     instrumented, note_outcome)
+from models import SCHEDULE_INTERVALS, User, Account, ScheduledPayment, to_epoch
+from money import format_cents
+from reconcile import reconcile
+from sessions import Session, SessionManager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from velocity import VelocityLimits, VelocityRule
+
+ROLES = ("client", "employee", "admin")
 
 # ========== LOGGING CONFIGURATION ==========
-logging.basicConfig(level=logging.INFO)
+# Handlers are set up by the entry points (logging_setup.configure_logging), not on import
 logger = logging.getLogger(__name__)
 
+
+def _hash_row(password: str, salt: bytes) -> Tuple[Optional[bytes], Optional[str]]:
+    """(password hash, None), or (None, error) if hashing fails; run on a process pool by register_users_bulk."""
+    try:
+        return derive_password_hash(password, salt), None
+    except Exception as e:
+        return None, f"Error hashing password: {e}"
+
 class BankingSystem:
-    """A simple banking system for user management, transactions, and account handling."""
+    """A simple banking system for user management, transactions, and account handling.
 
-    def __init__(self):
+    Any number of users can be logged in at once: login() returns a Session
+    that is passed to every operation. Its signed token can be exchanged for
+    the session again with get_session(), so stateless front-ends only pay
+    for PBKDF2 on the first login. All operations are thread-safe;
+    balance changes hold a lock per account, and two-account transfers take
+    both locks in account ID order so concurrent transfers cannot deadlock.
+    Optional velocity rules (see velocity.py) cap how much clients may send
+    or receive per rolling window. Every public operation is timed and counted by outcome (see metrics.py).
+    """
+
+    def __init__(self, db: Optional[Database] = None, session_key: Optional[bytes] = None,
+                 session_ttl: float = 3600.0, velocity_rules: Iterable[VelocityRule] = ()):
         """Initialize the banking system with encryption and database handling."""
-        self.crypto = CryptoManager()
-        self.db = Database()
-        self.current_user = None  # Stores the currently logged-in user
-    
+        self.db = db if db is not None else Database()
+        # Keys live next to the data so stored descriptions stay decryptable across restarts
+        self.crypto = CryptoManager(os.path.join(self.db.data_dir, "keyring.json"))
+        self.sessions = SessionManager(session_key, ttl=session_ttl)
+        self._users_lock = threading.Lock()  # Guards username checks during registration and role changes
+        self._account_locks: Dict[str, threading.Lock] = {}
+        self._account_locks_guard = threading.Lock()
+        self._reencryption: Optional[threading.Thread] = None
+        self._reencrypt_again = False  # Set when the key is rotated during a re-encryption pass
+        self._scheduler_lock = threading.Lock()  # One tick at a time; schedule changes wait for it
+        self._scheduler: Optional[threading.Thread] = None
+        self._scheduler_stop = threading.Event()
+        self._end_of_day_lock = threading.Lock()  # One end-of-day run at a time
+        self.velocity = VelocityLimits(velocity_rules)
+        if self.velocity.rules:
+            start = time.perf_counter()
+            # items() lets the sharded engine scan without filling its cache
+            read = self.velocity.rebuild((account for _, account in self.db.accounts.items()), time.time())
+            logger.info("✅ Velocity windows rebuilt from %s recent ledger entries in %.3fs.", read,
+                        time.perf_counter() - start)
+
+    # ========== LOCKING ==========
+
+    def _account_lock(self, account_id: str) -> threading.Lock:
+        """Returns the lock guarding an account's balance and ledger."""
+        lock = self._account_locks.get(account_id)
+        if lock is None:
+            with self._account_locks_guard:
+                lock = self._account_locks.setdefault(account_id, threading.Lock())
+        return lock
+
+    def _lock_accounts(self, *account_ids: str) -> ExitStack:
+        """Acquires the locks of several accounts in a global (sorted) order.
+
+        Whatever is changed in the accounts while they are locked reaches
+        read views as one version, when the locks are released.
+        """
+        account_ids = sorted(set(account_ids))
+        with ExitStack() as stack:  # Releases what was taken if anything fails on the way
+            for account_id in account_ids:
+                stack.enter_context(self._account_lock(account_id))
+            stack.enter_context(self.db.versioned(*account_ids))
+            return stack.pop_all()
+
     # ========== USER MANAGEMENT ==========
-    
+
+    @instrumented("bank")
     def register_user(self, username: str, password: str, role: str = "client") -> bool:
         """Registers a new user. If the role is 'client', an account is created."""
-        
+
         # Basic input validation
-        if not username or not password:
+        if not username or not password or not isinstance(username, str) or not isinstance(password, str):
             logger.warning("❌ Registration failed: Username and password are required.")
+            note_outcome(INVALID)
             return False
 
         if username in self.db.users:
-            logger.warning(f"❌ Registration failed: Username '{username}' already exists.")
+            logger.warning("❌ Registration failed: Username '%s' already exists.", username)
+            note_outcome(INVALID)
             return False
 
         # Secure password hashing
         try:
             password_hash, salt = self.crypto.hash_password(password)
         except Exception as e:
-            logger.error(f"❌ Error hashing password: {e}")
+            logger.error("❌ Error hashing password: %s", e)
+            note_outcome(ERROR)
             return False
 
         # Create the user
         user = User(username=username, password_hash=password_hash, salt=salt, role=role)
 
-        # If the user is a client, create a bank account
-        if role == "client":
-            account_id = str(uuid.uuid4())
-            account = Account(account_id=account_id, owner_username=username, balance=0.0, transactions=[])
-            user.account_id = account_id
-            self.db.accounts[account_id] = account
-            logger.info(f"✅ Account created for '{username}' with ID {account_id}")
-
-        # Store user in the database
-        self.db.users[username] = user
-        self.db.save_data()
-        logger.info(f"✅ User '{username}' registered successfully.")
+        with self._users_lock:
+            # Re-check: another thread may have registered the name while we were hashing
+            if username in self.db.users:
+                logger.warning("❌ Registration failed: Username '%s' already exists.", username)
+                note_outcome(INVALID)
+                return False
+
+            # If the user is a client, create a bank account
+            if role == "client":
+                account_id = str(uuid.uuid4())
+                account = Account(account_id=account_id, owner_username=username, balance=0, transactions=[])
+                user.account_id = account_id
+                self.db.put_account(account)
+                logger.info("✅ Account created for '%s' with ID %s", username, account_id)
+
+            # Store user in the database
+            self.db.put_user(user)
+            self.db.commit()
+        logger.info("✅ User '%s' registered successfully.", username,
+                    extra={"event": "register", "username": username, "role": role})
         return True
 
-    def login(self, username: str, password: str) -> bool:
-        """Authenticates a user by verifying credentials."""
-        
+    @instrumented("bank")
+    def register_users_bulk(self, rows: Iterable[dict], workers: Optional[int] = None, chunk_size: int = 1000,
+                            progress: Optional[Callable[[int, int], None]] = None) -> dict:
+        """Registers many users at once, e.g. when onboarding a migrated customer base.
+
+        Each row is a dict with 'username', 'password' and an optional 'role',
+        all strings.
+        Rows are consumed in chunks: password hashes are derived on a process
+        pool using every core, account IDs are generated in one batch, and
+        each chunk is persisted with a single commit. Invalid rows are
+        reported instead of aborting the import.
+
+        Returns {"registered": <count>, "errors": [{"row", "username", "error"}, ...]}.
+        `progress`, if given, is called with (rows processed, users registered)
+        after every chunk.
+        """
+        registered = 0
+        errors: List[dict] = []
+        processed = 0
+        rows = iter(rows)
+
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+
+                # Validate before spending any CPU on hashing
+                valid = []
+                seen = set()
+                for offset, row in enumerate(chunk):
+                    row_number = processed + offset + 1
+                    if not isinstance(row, dict):
+                        errors.append({"row": row_number, "username": None, "error": "Row must be an object."})
+                        continue
+                    username = row.get("username") or ""
+                    password = row.get("password") or ""
+                    role = row.get("role") or "client"
+                    if not all(isinstance(value, str) for value in (username, password, role)):
+                        errors.append({"row": row_number, "username": username if isinstance(username, str) else None,
+                                       "error": "Username, password and role must be strings."})
+                        continue
+                    username, role = username.strip(), role.strip().lower()
+                    if not username or not password:
+                        error = "Username and password are required."
+                    elif role not in ROLES:
+                        error = f"Invalid role '{role}'."
+                    elif username in seen or username in self.db.users:
+                        error = f"Username '{username}' already exists."
+                    else:
+                        seen.add(username)
+                        valid.append((row_number, username, password, role))
+                        continue
+                    errors.append({"row": row_number, "username": username, "error": error})
+                processed += len(chunk)
+
+                salts = [os.urandom(16) for _ in valid]
+                # Hashed in full before taking the lock, so registrations and role changes are not held up
+                hashes = list(pool.map(_hash_row, [v[2] for v in valid], salts,
+                                       chunksize=max(1, len(valid) // (4 * (workers or os.cpu_count() or 1)))))
+
+                # Account IDs for the whole chunk from a single call to the OS random source
+                random_bytes = os.urandom(16 * len(valid))
+                account_ids = [str(uuid.UUID(bytes=random_bytes[i * 16:(i + 1) * 16], version=4))
+                               for i in range(len(valid))]
+
+                with self._users_lock:
+                    for (row_number, username, _, role), (password_hash, error), salt, account_id in zip(
+                            valid, hashes, salts, account_ids):
+                        if error is not None:
+                            errors.append({"row": row_number, "username": username, "error": error})
+                            continue
+                        if username in self.db.users:  # Registered concurrently while we were hashing
+                            errors.append({"row": row_number, "username": username,
+                                           "error": f"Username '{username}' already exists."})
+                            continue
+                        user = User(username=username, password_hash=password_hash, salt=salt, role=role)
+                        if role == "client":
+                            user.account_id = account_id
+                            self.db.put_account(Account(account_id=account_id, owner_username=username,
+                                                        balance=0, transactions=[]))
+                        self.db.put_user(user)
+                        registered += 1
+                    self.db.commit()
+
+                logger.info("✅ Bulk registration: %s rows processed, %s users registered.", processed, registered)
+                if progress:
+                    progress(processed, registered)
+
+        return {"registered": registered, "errors": errors}
+
+    @instrumented("bank")
+    def login(self, username: str, password: str) -> Optional[Session]:
+        """Authenticates a user by verifying credentials and opens a session."""
+
         if username not in self.db.users:
             logger.warning("❌ Login failed: Username not found.")
-            return False
+            note_outcome(UNKNOWN_USER)
+            return None
 
         user = self.db.users[username]
 
         try:
             password_hash, _ = self.crypto.hash_password(password, user.salt)
         except Exception as e:
-            logger.error(f"❌ Error hashing password during login: {e}")
-            return False
+            logger.error("❌ Error hashing password during login: %s", e)
+            note_outcome(ERROR)
+            return None
 
         if password_hash == user.password_hash:
-            self.current_user = user
-            logger.info(f"✅ User '{username}' logged in successfully.")
-            return True
+            session = self.sessions.issue(user)
+            logger.info("✅ User '%s' logged in successfully.", username,
+                        extra={"event": "login", "username": username})
+            return session
 
         logger.warning("❌ Login failed: Incorrect password.")
-        return False
+        note_outcome(DENIED)
+        return None
+
+    @instrumented("bank")
+    def logout(self, session: Session):
+        """Ends a session; its token is rejected from now on."""
+        self.sessions.revoke(session)
+
+    @instrumented("bank")
+    def get_session(self, token: str) -> Optional[Session]:
+        """Resolves a session token without re-running the password KDF."""
+        session = self.sessions.verify(token, self.db.users.get)
+        if session is None:
+            note_outcome(DENIED)
+        return session
+
+    def _authorized(self, session: Optional[Session], role: str) -> bool:
+        """Checks that a session is active and belongs to a user with the given role."""
+        return (session is not None and self.sessions.is_active(session)
+                and session.user.role == role)
+
+    @staticmethod
+    def _valid_amount(amount) -> bool:
+        """Amounts are positive integer cents; floats are rejected rather than rounded."""
+        return isinstance(amount, int) and not isinstance(amount, bool) and amount > 0
 
     # ========== TRANSACTIONS ==========
-    
-    def transfer_money(self, recipient_username: str, amount: float, description: str) -> bool:
-        """Transfers money between accounts."""
 
-        if not self.current_user or self.current_user.role != 'client':
+    @instrumented("bank")
+    def transfer_money(self, session: Session, recipient_username: str, amount: int, description: str) -> bool:
+        """Transfers `amount` cents between accounts."""
+
+        if not self._authorized(session, "client"):
             logger.warning("❌ Transfer failed: User is not a client or not logged in.")
+            note_outcome(DENIED)
             return False
 
-        if recipient_username not in self.db.users:
-            logger.warning(f"❌ Transfer failed: Recipient '{recipient_username}' not found.")
+        if not self._valid_amount(amount):
+            logger.warning("❌ Transfer failed: Invalid amount %r.", amount)
+            note_outcome(INVALID)
             return False
 
-        sender_account = self.db.accounts[self.current_user.account_id]
-        recipient_account = self.db.accounts[self.db.users[recipient_username].account_id]
+        if recipient_username not in self.db.users:
+            logger.warning("❌ Transfer failed: Recipient '%s' not found.", recipient_username)
+            note_outcome(UNKNOWN_USER)
+            return False
 
-        if sender_account.balance < amount:
-            logger.warning("❌ Transfer failed: Insufficient funds.")
+        sender_id = session.user.account_id
+        recipient_id = self.db.users[recipient_username].account_id
+        if not recipient_id:
+            logger.warning("❌ Transfer failed: Recipient '%s' has no account.", recipient_username)
+            note_outcome(UNKNOWN_USER)
             return False
 
         # Encrypt transaction description but keep plaintext for UI
         encrypted_description = self.crypto.encrypt_data(description).hex()
 
-        # Record transactions for both parties
-        sender_account.add_transaction(amount, "debit", {
-            "plaintext": description,
-            "encrypted": encrypted_description
-        })
-        recipient_account.add_transaction(amount, "credit", {
-            "plaintext": description,
-            "encrypted": encrypted_description
-        })
-
-        self.db.save_data()
-        logger.info(f"✅ Transfer completed: ${amount:.2f} from '{self.current_user.username}' to '{recipient_username}'.")
+        with self._lock_accounts(sender_id, recipient_id):
+            sender_account = self.db.accounts[sender_id]
+            recipient_account = self.db.accounts[recipient_id]
+
+            if sender_account.balance < amount:
+                logger.warning("❌ Transfer failed: Insufficient funds.")
+                note_outcome(INSUFFICIENT_FUNDS)
+                return False
+
+            now = time.time()
+            rule = self.velocity.check(sender_id, ((recipient_id, amount),), now)
+            if rule is not None:
+                logger.warning("❌ Transfer failed: Velocity limit '%s' reached.", rule.name)
+                note_outcome(VELOCITY_LIMIT)
+                return False
+            self.velocity.record(sender_id, ((recipient_id, amount),), now)
+
+            # Record transactions for both parties
+            debit = sender_account.add_transaction(amount, "debit", {
+                "plaintext": description,
+                "encrypted": encrypted_description
+            })
+            self.db.log_transaction(sender_account, debit)
+            credit = recipient_account.add_transaction(amount, "credit", {
+                "plaintext": description,
+                "encrypted": encrypted_description
+            })
+            self.db.log_transaction(recipient_account, credit)
+
+            # Committed under the locks so each account's records reach storage in ledger order
+            self.db.commit()
+        logger.info("✅ Transfer completed: $%s from '%s' to '%s'.", lazy(format_cents, amount), session.username,
+                    recipient_username, extra={"event": "transfer", "sender": session.username,
+                                               "recipient": recipient_username, "amount_cents": amount})
         return True
 
+    @instrumented("bank")
+    def transfer_batch(self, session: Session, transfers: Iterable[dict]) -> dict:
+        """Makes many transfers from the session's account as one all-or-nothing unit (e.g. a payroll run).
+
+        Each transfer is a dict with 'recipient', 'amount' (cents) and an
+        optional 'description'. Every recipient and amount is validated up
+        front and the total is checked against the sender's balance once;
+        descriptions are encrypted in one batch. All ledger entries are then
+        applied under the locks of every involved account and persisted with
+        a single commit, which storage writes atomically. If anything is
+        invalid, nothing is transferred.
+
+        Returns {"ok": bool, "transferred": <count>, "total": <cents>,
+        "errors": [{"index", "recipient", "error"}, ...]}.
+        """
+        transfers = list(transfers)
+        result = {"ok": False, "transferred": 0, "total": 0, "errors": []}
+        if not self._authorized(session, "client"):
+            logger.warning("❌ Batch transfer failed: User is not a client or not logged in.")
+            note_outcome(DENIED)
+            result["errors"].append({"index": None, "recipient": None, "error": "Not authorized."})
+            return result
+
+        recipient_ids = []
+        for index, transfer in enumerate(transfers):
+            recipient = transfer.get("recipient")
+            user = self.db.users.get(recipient) if recipient else None
+            if not self._valid_amount(transfer.get("amount")):
+                error = f"Invalid amount {transfer.get('amount')!r}."
+            elif user is None:
+                error = f"Recipient '{recipient}' not found."
+            elif not user.account_id:
+                error = f"Recipient '{recipient}' has no account."
+            else:
+                recipient_ids.append(user.account_id)
+                continue
+            result["errors"].append({"index": index, "recipient": recipient, "error": error})
+        if result["errors"] or not transfers:
+            logger.warning("❌ Batch transfer failed: %s invalid transfers.", len(result['errors']))
+            note_outcome(INVALID)
+            return result
+
+        total = sum(transfer["amount"] for transfer in transfers)
+        descriptions = [(transfer.get("description") or "").strip() for transfer in transfers]
+        # Payroll runs repeat a handful of descriptions; each distinct one is encrypted once
+        distinct = list(dict.fromkeys(descriptions))
+        encrypted = dict(zip(distinct, (token.hex() for token in self.crypto.encrypt_many(distinct))))
+
+        sender_id = session.user.account_id
+        with self._lock_accounts(sender_id, *recipient_ids):
+            sender_account = self.db.accounts[sender_id]
+            if sender_account.balance < total:
+                logger.warning("❌ Batch transfer failed: Insufficient funds for $%s.", lazy(format_cents, total))
+                note_outcome(INSUFFICIENT_FUNDS)
+                result["errors"].append({"index": None, "recipient": None, "error": "Insufficient funds."})
+                return result
+
+            now = time.time()
+            amounts = [(recipient_id, transfer["amount"]) for transfer, recipient_id in zip(transfers, recipient_ids)]
+            rule = self.velocity.check(sender_id, amounts, now)
+            if rule is not None:
+                logger.warning("❌ Batch transfer failed: Velocity limit '%s' reached.", rule.name)
+                note_outcome(VELOCITY_LIMIT)
+                result["errors"].append({"index": None, "recipient": None,
+                                         "error": f"Velocity limit '{rule.name}' reached."})
+                return result
+            self.velocity.record(sender_id, amounts, now)
+
+            for transfer, recipient_id, description in zip(transfers, recipient_ids, descriptions):
+                entry = {"plaintext": description, "encrypted": encrypted[description]}
+                debit = sender_account.add_transaction(transfer["amount"], "debit", entry)
+                self.db.log_transaction(sender_account, debit)
+                recipient_account = self.db.accounts[recipient_id]
+                credit = recipient_account.add_transaction(transfer["amount"], "credit", entry)
+                self.db.log_transaction(recipient_account, credit)
+            self.db.commit()
+
+        logger.info("✅ Batch transfer completed: %s transfers totalling $%s from '%s'.", len(transfers),
+                    lazy(format_cents, total), session.username,
+                    extra={"event": "batch_transfer", "sender": session.username, "transfers": len(transfers),
+                           "amount_cents": total})
+        result.update(ok=True, transferred=len(transfers), total=total)
+        return result
+
+    @instrumented("bank")
+    def get_balance(self, session: Session) -> Optional[int]:
+        """Returns the balance, in cents, of a logged-in client's own account."""
+
+        if not self._authorized(session, "client"):
+            logger.warning("❌ Balance lookup failed: User is not a client or not logged in.")
+            note_outcome(DENIED)
+            return None
+
+        account = self.db.accounts.get(session.user.account_id)
+        if account is None:
+            note_outcome(UNKNOWN_USER)
+            return None
+        return account.balance
+
+    # ========== SCHEDULED PAYMENTS ==========
+
+    @instrumented("bank")
+    def schedule_payment(self, session: Session, recipient_username: str, amount: int, first_run,
+                         interval: Optional[str] = None, description: str = "",
+                         day: Optional[int] = None) -> Optional[str]:
+        """Schedules a transfer of `amount` cents at `first_run` (a datetime or timestamp string).
+
+        With an interval ("daily", "weekly" or "monthly") it repeats until
+        cancelled. Monthly payments fall on `day` of each month (by default
+        the day of first_run); 31 means the last day of every month.
+        Returns the schedule ID, or None if the request is not allowed.
+        """
+
+        if not self._authorized(session, "client"):
+            logger.warning("❌ Scheduling failed: User is not a client or not logged in.")
+            note_outcome(DENIED)
+            return None
+
+        if not self._valid_amount(amount) or interval not in (None,) + SCHEDULE_INTERVALS:
+            logger.warning("❌ Scheduling failed: Invalid amount %r or interval %r.", amount, interval)
+            note_outcome(INVALID)
+            return None
+
+        recipient = self.db.users.get(recipient_username)
+        if recipient is None or not recipient.account_id:
+            logger.warning("❌ Scheduling failed: Recipient '%s' not found or has no account.", recipient_username)
+            note_outcome(UNKNOWN_USER)
+            return None
+
+        try:
+            next_run = to_epoch(first_run)
+        except (TypeError, ValueError):
+            logger.warning("❌ Scheduling failed: Invalid first run %r.", first_run)
+            note_outcome(INVALID)
+            return None
+        day = datetime.fromtimestamp(next_run).day if day is None else day
+        if not 1 <= day <= 31:
+            logger.warning("❌ Scheduling failed: Invalid day of the month %r.", day)
+            note_outcome(INVALID)
+            return None
+
+        schedule = ScheduledPayment(uuid.uuid4().hex, session.username, recipient_username, amount,
+                                    description.strip(), next_run, interval, day)
+        with self._scheduler_lock:
+            self.db.put_schedule(schedule)
+            self.db.commit()
+        logger.info("✅ Payment of $%s from '%s' to '%s' scheduled (%s).", lazy(format_cents, amount),
+                    session.username, recipient_username, interval or "once",
+                    extra={"event": "schedule_payment", "sender": session.username,
+                           "recipient": recipient_username, "amount_cents": amount, "interval": interval})
+        return schedule.schedule_id
+
+    @instrumented("bank")
+    def cancel_scheduled_payment(self, session: Session, schedule_id: str) -> bool:
+        """Cancels one of a client's own scheduled payments."""
+
+        if not self._authorized(session, "client"):
+            logger.warning("❌ Cancellation failed: User is not a client or not logged in.")
+            note_outcome(DENIED)
+            return False
+
+        with self._scheduler_lock:
+            schedule = self.db.schedules.get(schedule_id)
+            if schedule is None or schedule.owner_username != session.username:
+                logger.warning("❌ Cancellation failed: No scheduled payment '%s' for '%s'.", schedule_id,
+                               session.username)
+                note_outcome(UNKNOWN_USER)
+                return False
+            self.db.delete_schedule(schedule_id)
+            self.db.commit()
+        logger.info("✅ Scheduled payment '%s' cancelled.", schedule_id)
+        return True
+
+    @instrumented("bank")
+    def list_scheduled_payments(self, session: Session) -> Optional[List[dict]]:
+        """A client's scheduled payments, soonest first."""
+
+        if not self._authorized(session, "client"):
+            logger.warning("❌ Schedule lookup failed: User is not a client or not logged in.")
+            note_outcome(DENIED)
+            return None
+
+        return [schedule.to_record() for schedule in self.db.payment_schedule.owned_by(session.username)]
+
+    @instrumented("bank")
+    def run_due_payments(self, now: Optional[float] = None, limit: Optional[int] = None) -> dict:
+        """Makes every scheduled payment due by `now` (epoch seconds; default: the current time).
+
+        Payments come off the due-time heap in order, O(log n) each, and a
+        recurring payment is advanced and filed again, so occurrences missed
+        while the bank was down are caught up in the same tick. A payment the
+        owner cannot cover is skipped and counted in its failures. The whole
+        tick is persisted with a single commit; `limit` caps the payments
+        attempted per tick.
+
+        Returns {"paid", "failed", "finished", "total"}, plus "error" if the
+        commit failed.
+        """
+        now = time.time() if now is None else now
+        result = {"paid": 0, "failed": 0, "finished": 0, "total": 0}
+        payment_schedule = self.db.payment_schedule
+        encrypted: Dict[str, str] = {}  # Standing orders repeat descriptions; each is encrypted once
+        with self._scheduler_lock:
+            try:
+                with self.db.deferred_commits():
+                    while limit is None or result["paid"] + result["failed"] < limit:
+                        schedule = payment_schedule.pop_due(now)
+                        if schedule is None:
+                            break
+                        # Changed as a copy: the stored payment stays as journaled until put_schedule
+                        schedule = replace(schedule)
+                        if self._make_scheduled_payment(schedule, encrypted):
+                            result["paid"] += 1
+                            result["total"] += schedule.amount_cents
+                        else:
+                            result["failed"] += 1
+                        if schedule.advance():
+                            self.db.put_schedule(schedule)
+                        else:
+                            self.db.delete_schedule(schedule.schedule_id)
+                            result["finished"] += 1
+            except OSError as e:
+                logger.error("❌ Error persisting scheduled payments: %s", e)
+                note_outcome(ERROR)
+                result["error"] = str(e)
+                return result
+
+        if result["paid"] or result["failed"]:
+            logger.info("✅ Scheduled payments run: %s paid ($%s), %s failed.", result["paid"],
+                        lazy(format_cents, result["total"]), result["failed"],
+                        extra={"event": "scheduled_payments", "paid": result["paid"],
+                               "failed": result["failed"], "amount_cents": result["total"]})
+        return result
+
+    def _make_scheduled_payment(self, schedule: ScheduledPayment, encrypted: Dict[str, str]) -> bool:
+        """One occurrence of a scheduled payment; staged, not committed."""
+        owner = self.db.users.get(schedule.owner_username)
+        recipient = self.db.users.get(schedule.recipient_username)
+        if owner is None or recipient is None or not owner.account_id or not recipient.account_id:
+            logger.warning("❌ Scheduled payment '%s' failed: Account not found.", schedule.schedule_id)
+            schedule.failures += 1
+            return False
+
+        description = schedule.description
+        token = encrypted.get(description)
+        if token is None:
+            token = encrypted[description] = self.crypto.encrypt_data(description).hex()
+        entry = {"plaintext": description, "encrypted": token}
+
+        with self._lock_accounts(owner.account_id, recipient.account_id):
+            sender_account = self.db.accounts[owner.account_id]
+            if sender_account.balance < schedule.amount_cents:
+                logger.warning("❌ Scheduled payment '%s' failed: Insufficient funds.", schedule.schedule_id)
+                schedule.failures += 1
+                return False
+            debit = sender_account.add_transaction(schedule.amount_cents, "debit", entry)
+            self.db.log_transaction(sender_account, debit)
+            recipient_account = self.db.accounts[recipient.account_id]
+            credit = recipient_account.add_transaction(schedule.amount_cents, "credit", entry)
+            self.db.log_transaction(recipient_account, credit)
+            # Standing orders were authorized up front: counted like any transfer, never refused
+            self.velocity.record(owner.account_id, ((recipient.account_id, schedule.amount_cents),), time.time())
+        schedule.runs += 1
+        return True
+
+    def start_scheduler(self, interval: float = 60.0):
+        """Runs due payments in a background thread, at least every `interval` seconds."""
+        if self._scheduler is not None and self._scheduler.is_alive():
+            return
+        self._scheduler_stop.clear()
+        self._scheduler = threading.Thread(target=self._scheduler_loop, args=(interval,), name="scheduler",
+                                           daemon=True)
+        self._scheduler.start()
+
+    def stop_scheduler(self):
+        """Stops the background scheduler, letting a running tick finish."""
+        self._scheduler_stop.set()
+        if self._scheduler is not None:
+            self._scheduler.join()
+            self._scheduler = None
+
+    def _scheduler_loop(self, interval: float):
+        while True:
+            next_due = self.db.payment_schedule.next_due()
+            # Sleeps until the earliest payment is due, re-checking every interval for new ones
+            wait = interval if next_due is None else min(interval, max(0.0, next_due - time.time()))
+            if self._scheduler_stop.wait(wait):
+                return
+            self.run_due_payments()
+
+    # ========== END OF DAY ==========
+
+    @instrumented("bank")
+    def run_end_of_day(self, business_date: date, policy: EndOfDayPolicy) -> Optional[dict]:
+        """Posts a business date's interest and fees to every account (see end_of_day.py).
+
+        The amounts are computed for all accounts at once with NumPy, then
+        posted through each Account and persisted with a single commit.
+        The amounts are computed from a read view, so transfers made
+        meanwhile are either wholly in it or wholly after it. Rerunning a
+        date posts nothing twice. Returns {"accounts",
+        "credited", "interest", "charged", "fees", "skipped",
+        "compute_seconds"}, or None if the postings could not be persisted.
+        """
+        with self._end_of_day_lock:
+            start = time.perf_counter()
+            with self.db.snapshot() as view:  # Scans with items(), so the sharded engine's cache is not filled
+                postings = compute_postings(view.accounts(), business_date, policy)
+            compute_seconds = time.perf_counter() - start
+            interest, fees = postings["interest"], postings["fees"]
+
+            posted_at = posting_time(business_date)
+            descriptions = [f"Interest {business_date.isoformat()}", f"Monthly fee {business_date:%Y-%m}"]
+            interest_entry, fee_entry = ({"plaintext": text, "encrypted": token.hex()}
+                                         for text, token in zip(descriptions, self.crypto.encrypt_many(descriptions)))
+            try:
+                with self.db.deferred_commits():
+                    for i in np.flatnonzero((interest > 0) | (fees > 0)):
+                        account_id = postings["account_ids"][i]
+                        with self._lock_accounts(account_id):
+                            account = self.db.accounts[account_id]
+                            if interest[i]:
+                                credit = account.add_transaction(int(interest[i]), "credit", interest_entry,
+                                                                 kind="interest", timestamp=posted_at)
+                                self.db.log_transaction(account, credit)
+                            if fees[i]:
+                                debit = account.add_transaction(int(fees[i]), "debit", fee_entry, kind="fee",
+                                                                timestamp=posted_at)
+                                self.db.log_transaction(account, debit)
+            except OSError as e:
+                logger.error("❌ Error persisting end of day %s: %s", business_date, e)
+                note_outcome(ERROR)
+                return None
+
+        result = {
+            "accounts": len(postings["account_ids"]),
+            "credited": int(np.count_nonzero(interest)),
+            "interest": int(interest.sum()),
+            "charged": int(np.count_nonzero(fees)),
+            "fees": int(fees.sum()),
+            "skipped": int(np.count_nonzero(postings["already_posted"])),
+            "compute_seconds": compute_seconds
+        }
+        logger.info("✅ End of day %s: $%s interest to %s accounts, $%s fees from %s accounts.", business_date,
+                    lazy(format_cents, result["interest"]), result["credited"], lazy(format_cents, result["fees"]),
+                    result["charged"], extra={"event": "end_of_day", "business_date": business_date.isoformat(),
+                                              "interest_cents": result["interest"], "fee_cents": result["fees"]})
+        return result
+
+    # ========== STATEMENTS ==========
+
+    @instrumented("bank")
+    def get_transactions(self, session: Session, username: Optional[str] = None, since=None, until=None,
+                         limit: int = 50, cursor: Optional[str] = None) -> Optional[dict]:
+        """Returns one page of an account's history, oldest first.
+
+        Clients see their own account; employees and admins pass the
+        customer's username. `since`/`until` (timestamp strings or datetimes)
+        bound the range as since <= timestamp < until and are located by
+        bisecting the ledger's timestamp index, so a page costs O(log n +
+        limit) however long the history is. Pass the returned "next_cursor"
+        back to get the following page; it is None on the last page.
+
+        Returns {"transactions": [...], "next_cursor": ...}, or None if the
+        request is not allowed or the cursor is malformed.
+        """
+        if limit < 1:
+            logger.warning("❌ History lookup failed: Invalid page size %s.", limit)
+            note_outcome(INVALID)
+            return None
+        account = self._readable_account(session, username)
+        if account is None:
+            return None
+        with self._lock_accounts(account.account_id):
+            ledger = account.transactions
+            try:
+                positions = list(islice(self._positions(ledger, since, until, cursor), limit + 1))
+            except ValueError:
+                logger.warning("❌ History lookup failed: Invalid cursor or time range.")
+                note_outcome(INVALID)
+                return None
+            page = [ledger[position] for position in positions[:limit]]
+            next_cursor = ledger.cursor(positions[limit - 1]) if len(positions) > limit else None
+        return {"transactions": page, "next_cursor": next_cursor}
+
+    def iter_transactions(self, session: Session, username: Optional[str] = None, since=None, until=None,
+                          cursor: Optional[str] = None) -> Iterator[dict]:
+        """Streams an account's history in a time range, oldest first, one entry at a time.
+
+        Access rules and arguments are those of get_transactions. Nothing is
+        materialized up front, so very long histories can be consumed lazily.
+        """
+        account = self._readable_account(session, username)
+        if account is None:
+            return
+        ledger = account.transactions
+        for position in self._positions(ledger, since, until, cursor):
+            yield ledger[position]
+
+    @instrumented("bank")
+    def export_statement(self, session: Session, path: str, username: Optional[str] = None, fmt: str = "csv",
+                         since=None, until=None, decrypt: bool = False) -> Optional[dict]:
+        """Writes an account's history in a time range to a CSV or JSONL file, gzipped if `path` ends in .gz.
+
+        Access rules and the time range are those of get_transactions. Rows
+        are read from a snapshot and streamed in chunks (see export.py), so
+        the statement is consistent and memory use does not grow with its
+        length. With `decrypt`, descriptions come from their ciphertext.
+
+        Returns {"files", "rows", "bytes", "undecryptable"}, or None on failure.
+        """
+        if fmt not in FORMATS:
+            logger.warning("❌ Statement export failed: Unknown format '%s'.", fmt)
+            note_outcome(INVALID)
+            return None
+        account = self._readable_account(session, username)
+        if account is None:
+            return None
+        return self._export(path, fmt, since, until, decrypt, 0, account.account_id)
+
+    @instrumented("bank")
+    def get_customer_info(self, session: Session, username: str) -> Optional[dict]:
+        """Summary of a customer for employees and admins, without scanning the history."""
+        if not (self._authorized(session, "employee") or self._authorized(session, "admin")):
+            logger.warning("❌ Access denied: Employee or admin privileges required.")
+            note_outcome(DENIED)
+            return None
+
+        with self.db.snapshot() as view:  # User, balance and history as of one moment
+            user = view.user(username)
+            if user is None:
+                logger.warning("❌ Customer '%s' not found.", username)
+                note_outcome(UNKNOWN_USER)
+                return None
+
+            info = {"username": user.username, "role": user.role}
+            account = view.account(user.account_id) if user.account_id else None
+            if account is not None:
+                info.update({
+                    "account_id": account.account_id,
+                    "balance": account.balance,
+                    "transaction_count": account.length,
+                    "last_activity": account.transactions[account.length - 1]["timestamp"] if account.length else None
+                })
+        return info
+
+    def _readable_account(self, session: Optional[Session], username: Optional[str]) -> Optional[Account]:
+        """The account whose history a session may read: its own for clients, any for staff."""
+        if self._authorized(session, "client"):
+            if username not in (None, session.username):
+                logger.warning("❌ Access denied: Clients can only view their own transactions.")
+                note_outcome(DENIED)
+                return None
+            account_id = session.user.account_id
+        elif self._authorized(session, "employee") or self._authorized(session, "admin"):
+            user = self.db.users.get(username) if username else None
+            if user is None or not user.account_id:
+                logger.warning("❌ History lookup failed: Customer '%s' not found or has no account.", username)
+                note_outcome(UNKNOWN_USER)
+                return None
+            account_id = user.account_id
+        else:
+            logger.warning("❌ History lookup failed: Not logged in.")
+            note_outcome(DENIED)
+            return None
+        return self.db.accounts.get(account_id)
+
+    @staticmethod
+    def _positions(ledger, since, until, cursor: Optional[str]) -> Iterator[int]:
+        return ledger.positions(None if since is None else to_epoch(since),
+                                None if until is None else to_epoch(until), cursor)
+
     # ========== EMPLOYEE FUNCTIONS ==========
-    
-    def process_transaction(self, username: str, amount: float, transaction_type: str, description: str) -> bool:
-        """Allows employees to process deposits/withdrawals for customers."""
 
-        if not self.current_user or self.current_user.role != "employee":
+    @instrumented("bank")
+    def process_transaction(self, session: Session, username: str, amount: int, transaction_type: str,
+                            description: str) -> bool:
+        """Allows employees to process deposits/withdrawals of `amount` cents for customers."""
+
+        if not self._authorized(session, "employee"):
             logger.warning("❌ Transaction failed: Only employees can process transactions.")
+            note_outcome(DENIED)
+            return False
+
+        if transaction_type not in ("deposit", "withdrawal"):
+            logger.warning("❌ Transaction failed: Invalid transaction type '%s'.", transaction_type)
+            note_outcome(INVALID)
             return False
-        
+
+        if not self._valid_amount(amount):
+            logger.warning("❌ Transaction failed: Invalid amount %r.", amount)
+            note_outcome(INVALID)
+            return False
+
         if username not in self.db.users:
-            logger.warning(f"❌ Transaction failed: Customer '{username}' not found.")
+            logger.warning("❌ Transaction failed: Customer '%s' not found.", username)
+            note_outcome(UNKNOWN_USER)
             return False
-        
+
         customer = self.db.users[username]
         if not customer.account_id:
-            logger.warning(f"❌ Transaction failed: Customer '{username}' has no account.")
+            logger.warning("❌ Transaction failed: Customer '%s' has no account.", username)
+            note_outcome(UNKNOWN_USER)
             return False
 
-        account = self.db.accounts[customer.account_id]
+        encrypted_description = self.crypto.encrypt_data(description).hex()
 
-        if transaction_type == "withdrawal" and account.balance < amount:
-            logger.warning("❌ Transaction failed: Insufficient funds.")
-            return False
+        with self._lock_accounts(customer.account_id):
+            account = self.db.accounts[customer.account_id]
 
-        account.add_transaction(amount, "debit" if transaction_type == "withdrawal" else "credit", {
-            "plaintext": f"{transaction_type.capitalize()} - {description}",
-            "encrypted": self.crypto.encrypt_data(description).hex()
-        })
+            if transaction_type == "withdrawal" and account.balance < amount:
+                logger.warning("❌ Transaction failed: Insufficient funds.")
+                note_outcome(INSUFFICIENT_FUNDS)
+                return False
 
-        self.db.save_data()
-        logger.info(f"✅ {transaction_type.capitalize()} of ${amount:.2f} processed for '{username}'.")
+            transaction = account.add_transaction(amount, "debit" if transaction_type == "withdrawal" else "credit", {
+                "plaintext": f"{transaction_type.capitalize()} - {description}",
+                "encrypted": encrypted_description
+            }, kind=transaction_type)
+            self.db.log_transaction(account, transaction)
+            self.db.commit()
+        logger.info("✅ %s of $%s processed for '%s'.", transaction_type.capitalize(), lazy(format_cents, amount),
+                    username, extra={"event": transaction_type, "username": username, "amount_cents": amount,
+                                     "employee": session.username})
         return True
 
+    @instrumented("bank")
+    def process_transactions_bulk(self, session: Session, rows: Iterable[dict]) -> dict:
+        """Posts many deposits/withdrawals (e.g. read from a file) as one all-or-nothing unit.
+
+        Each row is a dict with 'username', 'amount' (cents), an optional
+        'type' ("deposit" by default) and 'description'. Rows are validated
+        up front, withdrawals are checked against each account's running
+        balance, descriptions are encrypted in one batch, and everything is
+        persisted with a single commit. If any row is invalid, nothing is posted.
+
+        Returns {"ok": bool, "processed": <count>, "errors": [{"row", "username", "error"}, ...]}.
+        """
+        rows = list(rows)
+        result = {"ok": False, "processed": 0, "errors": []}
+        if not self._authorized(session, "employee"):
+            logger.warning("❌ Bulk posting failed: Only employees can process transactions.")
+            note_outcome(DENIED)
+            result["errors"].append({"row": None, "username": None, "error": "Not authorized."})
+            return result
+
+        account_ids = []
+        for row_number, row in enumerate(rows, start=1):
+            username = row.get("username")
+            user = self.db.users.get(username) if username else None
+            if row.get("type", "deposit") not in ("deposit", "withdrawal"):
+                error = f"Invalid transaction type '{row.get('type')}'."
+            elif not self._valid_amount(row.get("amount")):
+                error = f"Invalid amount {row.get('amount')!r}."
+            elif user is None:
+                error = f"Customer '{username}' not found."
+            elif not user.account_id:
+                error = f"Customer '{username}' has no account."
+            else:
+                account_ids.append(user.account_id)
+                continue
+            result["errors"].append({"row": row_number, "username": username, "error": error})
+        if result["errors"] or not rows:
+            logger.warning("❌ Bulk posting failed: %s invalid rows.", len(result['errors']))
+            note_outcome(INVALID)
+            return result
+
+        descriptions = [(row.get("description") or "").strip() for row in rows]
+        distinct = list(dict.fromkeys(descriptions))
+        encrypted = dict(zip(distinct, (token.hex() for token in self.crypto.encrypt_many(distinct))))
+
+        with self._lock_accounts(*account_ids):
+            accounts = {account_id: self.db.accounts[account_id] for account_id in set(account_ids)}
+            balances = {account_id: account.balance for account_id, account in accounts.items()}
+            for row_number, (row, account_id) in enumerate(zip(rows, account_ids), start=1):
+                signed = -row["amount"] if row.get("type") == "withdrawal" else row["amount"]
+                balances[account_id] += signed
+                if balances[account_id] < 0:
+                    result["errors"].append({"row": row_number, "username": row["username"],
+                                             "error": "Insufficient funds."})
+            if result["errors"]:
+                logger.warning("❌ Bulk posting failed: %s rows overdraw their account.", len(result['errors']))
+                note_outcome(INSUFFICIENT_FUNDS)
+                return result
+
+            for row, account_id, description in zip(rows, account_ids, descriptions):
+                transaction_type = row.get("type", "deposit")
+                account = accounts[account_id]
+                transaction = account.add_transaction(
+                    row["amount"], "debit" if transaction_type == "withdrawal" else "credit",
+                    {"plaintext": f"{transaction_type.capitalize()} - {description}",
+                     "encrypted": encrypted[description]},
+                    kind=transaction_type)
+                self.db.log_transaction(account, transaction)
+            self.db.commit()
+
+        logger.info("✅ Bulk posting completed: %s transactions processed.", len(rows),
+                    extra={"event": "bulk_posting", "employee": session.username, "transactions": len(rows)})
+        result.update(ok=True, processed=len(rows))
+        return result
+
     # ========== ADMIN FUNCTIONS ==========
-    
-    def list_users(self) -> list:
-        """Allows admins to list all users."""
-        
-        if not self.current_user or self.current_user.role != "admin":
+
+    @instrumented("bank")
+    def list_users(self, session: Session, role: Optional[str] = None, has_account: Optional[bool] = None,
+                   prefix: str = "", limit: int = 50, cursor: Optional[str] = None) -> Optional[dict]:
+        """Allows admins to list users one page at a time, in username order.
+
+        Filters by role, by whether the user has an account and by username
+        prefix, all served from the database's user indexes, so a page costs
+        O(log n + limit) even with millions of users. Pass the returned
+        "next_cursor" back for the following page; it is None on the last.
+
+        Returns {"users": [{"username", "role", "has_account"}, ...],
+        "next_cursor": ...}, or None if not allowed or the filters are invalid.
+        """
+
+        if not self._authorized(session, "admin"):
+            logger.warning("❌ Access denied: Admin privileges required.")
+            note_outcome(DENIED)
+            return None
+
+        if role is not None and role not in ROLES:
+            logger.warning("❌ Invalid role filter: '%s'.", role)
+            note_outcome(INVALID)
+            return None
+
+        if limit < 1:
+            logger.warning("❌ User listing failed: Invalid page size %s.", limit)
+            note_outcome(INVALID)
+            return None
+
+        rows, next_cursor = self.db.user_index.page(role, has_account, prefix or "", cursor, limit)
+        return {"users": [{"username": username, "role": user_role, "has_account": account}
+                          for username, user_role, account in rows],
+                "next_cursor": next_cursor}
+
+    @instrumented("bank")
+    def count_users(self, session: Session, role: Optional[str] = None,
+                    has_account: Optional[bool] = None) -> Optional[int]:
+        """Allows admins to count users by role and account presence."""
+
+        if not self._authorized(session, "admin"):
+            logger.warning("❌ Access denied: Admin privileges required.")
+            note_outcome(DENIED)
+            return None
+
+        return self.db.user_index.count(role, has_account)
+
+    @instrumented("bank")
+    def audit_ledgers(self, session: Session) -> Optional[dict]:
+        """Allows admins to run the ledger audit (see reconcile.py) on the running bank.
+
+        It reads a snapshot, so transfers go on meanwhile and every one of
+        them is either wholly in the report or not at all.
+        """
+
+        if not self._authorized(session, "admin"):
+            logger.warning("❌ Access denied: Admin privileges required.")
+            note_outcome(DENIED)
+            return None
+
+        with self.db.snapshot() as view:
+            return reconcile(view.accounts())
+
+    @instrumented("bank")
+    def export_ledger(self, session: Session, path: str, fmt: str = "csv", since=None, until=None,
+                      decrypt: bool = False, workers: int = 0) -> Optional[dict]:
+        """Allows admins to dump every account's history in a time range, like export_statement.
+
+        Accounts come from one snapshot, so the dump is consistent while
+        transfers go on; with workers > 1, rows are encoded on that many processes.
+        """
+
+        if not self._authorized(session, "admin"):
             logger.warning("❌ Access denied: Admin privileges required.")
-            return []
-        
-        return [{"username": username, "role": user.role, "has_account": bool(user.account_id)} for username, user in self.db.users.items()]
+            note_outcome(DENIED)
+            return None
+
+        if fmt not in FORMATS:
+            logger.warning("❌ Ledger export failed: Unknown format '%s'.", fmt)
+            note_outcome(INVALID)
+            return None
+
+        return self._export(path, fmt, since, until, decrypt, workers)
+
+    def _export(self, path: str, fmt: str, since, until, decrypt: bool, workers: int,
+                account_id: Optional[str] = None) -> Optional[dict]:
+        """Streams one account's entries, or everyone's, from a snapshot to `path`."""
+        try:
+            since = None if since is None else to_epoch(since)
+            until = None if until is None else to_epoch(until)
+        except ValueError:
+            logger.warning("❌ Export failed: Invalid time range.")
+            note_outcome(INVALID)
+            return None
+
+        keyring_path = self.crypto.keyring.path if decrypt else None
+        try:
+            with self.db.snapshot() as view:
+                accounts = view.accounts() if account_id is None else [view.account(account_id)]
+                result = write_export([path], ledger_chunks(accounts, since, until), fmt, path.endswith(".gz"),
+                                      keyring_path, workers)
+        except OSError as e:
+            logger.error("❌ Export to '%s' failed: %s", path, e)
+            note_outcome(ERROR)
+            return None
+        logger.info("✅ Exported %s transactions to '%s'.", result["rows"], path,
+                    extra={"event": "export", "path": path, "rows": result["rows"], "account_id": account_id})
+        return result
 
-    def change_user_role(self, username: str, new_role: str) -> bool:
+    @instrumented("bank")
+    def change_user_role(self, session: Session, username: str, new_role: str) -> bool:
         """Allows admins to change user roles."""
 
-        if not self.current_user or self.current_user.role != "admin":
+        if not self._authorized(session, "admin"):
             logger.warning("❌ Access denied: Admin privileges required.")
+            note_outcome(DENIED)
             return False
 
         if username not in self.db.users:
-            logger.warning(f"❌ User '{username}' not found.")
+            logger.warning("❌ User '%s' not found.", username)
+            note_outcome(UNKNOWN_USER)
             return False
 
-        if new_role not in ["client", "employee", "admin"]:
-            logger.warning(f"❌ Invalid role: '{new_role}'. Must be 'client', 'employee', or 'admin'.")
+        if new_role not in ROLES:
+            logger.warning("❌ Invalid role: '%s'. Must be 'client', 'employee', or 'admin'.", new_role)
+            note_outcome(INVALID)
             return False
 
-        self.db.users[username].role = new_role
-        self.db.save_data()
-        logger.info(f"✅ User '{username}' role updated to '{new_role}'.")
+        with self._users_lock:
+            # A changed copy: read views may still hold the old user
+            self.db.put_user(replace(self.db.users[username], role=new_role))
+            self.db.commit()
+        # Sessions carry the old role; make the user log in again
+        self.sessions.revoke_user(username)
+        logger.info("✅ User '%s' role updated to '%s'.", username, new_role,
+                    extra={"event": "role_change", "username": username, "role": new_role})
         return True
+
+    @instrumented("bank")
+    def get_metrics(self, session: Session) -> Optional[List[dict]]:
+        """Allows admins to view call counts and latencies per operation and outcome."""
+
+        if not self._authorized(session, "admin"):
+            logger.warning("❌ Access denied: Admin privileges required.")
+            note_outcome(DENIED)
+            return None
+
+        return METRICS.summary()
+
+    @instrumented("bank")
+    def export_metrics(self, session: Session, path: str) -> bool:
+        """Allows admins to write the metrics to a file in the Prometheus text format."""
+
+        if not self._authorized(session, "admin"):
+            logger.warning("❌ Access denied: Admin privileges required.")
+            note_outcome(DENIED)
+            return False
+
+        try:
+            METRICS.write_prometheus(path)
+        except OSError as e:
+            logger.error("❌ Error writing metrics to '%s': %s", path, e)
+            note_outcome(ERROR)
+            return False
+        logger.info("✅ Metrics written to '%s'.", path)
+        return True
+
+    @instrumented("bank")
+    def rotate_encryption_key(self, session: Session) -> Optional[str]:
+        """Allows admins to rotate the description encryption key.
+
+        New descriptions use the new key at once. Stored descriptions stay
+        readable under their old key and are re-encrypted lazily by a
+        background thread, so transfers are never paused.
+        """
+
+        if not self._authorized(session, "admin"):
+            logger.warning("❌ Access denied: Admin privileges required.")
+            note_outcome(DENIED)
+            return None
+
+        key_id = self.crypto.rotate_key()
+        logger.info("✅ Encryption key rotated to '%s'; re-encrypting stored descriptions in the background.", key_id)
+        with self._account_locks_guard:
+            if self._reencryption is not None and self._reencryption.is_alive():
+                self._reencrypt_again = True
+            else:
+                self._reencryption = threading.Thread(target=self._reencrypt_stored_descriptions,
+                                                      name="reencrypt", daemon=True)
+                self._reencryption.start()
+        return key_id
+
+    def _reencrypt_stored_descriptions(self, batch_size: int = 256, pause: float = 0.001):
+        """Background pass moving every stored description to the current key.
+
+        Works one account and one batch at a time, holding the account lock
+        only for that batch so concurrent transfers keep flowing.
+        """
+        while True:
+            updated = 0
+            for account_id in list(self.db.accounts):
+                start = 0
+                while True:
+                    with self._lock_accounts(account_id):
+                        ledger = self.db.accounts[account_id].transactions
+                        batch = []
+                        for i in range(start, len(ledger)):
+                            token = ledger.encrypted(i)
+                            if token and not self.crypto.is_current(token):
+                                batch.append(i)
+                                if len(batch) == batch_size:
+                                    break
+                        if not batch:
+                            break
+                        account = self.db.accounts[account_id]
+                        plaintexts = self.crypto.decrypt_many([ledger.encrypted(i) for i in batch])
+                        for i, token in zip(batch, self.crypto.encrypt_many(plaintexts)):
+                            ledger.set_encrypted(i, token)
+                            self.db.update_transaction(account, i)
+                        self.db.commit()
+                        updated += len(batch)
+                        start = batch[-1] + 1
+                    time.sleep(pause)  # Let waiting writers in between batches
+
+            logger.info("✅ Re-encrypted %s stored descriptions.", updated)
+            with self._account_locks_guard:
+                if not self._reencrypt_again:
+                    return
+                self._reencrypt_again = False
@@ -0,0 +1,201 @@
+"""Non-interactive batch mode: replays a JSONL command file through BankingSystem.
+
+Each line is one command, shaped like the server's requests:
+
+    {"id": 1, "op": "register", "args": {"username": "alice", "password": "pw", "role": "client"}}
+    {"id": 2, "op": "login", "args": {"username": "alice", "password": "pw"}}
+    {"id": 3, "op": "transfer", "user": "alice", "args": {"recipient": "bob", "amount": "12.34", "description": "lunch"}}
+    {"id": 4, "op": "deposit", "user": "teller", "args": {"username": "alice", "amount": "100", "description": "cash"}}
+    {"id": 5, "op": "change_role", "user": "root", "args": {"username": "alice", "role": "employee"}}
+    {"id": 6, "op": "schedule_payment", "user": "alice", "args": {"recipient": "bob", "amount": "50",
+     "first_run": "2024-01-31", "interval": "monthly", "day": 31, "description": "rent"}}
+    {"id": 7, "op": "run_due_payments", "args": {"now": "2024-03-01"}}
+
+"user" names whose session runs the command; that user must have logged in
+earlier in the file. Operations are register, login, logout, balance,
+transfer, deposit, withdrawal, change_role, schedule_payment and
+run_due_payments, which makes the payments due by "now" (default: the
+current time). Amounts are decimal strings.
+
+Results stream out as one JSON line per command, {"line", "id", "op",
+"ok", "result"} or {..., "ok": false, "error", "outcome"}, where outcome
+is the failure reason recorded by metrics.py (e.g. "insufficient_funds").
+Commands run in chunks of chunk_size, and each chunk is persisted with a
+single commit (Database.deferred_commits), so replaying a large file
+costs one storage write per chunk instead of one per command.
+"""
+import json
+import time
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, Optional, TextIO, Tuple
+from bank_system import BankingSystem
+from metrics import last_outcome
+from models import to_epoch
+from money import format_cents, to_cents
+from sessions import Session
+
+
+class BatchRunner:
+    """Runs JSONL commands against a BankingSystem and writes JSONL results."""
+
+    def __init__(self, bank: BankingSystem, out: TextIO):
+        self.bank = bank
+        self.out = out
+        self.sessions: Dict[str, Session] = {}  # Logged-in users by username
+        self.stats: Dict[str, list] = {}  # op -> [commands, succeeded, seconds]
+        self.commits = 0
+        self.handlers: Dict[str, Callable[[Optional[Session], dict], object]] = {
+            "register": self._register,
+            "login": self._login,
+            "logout": self._logout,
+            "balance": self._balance,
+            "transfer": self._transfer,
+            "deposit": self._deposit,
+            "withdrawal": self._withdrawal,
+            "change_role": self._change_role,
+            "schedule_payment": self._schedule_payment,
+            "run_due_payments": self._run_due_payments,
+        }
+
+    def run(self, lines: Iterable[str], chunk_size: int = 1000) -> dict:
+        """Replays every command and returns the summary (see summary())."""
+        commands = self._parse(lines)
+        start = time.perf_counter()
+        while True:
+            chunk = list(islice(commands, chunk_size))
+            if not chunk:
+                break
+            with self.bank.db.deferred_commits():
+                results = [self.execute(line_number, command) for line_number, command in chunk]
+            self.commits += 1
+            self.out.write("".join(json.dumps(result) + "\n" for result in results))
+            self.out.flush()
+        return self.summary(time.perf_counter() - start)
+
+    @staticmethod
+    def _parse(lines: Iterable[str]) -> Iterator[Tuple[int, Optional[dict]]]:
+        """(line number, command) per non-blank line; the command is None if the line is not a JSON object."""
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                command = json.loads(line)
+            except json.JSONDecodeError:
+                command = None
+            yield line_number, command if isinstance(command, dict) else None
+
+    def execute(self, line_number: int, command: Optional[dict]) -> dict:
+        """Runs one command and returns its result line."""
+        if command is None:
+            return self._record({"line": line_number, "id": None, "op": None, "ok": False,
+                                 "error": "Malformed JSON"}, 0.0)
+        op = command.get("op")
+        handler = self.handlers.get(op) if isinstance(op, str) else None
+        response = {"line": line_number, "id": command.get("id"), "op": op if handler else None, "ok": False}
+        if handler is None:
+            response["error"] = f"Unknown operation: {op}"
+            return self._record(response, 0.0)
+
+        user, args = command.get("user"), command.get("args") or {}
+        if (user and not isinstance(user, str)) or not isinstance(args, dict):
+            response["error"] = "Bad command"
+            return self._record(response, 0.0)
+        session = self.sessions.get(user) if user else None
+        if user and session is None:
+            response["error"] = f"User '{user}' is not logged in"
+            return self._record(response, 0.0)
+
+        start = time.perf_counter()
+        try:
+            result = handler(session, args)
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            response["error"] = f"Bad command: {e}"
+            return self._record(response, time.perf_counter() - start)
+        except Exception as e:  # Still a result line, so the rest of the chunk is written and committed
+            response["error"] = f"Internal error: {e}"
+            return self._record(response, time.perf_counter() - start)
+        elapsed = time.perf_counter() - start
+        if result is False or result is None:
+            response.update(error="Operation failed", outcome=last_outcome())
+        else:
+            response.update(ok=True, result=result)
+        return self._record(response, elapsed)
+
+    def _record(self, response: dict, seconds: float) -> dict:
+        stats = self.stats.setdefault(response["op"] or "<malformed>", [0, 0, 0.0])
+        stats[0] += 1
+        stats[1] += response["ok"]
+        stats[2] += seconds
+        return response
+
+    def summary(self, seconds: float) -> dict:
+        """Totals of the run: {"commands", "succeeded", "failed", "commits", "seconds", "per_second", "ops"}."""
+        commands = sum(stats[0] for stats in self.stats.values())
+        succeeded = sum(stats[1] for stats in self.stats.values())
+        return {
+            "commands": commands,
+            "succeeded": succeeded,
+            "failed": commands - succeeded,
+            "commits": self.commits,
+            "seconds": seconds,
+            "per_second": commands / seconds if seconds else 0.0,
+            "ops": {op: {"commands": count, "succeeded": ok, "mean_ms": total / count * 1000}
+                    for op, (count, ok, total) in sorted(self.stats.items())}
+        }
+
+    # ========== HANDLERS ==========
+
+    def _register(self, session, args):
+        return self.bank.register_user(args["username"], args["password"], args.get("role", "client"))
+
+    def _login(self, session, args):
+        new_session = self.bank.login(args["username"], args["password"])
+        if new_session is None:
+            return None
+        self.sessions[args["username"]] = new_session
+        return True
+
+    def _logout(self, session, args):
+        if session is None:
+            return None
+        self.bank.logout(session)
+        del self.sessions[session.username]
+        return True
+
+    def _balance(self, session, args):
+        cents = self.bank.get_balance(session)
+        return None if cents is None else {"balance_cents": cents, "balance": format_cents(cents)}
+
+    def _transfer(self, session, args):
+        return self.bank.transfer_money(session, args["recipient"], to_cents(args["amount"]),
+                                        args.get("description", ""))
+
+    def _deposit(self, session, args):
+        return self.bank.process_transaction(session, args["username"], to_cents(args["amount"]), "deposit",
+                                             args.get("description", ""))
+
+    def _withdrawal(self, session, args):
+        return self.bank.process_transaction(session, args["username"], to_cents(args["amount"]), "withdrawal",
+                                             args.get("description", ""))
+
+    def _change_role(self, session, args):
+        return self.bank.change_user_role(session, args["username"], args["role"])
+
+    def _schedule_payment(self, session, args):
+        return self.bank.schedule_payment(session, args["recipient"], to_cents(args["amount"]), args["first_run"],
+                                          args.get("interval"), args.get("description", ""), args.get("day"))
+
+    def _run_due_payments(self, session, args):
+        now = args.get("now")
+        return self.bank.run_due_payments(None if now is None else to_epoch(now))
+
+
+def print_summary(summary: dict, out: TextIO):
+    """Human-readable throughput summary of a run."""
+    print(f"\n{'operation':<14} {'commands':>9} {'ok':>9} {'failed':>9} {'mean ms':>9}", file=out)
+    for op, stats in summary["ops"].items():
+        print(f"{op:<14} {stats['commands']:>9} {stats['succeeded']:>9} "
+              f"{stats['commands'] - stats['succeeded']:>9} {stats['mean_ms']:>9.3f}", file=out)
+    print(f"✅ Replayed {summary['commands']} commands in {summary['seconds']:.2f}s "
+          f"({summary['per_second']:.0f} commands/s): {summary['succeeded']} succeeded, "
+          f"{summary['failed']} failed, {summary['commits']} commits.", file=out)
@@ -0,0 +1,217 @@
+"""Versioned binary snapshot format for users and accounts.
+
+A snapshot file is a header, a string table and a sequence of
+length-prefixed records, all little-endian:
+
+    header    magic "BANKSNAP", u16 version, u8 kind (users/accounts), u32 record count
+    strings   u32 count, then per string: u32 length + UTF-8 bytes
+    names     accounts only: u8 count + u8 string index per transaction type, same for kinds
+    records   u32 length + record body
+
+User bodies hold the username, the raw password hash and salt bytes, the
+role as a string-table index and the account ID. Account bodies hold the
+IDs, the balance in cents and the ledger stored column by column
+(timestamps, amounts, description indices, token lengths, type codes, kind
+codes, then the encrypted tokens back to back), so each column is loaded
+with a single memcpy from an mmap'd file. Roles, transaction types and
+kinds, and descriptions are stored once in the string table.
+"""
+import struct
+import sys
+from array import array
+from typing import Dict, Iterable, List, Union
+from models import User, Account, Ledger, TRANSACTION_KINDS, TRANSACTION_TYPES
+from read_views import AccountVersion
+
+MAGIC = b"BANKSNAP"
+VERSION = 1
+KIND_USERS = 1
+KIND_ACCOUNTS = 2
+
+HEADER = struct.Struct("<8sHBxI")
+LENGTH = struct.Struct("<I")
+USER = struct.Struct("<HBBIH")  # Username, hash and salt lengths, role index, account ID length
+ACCOUNT = struct.Struct("<HHqI")  # Account ID and owner lengths, balance, transaction count
+
+# Bytes per transaction in an account record, excluding its encrypted token
+COLUMNS_PER_TRANSACTION = 8 + 8 + 4 + 4 + 1 + 1
+
+BIG_ENDIAN = sys.byteorder == "big"
+
+class StringTable:
+    """Assigns each distinct string an index, in order of first use."""
+
+    def __init__(self):
+        self.indices: Dict[str, int] = {}
+
+    def index(self, value: str) -> int:
+        index = self.indices.get(value)
+        if index is None:
+            index = self.indices[value] = len(self.indices)
+        return index
+
+    def encode(self) -> bytes:
+        parts = [LENGTH.pack(len(self.indices))]
+        for value in self.indices:  # Dicts keep insertion order, i.e. index order
+            encoded = value.encode()
+            parts.append(LENGTH.pack(len(encoded)))
+            parts.append(encoded)
+        return b"".join(parts)
+
+# ========== ENCODING ==========
+
+def encode_users(users: Iterable[User]) -> bytes:
+    """Serializes users into a snapshot file's bytes."""
+    strings = StringTable()
+    records = []
+    for user in users:
+        username = user.username.encode()
+        account_id = (user.account_id or "").encode()
+        body = b"".join((
+            USER.pack(len(username), len(user.password_hash), len(user.salt), strings.index(user.role),
+                      len(account_id)),
+            username, user.password_hash, user.salt, account_id
+        ))
+        records.append(LENGTH.pack(len(body)) + body)
+    return HEADER.pack(MAGIC, VERSION, KIND_USERS, len(records)) + strings.encode() + b"".join(records)
+
+def encode_accounts(accounts: Iterable[Union[Account, AccountVersion]]) -> bytes:
+    """Serializes accounts, with the first `length` entries of their ledgers, into a snapshot file's bytes."""
+    strings = StringTable()
+    # Type and kind names go first, so readers can map the stored codes by name
+    type_indices = bytes(strings.index(name) for name in TRANSACTION_TYPES)
+    kind_indices = bytes(strings.index(name) for name in TRANSACTION_KINDS)
+    records = []
+    for account in accounts:
+        ledger, length = account.transactions, account.length
+        account_id = account.account_id.encode()
+        owner = account.owner_username.encode()
+        tokens = [ledger.encrypted(i) or b"" for i in range(length)]
+        body = b"".join((
+            ACCOUNT.pack(len(account_id), len(owner), account.balance, length),
+            account_id, owner,
+            _column_bytes(ledger.timestamps[:length]),
+            _column_bytes(ledger.amounts[:length]),
+            _column_bytes(array("I", [strings.index(d) for d in ledger.descriptions[:length]])),
+            _column_bytes(array("I", [len(token) for token in tokens])),
+            ledger.types[:length].tobytes(),
+            ledger.kinds[:length].tobytes(),
+            b"".join(tokens)
+        ))
+        records.append(LENGTH.pack(len(body)) + body)
+    names = bytes((len(type_indices),)) + type_indices + bytes((len(kind_indices),)) + kind_indices
+    return (HEADER.pack(MAGIC, VERSION, KIND_ACCOUNTS, len(records)) + strings.encode()
+            + names + b"".join(records))
+
+def _column_bytes(column: array) -> bytes:
+    if BIG_ENDIAN:
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+# ========== DECODING ==========
+
+def decode_users(buffer) -> Dict[str, User]:
+    """Parses a users snapshot from any buffer (bytes, mmap). Raises ValueError if it is damaged."""
+    with memoryview(buffer) as view:
+        try:
+            count, offset = _read_header(view, KIND_USERS)
+            strings, offset = _read_strings(view, offset)
+            users = {}
+            for _ in range(count):
+                (length,) = LENGTH.unpack_from(view, offset)
+                offset += LENGTH.size
+                end = offset + length
+                username_len, hash_len, salt_len, role_index, account_len = USER.unpack_from(view, offset)
+                offset += USER.size
+                username = str(view[offset:offset + username_len], "utf-8")
+                offset += username_len
+                password_hash = view[offset:offset + hash_len].tobytes()
+                offset += hash_len
+                salt = view[offset:offset + salt_len].tobytes()
+                offset += salt_len
+                account_id = str(view[offset:offset + account_len], "utf-8") or None
+                users[username] = User(username=username, password_hash=password_hash, salt=salt,
+                                       role=strings[role_index], account_id=account_id)
+                offset = end
+        except (struct.error, IndexError, UnicodeDecodeError) as e:
+            raise ValueError(f"Damaged users snapshot: {e}")
+    return users
+
+def decode_accounts(buffer) -> Dict[str, Account]:
+    """Parses an accounts snapshot from any buffer (bytes, mmap). Raises ValueError if it is damaged."""
+    with memoryview(buffer) as view:
+        try:
+            count, offset = _read_header(view, KIND_ACCOUNTS)
+            strings, offset = _read_strings(view, offset)
+            type_map, offset = _read_code_map(view, offset, strings, TRANSACTION_TYPES)
+            kind_map, offset = _read_code_map(view, offset, strings, TRANSACTION_KINDS)
+            accounts = {}
+            size = len(view)
+            for _ in range(count):
+                (length,) = LENGTH.unpack_from(view, offset)
+                offset += LENGTH.size
+                end = offset + length
+                id_len, owner_len, balance, n = ACCOUNT.unpack_from(view, offset)
+                offset += ACCOUNT.size
+                account_id = str(view[offset:offset + id_len], "utf-8")
+                offset += id_len
+                owner = str(view[offset:offset + owner_len], "utf-8")
+                offset += owner_len
+                tokens_start = offset + n * COLUMNS_PER_TRANSACTION
+                if end > size or tokens_start > end:
+                    raise ValueError("Truncated snapshot")
+                # Fixed-width columns; every slice below lies inside the record
+                timestamps, offset = _read_column(view, offset, "d", n)
+                amounts, offset = _read_column(view, offset, "q", n)
+                description_indices, offset = _read_column(view, offset, "I", n)
+                token_lengths, offset = _read_column(view, offset, "I", n)
+                types = array("b", view[offset:offset + n].tobytes().translate(type_map))
+                kinds = array("b", view[offset + n:tokens_start].tobytes().translate(kind_map))
+                ledger = Ledger.from_columns(timestamps, amounts, types, kinds,
+                                             [strings[i] for i in description_indices],
+                                             token_lengths, view[tokens_start:end])
+                accounts[account_id] = Account(account_id=account_id, owner_username=owner, balance=balance,
+                                               transactions=ledger)
+                offset = end
+        except (struct.error, IndexError, UnicodeDecodeError) as e:
+            raise ValueError(f"Damaged accounts snapshot: {e}")
+    return accounts
+
+def _read_header(view: memoryview, kind: int):
+    magic, version, file_kind, count = HEADER.unpack_from(view, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a bank snapshot")
+    if version > VERSION:
+        raise ValueError(f"Snapshot version {version} is newer than this program supports ({VERSION})")
+    if file_kind != kind:
+        raise ValueError(f"Expected snapshot kind {kind}, found {file_kind}")
+    return count, HEADER.size
+
+def _read_strings(view: memoryview, offset: int):
+    (count,) = LENGTH.unpack_from(view, offset)
+    offset += LENGTH.size
+    strings: List[str] = []
+    for _ in range(count):
+        (length,) = LENGTH.unpack_from(view, offset)
+        offset += LENGTH.size
+        strings.append(sys.intern(str(view[offset:offset + length], "utf-8")))
+        offset += length
+    return strings, offset
+
+def _read_code_map(view: memoryview, offset: int, strings: List[str], names: tuple):
+    """A bytes.translate table from the file's codes to this program's codes."""
+    count = view[offset]
+    offset += 1
+    table = bytearray(range(256))
+    for code in range(count):
+        table[code] = names.index(strings[view[offset + code]])
+    return bytes(table), offset + count
+
+def _read_column(view: memoryview, offset: int, typecode: str, count: int):
+    column = array(typecode)
+    end = offset + column.itemsize * count
+    column.frombytes(view[offset:end])
+    if BIG_ENDIAN:
+        column.byteswap()
+    return column, end
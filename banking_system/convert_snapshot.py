@@ -0,0 +1,42 @@
+"""Converts JSON snapshots (users.json/accounts.json) to the binary format and back.
+
+Pending journal records are folded into the converted checkpoint, and the
+old snapshot files are removed once the new checkpoint is written.
+
+Usage:
+    python banking_system/convert_snapshot.py --to binary [--data-dir DIR]
+    python banking_system/convert_snapshot.py --to json [--data-dir DIR]
+"""
+import argparse
+import os
+import sys
+from storage import JSONStorage, SNAPSHOT_FORMATS
+
+def convert_snapshot(data_dir: str, to_format: str) -> tuple:
+    """Loads the snapshots in the other format and rewrites them in `to_format`.
+
+    Returns (user count, account count).
+    """
+    from_format = next(name for name in SNAPSHOT_FORMATS if name != to_format)
+    storage = JSONStorage(data_dir, journal=True, snapshot_format=from_format)
+    storage.load()
+    if not storage.convert(to_format):
+        raise RuntimeError(f"Failed to write {to_format} snapshots to '{data_dir}'.")
+    return len(storage.users), len(storage.accounts)
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert bank snapshots between JSON and binary.")
+    parser.add_argument("--data-dir", default=".", help="Directory holding the snapshot files")
+    parser.add_argument("--to", required=True, choices=list(SNAPSHOT_FORMATS), help="Target format")
+    args = parser.parse_args()
+
+    source_extension = next(ext for name, ext in SNAPSHOT_FORMATS.items() if name != args.to)
+    if not os.path.exists(os.path.join(args.data_dir, "accounts" + source_extension)):
+        print(f"❌ No accounts{source_extension} found in '{args.data_dir}'.")
+        sys.exit(1)
+
+    users, accounts = convert_snapshot(args.data_dir, args.to)
+    print(f"✅ Converted {users} users and {accounts} accounts to {args.to} snapshots.")
+
+if __name__ == "__main__":
+    main()
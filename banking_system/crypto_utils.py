@@ -2,25 +2,106 @@
 #ai generated, please confirm it's accurate
 #ai generated, please confirm it's accurate
 
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, InvalidToken
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
+from concurrent.futures import ThreadPoolExecutor
+from metrics import instrumented
+from typing import Dict, List, Optional, Tuple
 import base64
+import json
 import os
+import threading
+
+class Keyring:
+    """Fernet keys addressed by key ID, optionally persisted to a JSON file.
+
+    Ciphertexts are prefixed with the ID of the key that produced them, so
+    old data stays readable after a rotation. Fernet objects are built once
+    per key and cached.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.keys: Dict[str, bytes] = {}
+        self.current_id: Optional[str] = None
+        self._ciphers: Dict[str, Fernet] = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load()
+
+    def load(self):
+        """Reads the key file."""
+        with open(self.path, "r") as f:
+            data = json.load(f)
+        self.keys = {key_id: key.encode() for key_id, key in data["keys"].items()}
+        self.current_id = data["current"]
+        self._ciphers.clear()
+
+    def save(self):
+        """Writes the key file atomically, readable by the owner only."""
+        if not self.path:
+            return
+        data = {"current": self.current_id, "keys": {key_id: key.decode() for key_id, key in self.keys.items()}}
+        tmp_path = self.path + ".tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def add_key(self, key: Optional[bytes] = None) -> str:
+        """Adds a new key, makes it current and persists the keyring. Returns its ID."""
+        with self._lock:
+            key_id = f"k{len(self.keys) + 1}"
+            self.keys[key_id] = key or Fernet.generate_key()
+            self.current_id = key_id
+            self.save()
+        return key_id
+
+    def current(self) -> Tuple[str, Fernet]:
+        """Returns the current key ID and cipher, creating the first key if needed."""
+        if self.current_id is None:
+            with self._lock:
+                if self.current_id is None:
+                    key_id = "k1"
+                    self.keys[key_id] = Fernet.generate_key()
+                    self.current_id = key_id
+                    self.save()
+        return self.current_id, self.cipher(self.current_id)
+
+    def cipher(self, key_id: str) -> Fernet:
+        """Returns the cached Fernet object for a key ID."""
+        cipher = self._ciphers.get(key_id)
+        if cipher is None:
+            if key_id not in self.keys:
+                raise ValueError(f"Unknown key ID: {key_id}")
+            cipher = self._ciphers[key_id] = Fernet(self.keys[key_id])
+        return cipher
+
 
 class CryptoManager:
-    def __init__(self):
-        self.symmetric_key = None
+    def __init__(self, keyring_path: Optional[str] = None):
+        self.keyring = Keyring(keyring_path)
         self.private_key = None
         self.public_key = None
-        
+
+    @property
+    def symmetric_key(self) -> Optional[bytes]:
+        """The key new data is encrypted with."""
+        return self.keyring.keys.get(self.keyring.current_id) if self.keyring.current_id else None
+
     def generate_symmetric_key(self):
         """Generate a new Fernet symmetric key"""
-        self.symmetric_key = Fernet.generate_key()
-        return self.symmetric_key
-    
+        return self.keyring.keys[self.keyring.add_key()]
+
+    def rotate_key(self) -> str:
+        """Start encrypting with a fresh key; old keys stay available for decryption."""
+        return self.keyring.add_key()
+
     def generate_asymmetric_keys(self):
         """Generate RSA key pair"""
         private_key = rsa.generate_private_key(
@@ -30,30 +111,68 @@ class CryptoManager:
         self.private_key = private_key
         self.public_key = private_key.public_key()
         return self.private_key, self.public_key
-    
+
+    @instrumented("crypto")
     def encrypt_data(self, data: str) -> bytes:
         """Encrypt data using symmetric encryption"""
-        if not self.symmetric_key:
-            self.generate_symmetric_key()
-        f = Fernet(self.symmetric_key)
-        return f.encrypt(data.encode())
-    
+        key_id, cipher = self.keyring.current()
+        return key_id.encode() + b":" + cipher.encrypt(data.encode())
+
     def decrypt_data(self, encrypted_data: bytes) -> str:
         """Decrypt data using symmetric encryption"""
-        if not self.symmetric_key:
+        key_id, token = self._split(encrypted_data)
+        if key_id is None:
+            # Written before key IDs existed: try every key
+            for candidate in self.keyring.keys:
+                try:
+                    return self.keyring.cipher(candidate).decrypt(token).decode()
+                except InvalidToken:
+                    continue
             raise ValueError("No symmetric key available")
-        f = Fernet(self.symmetric_key)
-        return f.decrypt(encrypted_data).decode()
-    
+        return self.keyring.cipher(key_id).decrypt(token).decode()
+
+    def encrypt_many(self, items: List[str], workers: int = 0) -> List[bytes]:
+        """Encrypt a batch with the current key, optionally spread over a thread pool"""
+        key_id, cipher = self.keyring.current()
+        prefix = key_id.encode() + b":"
+        if workers > 1 and len(items) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                return [prefix + token for token in pool.map(lambda s: cipher.encrypt(s.encode()), items)]
+        return [prefix + cipher.encrypt(item.encode()) for item in items]
+
+    def decrypt_many(self, items: List[bytes], workers: int = 0) -> List[str]:
+        """Decrypt a batch, optionally spread over a thread pool"""
+        if workers > 1 and len(items) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                return list(pool.map(self.decrypt_data, items))
+        return [self.decrypt_data(item) for item in items]
+
+    def is_current(self, encrypted_data: bytes) -> bool:
+        """Whether data was encrypted with the current key"""
+        key_id, _ = self._split(encrypted_data)
+        return key_id is not None and key_id == self.keyring.current_id
+
+    @staticmethod
+    def _split(encrypted_data: bytes) -> Tuple[Optional[str], bytes]:
+        """Separate the key ID prefix from the Fernet token"""
+        key_id, sep, token = encrypted_data.partition(b":")
+        if not sep:
+            return None, encrypted_data
+        return key_id.decode(), token
+
+    @instrumented("crypto")
     def hash_password(self, password: str, salt: bytes = None) -> tuple:
         """Hash password using PBKDF2"""
         if not salt:
             salt = os.urandom(16)
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-        )
-        key = base64.b64encode(kdf.derive(password.encode()))
-        return key, salt 
\ No newline at end of file
+        return derive_password_hash(password, salt), salt
+
+def derive_password_hash(password: str, salt: bytes) -> bytes:
+    """PBKDF2 password hash. A module-level function so process pools can pickle it."""
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=salt,
+        iterations=100000,
+    )
+    return base64.b64encode(kdf.derive(password.encode()))
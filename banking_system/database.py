@@ -1,82 +1,363 @@
-import json
-import os
-from typing import Dict, Optional
-from models import User, Account
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from metrics import instrumented
+from models import User, Account, ScheduledPayment
+from read_views import ReadView, VersionStore
+from storage import StorageEngine, JSONStorage
+from sqlite_storage import SQLiteStorage
+from sharded_storage import ShardedStorage
+from scheduler import PaymentSchedule
+from user_index import UserIndex
+
+# Storage engines selectable by name
+ENGINES: Dict[str, type] = {
+    "json": JSONStorage,
+    "sqlite": SQLiteStorage,
+    "sharded": ShardedStorage,
+}
+
+# When written data is forced to disk
+DURABILITY_COMMIT = "commit"  # fsync after every commit() group
+DURABILITY_GROUP = "group"    # fsync once per flushed batch of commits
+DURABILITY_NONE = "none"      # leave it to the OS
+DURABILITY_MODES = (DURABILITY_COMMIT, DURABILITY_GROUP, DURABILITY_NONE)
 
 class Database:
-    """Handles storing and retrieving user and account data."""
-    
-    def __init__(self):
-        self.users: Dict[str, User] = {}  # Stores users by username
-        self.accounts: Dict[str, Account] = {}  # Stores accounts by account ID
-        self.load_data()  # Load data from files at startup
-        
+    """Handles storing and retrieving user and account data.
+
+    Changes are staged with put_user/put_account/log_transaction and handed
+    to the storage engine as one batch by commit(). Staging is per thread, so
+    concurrent callers each commit only their own changes.
+
+    With a flush_interval, commit() only queues the batch and returns; a
+    background flusher writes everything queued at once every flush_interval
+    seconds, or as soon as batch_size records are waiting. flush() blocks
+    until every earlier commit is on disk.
+
+    snapshot() returns a consistent read view for reports that run while
+    others write; see read_views.
+    """
+
+    def __init__(self, data_dir: str = ".", engine: str = "json", durability: str = DURABILITY_NONE,
+                 flush_interval: Optional[float] = None, batch_size: int = 1000, **options):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown storage engine: {engine}")
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode: {durability}")
+        self.data_dir = data_dir
+        self.storage: StorageEngine = ENGINES[engine](data_dir, **options)
+        self.durability = durability
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._local = threading.local()  # Each thread stages its own changes
+
+        # Group commit state
+        self._queue: List[List[dict]] = []  # Committed groups waiting for the flusher
+        self._queued_records = 0
+        self._commit_seq = 0  # Number of commit() groups queued so far
+        self._flushed_seq = 0  # Number of groups written by the flusher
+        self._cond = threading.Condition()
+        self._flush_requested = False
+        self._stopping = False
+        self._flusher: Optional[threading.Thread] = None
+        self._flush_error: Optional[Exception] = None  # Why the flusher's last write failed, until one succeeds
+        self._io_lock = threading.Lock()  # Serializes writes to the storage engine
+        self._user_index: Optional[UserIndex] = None  # Built on first use, then kept current by put_user
+        self._index_lock = threading.Lock()
+        self._payment_schedule: Optional[PaymentSchedule] = None  # Built on first use, then kept current
+        self._versions = VersionStore()
+
+        self.load_data()  # Load data from storage at startup
+
+        if flush_interval is not None:
+            self._flusher = threading.Thread(target=self._flush_loop, name="db-flusher", daemon=True)
+            self._flusher.start()
+
+    @property
+    def _pending(self) -> List[dict]:
+        """Changes staged by the current thread since its last commit."""
+        pending = getattr(self._local, "pending", None)
+        if pending is None:
+            pending = self._local.pending = []
+        return pending
+
+    @property
+    def users(self):
+        """Users by username."""
+        return self.storage.users
+
+    @property
+    def accounts(self):
+        """Accounts by account ID."""
+        return self.storage.accounts
+
+    @property
+    def schedules(self) -> Dict[str, ScheduledPayment]:
+        """Scheduled payments by schedule ID."""
+        return self.storage.schedules
+
+    @instrumented("database")
     def load_data(self):
-        """Loads user and account data from JSON files (if they exist)."""
-        
-        # Load user data
-        if os.path.exists("users.json"):
-            try:
-                with open("users.json", "r") as f:
-                    user_data = json.load(f)
-                for username, data in user_data.items():
-                    self.users[username] = User(
-                        username=username,
-                        password_hash=bytes.fromhex(data["password_hash"]),
-                        salt=bytes.fromhex(data["salt"]),
-                        role=data["role"],
-                        account_id=data.get("account_id")  # May be None
-                    )
-            except (json.JSONDecodeError, KeyError) as e:
-                print(f"❌ Warning: Failed to load 'users.json'. Error: {e}")
-
-        # Load account data
-        if os.path.exists("accounts.json"):
-            try:
-                with open("accounts.json", "r") as f:
-                    account_data = json.load(f)
-                for account_id, data in account_data.items():
-                    self.accounts[account_id] = Account(
-                        account_id=account_id,
-                        owner_username=data["owner_username"],
-                        balance=data.get("balance", 0.0),  # Default to 0 if missing
-                        transactions=data.get("transactions", [])  # Default to empty list
-                    )
-            except (json.JSONDecodeError, KeyError) as e:
-                print(f"❌ Warning: Failed to load 'accounts.json'. Error: {e}")
-    
-    def save_data(self):
-        """Saves user and account data to JSON files."""
-        
-        # Prepare user data for JSON storage
-        user_data = {
-            username: {
-                "password_hash": user.password_hash.hex(),
-                "salt": user.salt.hex(),
-                "role": user.role,
-                "account_id": user.account_id
-            }
-            for username, user in self.users.items()
-        }
-        
+        """Loads user and account data from the storage engine."""
+        self.storage.load()
+        with self._index_lock:
+            self._user_index = None
+            self._payment_schedule = None
+        self._versions = VersionStore()  # Views of the data just replaced keep their own
+
+    @property
+    def user_index(self) -> UserIndex:
+        """Secondary indexes over the users, built with one scan on first use."""
+        with self._index_lock:
+            if self._user_index is None:
+                # items() lets the sharded engine scan without filling its cache
+                self._user_index = UserIndex(user for _, user in self.users.items())
+            return self._user_index
+
+    @property
+    def payment_schedule(self) -> PaymentSchedule:
+        """Scheduled payments ordered by due time, heapified on first use."""
+        with self._index_lock:
+            if self._payment_schedule is None:
+                self._payment_schedule = PaymentSchedule(self.schedules)
+            return self._payment_schedule
+
+    def snapshot(self) -> ReadView:
+        """A point-in-time view of users and accounts that later changes do not affect; close it when done."""
+        return ReadView(self.users, self.accounts, self._versions)
+
+    @instrumented("database")
+    def save_data(self) -> bool:
+        """Writes a full snapshot of everything committed so far."""
+        self.flush()
+        with self._io_lock:
+            return self.storage.save_snapshot()
+
+    # ========== CHANGE TRACKING ==========
+
+    def put_user(self, user: User):
+        """Stores a new user, or a changed copy replacing one, and stages it for the next commit.
+
+        Users are never changed in place, so read views can keep the old object.
+        """
+        with self._versions.lock:
+            self._versions.publish_user(user.username, self.users.get(user.username), user)
+            self.users[user.username] = user
+        with self._index_lock:
+            if self._user_index is not None:
+                self._user_index.update(user)
+        self._pending.append({
+            "op": "user",
+            "username": user.username,
+            "password_hash": user.password_hash.hex(),
+            "salt": user.salt.hex(),
+            "role": user.role,
+            "account_id": user.account_id
+        })
+
+    def put_account(self, account: Account):
+        """Stores a newly opened account and stages it for the next commit."""
+        with self._versions.lock:
+            self._versions.publish_account(account)
+            self.accounts[account.account_id] = account
+        self.storage.touch(account)
+        self._pending.append({
+            "op": "account",
+            "account_id": account.account_id,
+            "owner_username": account.owner_username,
+            "balance_cents": account.balance
+        })
+
+    @contextmanager
+    def versioned(self, *account_ids: str):
+        """Publishes the changes made to accounts inside the block to read views as one version.
+
+        The caller holds the accounts' locks for the whole block.
+        """
+        accounts = [account for account in map(self.accounts.get, account_ids) if account is not None]
+        self._versions.begin(accounts)
         try:
-            with open("users.json", "w") as f:
-                json.dump(user_data, f, indent=4)
-        except Exception as e:
-            print(f"❌ Error: Failed to save 'users.json'. {e}")
-
-        # Prepare account data for JSON storage
-        account_data = {
-            account_id: {
-                "owner_username": account.owner_username,
-                "balance": round(account.balance, 2),  # Ensure two decimal places
-                "transactions": account.transactions
-            }
-            for account_id, account in self.accounts.items()
-        }
-        
+            yield
+        finally:
+            self._versions.publish(accounts)
+
+    def log_transaction(self, account: Account, transaction: dict):
+        """Stages a transaction that was just added to an account's ledger."""
+        self.storage.touch(account)
+        self._pending.append({
+            "op": "tx",
+            "account_id": account.account_id,
+            "index": len(account.transactions) - 1,  # Position in the ledger, makes replay idempotent
+            "balance_cents": account.balance,
+            "transaction": transaction
+        })
+
+    def update_transaction(self, account: Account, index: int):
+        """Stages an in-place rewrite of a ledger entry (e.g. a re-encrypted description)."""
+        self.storage.touch(account)
+        self._pending.append({
+            "op": "tx_update",
+            "account_id": account.account_id,
+            "index": index,
+            "length": len(account.transactions),  # The account as of this record, for engines writing it back
+            "balance_cents": account.balance,
+            "transaction": account.transactions[index]
+        })
+
+    def put_schedule(self, schedule: ScheduledPayment):
+        """Stores a new or advanced scheduled payment and stages it for the next commit."""
+        payment_schedule = self.payment_schedule  # Built before the new entry so it is filed once
+        self.schedules[schedule.schedule_id] = schedule
+        payment_schedule.push(schedule)
+        self._pending.append({"op": "schedule", "schedule": schedule.to_record()})
+
+    def delete_schedule(self, schedule_id: str):
+        """Removes a scheduled payment and stages the removal for the next commit."""
+        schedule = self.schedules.pop(schedule_id, None)
+        if schedule is not None:
+            self.payment_schedule.remove(schedule)
+        self._pending.append({"op": "schedule_delete", "schedule_id": schedule_id})
+
+    def commit(self) -> bool:
+        """Persists every change staged since the last commit.
+
+        In group commit mode the changes are queued for the flusher and the
+        call returns immediately; use flush() to wait for them. Inside
+        deferred_commits() the changes stay staged instead.
+        """
+        if getattr(self._local, "deferred", False):
+            return True
+        records, self._local.pending = self._pending, []
+        if self._flusher is None:
+            with self._io_lock:
+                return self.storage.write(records, fsync=self.durability != DURABILITY_NONE)
+
+        with self._cond:
+            if records:
+                self._queue.append(records)
+                self._queued_records += len(records)
+            self._commit_seq += 1
+            if self._queued_records >= self.batch_size:
+                self._cond.notify_all()
+        return True
+
+    @contextmanager
+    def deferred_commits(self):
+        """Holds back this thread's commits and writes everything staged meanwhile as one batch on exit.
+
+        For replaying many operations at once: each operation's commit()
+        becomes a no-op, so a chunk of them costs a single storage write
+        (and fsync). Changes made inside are lost if the process dies
+        before the block ends; OSError is raised if they cannot be written.
+        """
+        if getattr(self._local, "deferred", False):
+            yield  # Nested: the outermost block commits
+            return
+        self._local.deferred = True
         try:
-            with open("accounts.json", "w") as f:
-                json.dump(account_data, f, indent=4)
-        except Exception as e:
-            print(f"❌ Error: Failed to save 'accounts.json'. {e}")
+            yield
+        finally:
+            self._local.deferred = False
+            committed = self.commit()
+        if not committed:
+            raise OSError("Failed to persist the deferred changes")
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until every commit made before this call has been written."""
+        if self._flusher is None:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            target = self._commit_seq
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._flushed_seq < target:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _flush_loop(self):
+        """Background thread writing queued commit groups in batches."""
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._stopping or self._flush_requested or self._queued_records >= self.batch_size,
+                    timeout=self.flush_interval
+                )
+                groups, self._queue = self._queue, []
+                self._queued_records = 0
+                target = self._commit_seq
+                self._flush_requested = False
+                stopping = self._stopping
+
+            try:
+                with self._io_lock:
+                    written = self._write_groups(groups)
+                error = None if written else OSError("The storage engine failed to write queued commits")
+            except Exception as e:  # The thread must not die with commits still queued
+                written, error = False, e
+            if written:
+                with self._cond:
+                    self._flushed_seq = target
+                    self._flush_error = None
+                    self._cond.notify_all()
+            else:
+                # Put the batch back in front so it is retried on the next tick (or reported by close())
+                with self._cond:
+                    self._queue[:0] = groups
+                    self._queued_records += sum(len(group) for group in groups)
+                    self._flush_error = error
+                if stopping:
+                    return
+                time.sleep(self.flush_interval)
+
+            if stopping:
+                return
+
+    def _write_groups(self, groups: List[List[dict]]) -> bool:
+        """Writes commit groups according to the durability policy."""
+        if not groups:
+            return True
+        if self.durability == DURABILITY_COMMIT:
+            for i, group in enumerate(groups):
+                if not self.storage.write(group, fsync=True):
+                    del groups[:i]  # Only the unwritten groups are retried
+                    return False
+            return True
+        records = [record for group in groups for record in group]
+        return self.storage.write(records, fsync=self.durability == DURABILITY_GROUP)
+
+    # ========== MAINTENANCE ==========
+
+    def history(self, account_id: str, since: Optional[str] = None, until: Optional[str] = None,
+                limit: Optional[int] = None) -> List[dict]:
+        """Returns an account's transactions with since <= timestamp < until."""
+        return self.storage.history(account_id, since, until, limit)
+
+    def compact(self) -> bool:
+        """Asks the storage engine to fold incremental writes into its main files."""
+        self.flush()
+        with self._io_lock:
+            return self.storage.compact(fsync=self.durability != DURABILITY_NONE)
+
+    def close(self):
+        """Flushes staged changes, stops the flusher and closes the storage engine.
+
+        Raises OSError if the flusher's final write failed: the changes still
+        queued then were not persisted.
+        """
+        self.commit()
+        if self._flusher is not None:
+            self.flush()
+            with self._cond:
+                self._stopping = True
+                self._cond.notify_all()
+            self._flusher.join()
+            self._flusher = None
+        self.storage.close()
+        if self._flush_error is not None:
+            raise OSError(f"Failed to persist {self._queued_records} queued changes") from self._flush_error
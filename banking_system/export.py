@@ -0,0 +1,272 @@
+"""Streaming statement and ledger exports as CSV or JSON lines, optionally gzipped.
+
+Exports read a Database.snapshot() read view, so a dump of a running bank
+is consistent: every transfer in it has both legs. Ledger entries are
+taken by a generator chunk_rows at a time and every chunk is written as
+soon as it is encoded, so memory stays flat however many transactions are
+exported; no file or ledger is ever built whole.
+
+Each chunk is encoded on its own: rows formatted, descriptions decrypted
+if asked for, and the result gzip-compressed as a separate gzip member (a
+concatenation of members is a valid gzip file). Chunks are independent,
+so with workers > 1 they are encoded on a process pool and written in
+order, with a few chunks per worker in flight at most.
+
+Rows carry the account ID and owner plus the ledger entry's dict form:
+timestamp, amount_cents, type, kind, description and, unless decrypting,
+the hex "encrypted" description. Decrypted descriptions replace the
+stored plaintext; entries that cannot be decrypted keep it and are counted.
+
+Usage:
+    python banking_system/export.py [--data-dir .] [--engine json] --output ledger.csv.gz
+        [--format csv] [--user alice --user bob] [--since 2024-01-01] [--until 2024-02-01]
+        [--decrypt] [--workers 4] [--chunk-rows 1000]
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from functools import partial
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from cryptography.fernet import InvalidToken
+from crypto_utils import CryptoManager
+from database import Database, ENGINES
+from models import TRANSACTION_KINDS, TRANSACTION_TYPES, to_epoch
+from read_views import AccountVersion
+
+FORMATS = ("csv", "jsonl")
+COLUMNS = ("account_id", "owner_username", "timestamp", "amount_cents", "type", "kind", "description", "encrypted")
+CHUNKS_PER_WORKER = 4  # Encoded chunks in flight per worker process
+
+
+@dataclass(slots=True)
+class LedgerChunk:
+    """Up to chunk_rows consecutive entries of one account, bound for one output file."""
+    target: int  # Index of the output file
+    header: bool  # First chunk of its file
+    account_id: str
+    owner_username: str
+    timestamps: Sequence[float]
+    amounts: Sequence[int]
+    types: bytes
+    kinds: bytes
+    descriptions: List[str]
+    encrypted: List[Optional[bytes]]
+
+
+def ledger_chunks(accounts: Iterable[AccountVersion], since: Optional[float] = None, until: Optional[float] = None,
+                  chunk_rows: int = 1000, separate: bool = False) -> Iterator[LedgerChunk]:
+    """The entries of each account with since <= timestamp < until, oldest first, chunk_rows at a time.
+
+    With `separate`, account i goes to file i and gets a chunk even if it
+    has no entries (so its file still has a header); otherwise every chunk
+    goes to file 0.
+    """
+    header = True
+    for target, account in enumerate(accounts):
+        if separate:
+            header = True
+        ledger = account.transactions
+        positions = account.positions(since, until)
+        while True:
+            batch = list(islice(positions, chunk_rows))
+            if not batch and not (separate and header):
+                break
+            if batch and batch[-1] - batch[0] == len(batch) - 1:  # Time order is ledger order: slice
+                rows = slice(batch[0], batch[-1] + 1)
+                timestamps, amounts = ledger.timestamps[rows], ledger.amounts[rows]
+                types, kinds, descriptions = ledger.types[rows], ledger.kinds[rows], ledger.descriptions[rows]
+            else:
+                timestamps = [ledger.timestamps[p] for p in batch]
+                amounts = [ledger.amounts[p] for p in batch]
+                types = bytes(ledger.types[p] for p in batch)
+                kinds = bytes(ledger.kinds[p] for p in batch)
+                descriptions = [ledger.descriptions[p] for p in batch]
+            yield LedgerChunk(target if separate else 0, header, account.account_id, account.owner_username,
+                              timestamps, amounts, bytes(types), bytes(kinds), descriptions,
+                              [ledger.encrypted(p) for p in batch])
+            header = False
+            if len(batch) < chunk_rows:
+                break
+    if header and not separate:  # Nothing in range: the file still gets its header
+        yield LedgerChunk(0, True, "", "", [], [], b"", b"", [], [])
+
+
+_cryptos: Dict[str, CryptoManager] = {}  # Per process, by keyring path
+
+
+def encode_chunk(chunk: LedgerChunk, fmt: str, compress: bool,
+                 keyring_path: Optional[str] = None) -> Tuple[bytes, int]:
+    """Formats a chunk (decrypting with the keyring at `keyring_path`, if given); returns (data, undecryptable).
+
+    A module-level function so process pools can pickle it.
+    """
+    crypto = None
+    if keyring_path is not None:
+        crypto = _cryptos.get(keyring_path)
+        if crypto is None:
+            crypto = _cryptos[keyring_path] = CryptoManager(keyring_path)
+    columns = COLUMNS if crypto is None else COLUMNS[:-1]
+
+    csv_format = fmt == "csv"
+    lines = [",".join(columns)] if csv_format and chunk.header else []
+    prefix = f"{_csv_field(chunk.account_id)},{_csv_field(chunk.owner_username)}"
+    undecryptable = 0
+    last_epoch, timestamp = None, ""
+    quoted: Dict[str, str] = {}  # Descriptions repeat a lot
+    for epoch, amount, type_code, kind_code, description, token in zip(
+            chunk.timestamps, chunk.amounts, chunk.types, chunk.kinds, chunk.descriptions, chunk.encrypted):
+        if epoch != last_epoch:  # Whole seconds, so isoformat matches TIMESTAMP_FORMAT at a third of the cost
+            last_epoch, timestamp = epoch, datetime.fromtimestamp(int(epoch)).isoformat(" ")
+        if crypto is not None and token:
+            try:
+                description = crypto.decrypt_data(token)
+            except (InvalidToken, ValueError):
+                undecryptable += 1
+        if csv_format:
+            field = quoted.get(description)
+            if field is None:
+                field = quoted[description] = _csv_field(description)
+            line = (f"{prefix},{timestamp},{amount},{TRANSACTION_TYPES[type_code]},"
+                    f"{TRANSACTION_KINDS[kind_code]},{field}")
+            lines.append(line if crypto is not None else f"{line},{token.hex() if token else ''}")
+        else:
+            record = {"account_id": chunk.account_id, "owner_username": chunk.owner_username, "timestamp": timestamp,
+                      "amount_cents": amount, "type": TRANSACTION_TYPES[type_code],
+                      "kind": TRANSACTION_KINDS[kind_code], "description": description}
+            if crypto is None and token:
+                record["encrypted"] = token.hex()  # Omitted when absent, like a ledger entry's dict form
+            lines.append(json.dumps(record, ensure_ascii=False))
+
+    data = ("\n".join(lines) + "\n").encode() if lines else b""
+    return (gzip.compress(data, compresslevel=6, mtime=0) if compress else data), undecryptable
+
+
+def _csv_field(text: str) -> str:
+    """A CSV field as csv.writer writes it: quoted only if it holds a comma, quote or line break."""
+    if "," in text or '"' in text or "\n" in text or "\r" in text:
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+
+def _encoded(chunks: Iterable[LedgerChunk], encode: Callable, pool: Optional[Executor],
+             window: int) -> Iterator[Tuple[int, int, Tuple[bytes, int]]]:
+    """(target, rows, encode result) per chunk in input order, with at most `window` chunks in flight."""
+    if pool is None:
+        for chunk in chunks:
+            yield chunk.target, len(chunk.amounts), encode(chunk)
+        return
+    pending = deque()
+    for chunk in chunks:
+        pending.append((chunk.target, len(chunk.amounts), pool.submit(encode, chunk)))
+        if len(pending) >= window:
+            target, rows, future = pending.popleft()
+            yield target, rows, future.result()
+    while pending:
+        target, rows, future = pending.popleft()
+        yield target, rows, future.result()
+
+
+def write_export(paths: List[str], chunks: Iterable[LedgerChunk], fmt: str = "csv", compress: bool = False,
+                 keyring_path: Optional[str] = None, workers: int = 0) -> dict:
+    """Encodes chunks and writes each to paths[chunk.target], in order.
+
+    Chunks must come grouped by target, as ledger_chunks yields them. Every
+    file is written under a temporary name and renamed into place once
+    complete. With workers > 1, chunks are encoded on that many processes.
+    Returns {"files", "rows", "bytes", "undecryptable"}.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    encode = partial(encode_chunk, fmt=fmt, compress=compress, keyring_path=keyring_path)
+    result = {"files": 0, "rows": 0, "bytes": 0, "undecryptable": 0}
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    current, out = None, None
+    try:
+        for target, rows, (data, undecryptable) in _encoded(chunks, encode, pool, workers * CHUNKS_PER_WORKER):
+            if target != current:
+                if out is not None:
+                    _finish(out, paths[current])
+                    result["files"] += 1
+                current, out = target, open(paths[target] + ".tmp", "wb")
+            out.write(data)
+            result["rows"] += rows
+            result["bytes"] += len(data)
+            result["undecryptable"] += undecryptable
+        if out is not None:
+            _finish(out, paths[current])
+            result["files"] += 1
+            out = None
+    finally:
+        if out is not None:
+            out.close()
+            os.remove(paths[current] + ".tmp")
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    return result
+
+
+def _finish(out, path: str):
+    out.close()
+    os.replace(out.name, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export statements or the whole ledger as CSV or JSON lines.")
+    parser.add_argument("--data-dir", default=".")
+    parser.add_argument("--engine", default="json", choices=list(ENGINES))
+    parser.add_argument("--output", required=True,
+                        help="File for the whole ledger; with --user, a directory for one statement per user")
+    parser.add_argument("--format", default="csv", choices=FORMATS)
+    parser.add_argument("--user", action="append", help="Export this client's statement (repeatable)")
+    parser.add_argument("--since", help="Earliest timestamp (inclusive)")
+    parser.add_argument("--until", help="Latest timestamp (exclusive)")
+    parser.add_argument("--gzip", action="store_true", help="Compress (implied by an --output ending in .gz)")
+    parser.add_argument("--decrypt", action="store_true", help="Write decrypted descriptions")
+    parser.add_argument("--workers", type=int, default=0, help="Encoding processes (0 = none)")
+    parser.add_argument("--chunk-rows", type=int, default=1000)
+    args = parser.parse_args()
+
+    compress = args.gzip or args.output.endswith(".gz")
+    since = None if args.since is None else to_epoch(args.since)
+    until = None if args.until is None else to_epoch(args.until)
+    keyring_path = os.path.join(args.data_dir, "keyring.json") if args.decrypt else None
+
+    db = Database(args.data_dir, engine=args.engine)
+    start = time.perf_counter()
+    try:
+        with db.snapshot() as view:
+            if args.user:
+                accounts = []
+                for username in args.user:
+                    user = view.user(username)
+                    account = view.account(user.account_id) if user is not None and user.account_id else None
+                    if account is None:
+                        print(f"❌ '{username}' not found or has no account.")
+                        sys.exit(1)
+                    accounts.append(account)
+                os.makedirs(args.output, exist_ok=True)
+                extension = "." + args.format + (".gz" if compress else "")
+                paths = [os.path.join(args.output, username + extension) for username in args.user]
+            else:
+                accounts, paths = view.accounts(), [args.output]
+            chunks = ledger_chunks(accounts, since, until, args.chunk_rows, separate=bool(args.user))
+            result = write_export(paths, chunks, args.format, compress, keyring_path, args.workers)
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"✅ Exported {result['rows']} transactions to {result['files']} file(s) in {elapsed:.2f}s "
+          f"({result['rows'] / max(elapsed, 1e-9):,.0f} rows/s, {result['bytes']:,} bytes).")
+    if result["undecryptable"]:
+        print(f"❌ {result['undecryptable']} descriptions could not be decrypted; their stored text was written.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Asynchronous JSON logging: callers enqueue records, a listener thread formats and writes them.
+
+configure_logging() puts a QueueHandler on the root logger, so a log call
+on the transfer path only appends the record to an in-memory queue; a
+QueueListener thread does the formatting and the terminal or disk I/O.
+Messages are formatted lazily: callers pass %-style arguments (wrapping
+values that are costly to render in lazy()), and a record is only
+rendered by the listener, after the level and sampling filters let it
+through.
+
+Each record becomes one JSON object per line with the timestamp, level,
+logger, thread and message plus any fields passed with extra={...}, e.g.
+{"event": "transfer", "amount_cents": 500}. Success events (INFO and
+below) can be sampled with sample_rate; warnings and errors are always
+kept. Sampled records carry "sample_rate" so counts can be scaled back.
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional, TextIO
+
+# Attributes every LogRecord has; anything else came from extra={...}
+_STANDARD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: Optional[QueueListener] = None
+_handler: Optional[QueueHandler] = None
+
+
+class lazy:
+    """Log argument rendered only if the record is written: lazy(format_cents, amount)."""
+    __slots__ = ("func", "args")
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def __str__(self) -> str:
+        return str(self.func(*self.args))
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats a record as a single-line JSON object."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="microseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SuccessSampler(logging.Filter):
+    """Keeps every warning and error but only a fraction of INFO/DEBUG records."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate >= 1.0:
+            return True
+        if random.random() >= self.rate:
+            return False
+        record.sample_rate = self.rate
+        return True
+
+
+class LazyQueueHandler(QueueHandler):
+    """QueueHandler that leaves the message unformatted for the listener thread.
+
+    The stock prepare() renders the message in the calling thread; here
+    the record is queued as is. Only tracebacks are rendered up front,
+    since the exception's frames may not outlive the call.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging(path: Optional[str] = None, level: int = logging.INFO, sample_rate: float = 1.0,
+                      stream: Optional[TextIO] = None) -> QueueListener:
+    """Routes all logging through a queue to a JSON-lines file (or stream, default stderr).
+
+    Replaces the root logger's handlers, so it can be called again to
+    reconfigure; the previous listener is drained and stopped first.
+    """
+    global _listener, _handler
+    stop_logging()
+
+    target = logging.FileHandler(path, encoding="utf-8") if path else logging.StreamHandler(stream or sys.stderr)
+    target.setFormatter(JSONFormatter())
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    _handler = LazyQueueHandler(records)
+    if sample_rate < 1.0:
+        _handler.addFilter(SuccessSampler(sample_rate))
+    _listener = QueueListener(records, target, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_handler)
+    root.setLevel(level)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Writes out queued records and stops the listener thread."""
+    global _listener, _handler
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+        _handler = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(stop_logging)
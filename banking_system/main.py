@@ -1,14 +1,58 @@
+"""ArinolaBank terminal.
+
+Usage:
+    python banking_system/main.py [--data-dir .] [--engine json] [--velocity-rule sender:3600:20:5000 ...]
+    python banking_system/main.py --batch commands.jsonl [--output results.jsonl] [--chunk-size 1000]
+
+Without --batch it shows the interactive menus. With --batch it replays a
+JSONL command file (see batch_mode.py), writes one JSON result per command
+and ends with a throughput summary.
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
 from bank_system import BankingSystem
-import logging
+from batch_mode import BatchRunner, print_summary
+from bulk_import import read_rows
+from database import Database, ENGINES
+from logging_setup import configure_logging
+from money import format_cents, to_cents
+from velocity import VelocityRule
 
-# Set up logging (but keep it simple, like a human might)
-logging.basicConfig(level=logging.INFO)
+LOG_FILE = "bank.log"  # JSON lines; the terminal only shows the menus
 
 def main():
     """Main function for the banking terminal."""
-    bank = BankingSystem()
-    
+    parser = argparse.ArgumentParser(description="ArinolaBank terminal.")
+    parser.add_argument("--data-dir", default=".")
+    parser.add_argument("--engine", default="json", choices=list(ENGINES))
+    parser.add_argument("--batch", help="Replay this JSONL command file instead of showing the menus")
+    parser.add_argument("--output", help="Write batch results to this file (default: stdout)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Batch commands persisted per commit")
+    parser.add_argument("--velocity-rule", action="append", default=[], type=VelocityRule.parse,
+                        help="Transfer limit scope:window_seconds:max_count:max_amount, e.g. sender:3600:20:5000; "
+                             "repeatable")
+    args = parser.parse_args()
+
+    configure_logging(LOG_FILE)
+    options = {"journal": True} if args.engine == "json" else {}
+    bank = BankingSystem(Database(args.data_dir, engine=args.engine, **options), velocity_rules=args.velocity_rule)
+
+    if args.batch:
+        try:
+            ok = run_batch(bank, args.batch, args.output, args.chunk_size)
+        finally:
+            bank.db.close()
+        sys.exit(0 if ok else 1)
+
+    # Payments that fell due while the bank was closed are made first, then on schedule
+    caught_up = bank.run_due_payments()
+    bank.start_scheduler()
+
     print("\nWelcome to ArinolaBank Terminal!")
+    if caught_up["paid"] or caught_up["failed"]:
+        print(f"⏰ Scheduled payments caught up: {caught_up['paid']} made, {caught_up['failed']} failed.")
     
     while True:
         print("\n----------------------")
@@ -25,10 +69,28 @@ def main():
             login_user(bank)
         elif choice == '3':
             print("Exiting... Have a great day!")
+            bank.stop_scheduler()
+            bank.db.close()
             break
         else:
             print("Invalid option. Try again.")
 
+def run_batch(bank, path, output=None, chunk_size=1000):
+    """Replays a JSONL command file; returns False if it could not be read or persisted."""
+    out = open(output, "w") if output else sys.stdout
+    report = sys.stdout if output else sys.stderr  # Keep stdout pure JSONL when results go there
+    try:
+        with open(path, "r") as commands:
+            summary = BatchRunner(bank, out).run(commands, chunk_size)
+    except OSError as e:
+        print(f"❌ Batch failed: {e}", file=report)
+        return False
+    finally:
+        if output:
+            out.close()
+    print_summary(summary, report)
+    return True
+
 def register_user(bank):
     """Handles user registration."""
     print("\n--- User Registration ---")
@@ -56,61 +118,71 @@ def login_user(bank):
     username = input("Enter your username: ").strip()
     password = input("Enter your password: ").strip()
     
-    if bank.login(username, password):
+    session = bank.login(username, password)
+    if session:
         print(f"✅ Welcome back, {username}!")
-        handle_logged_in_user(bank)
+        handle_logged_in_user(bank, session)
     else:
         print("❌ Login failed. Please check your credentials.")
 
-def handle_logged_in_user(bank):
+def handle_logged_in_user(bank, session):
     """Routes users to their appropriate menu based on role."""
-    if bank.current_user.role == "client":
-        handle_client_menu(bank)  # Rename the existing menu function
-    elif bank.current_user.role == "employee":
-        handle_employee_menu(bank)
-    elif bank.current_user.role == "admin":
-        handle_admin_menu(bank)
-
-def handle_client_menu(bank):
+    if session.role == "client":
+        handle_client_menu(bank, session)  # Rename the existing menu function
+    elif session.role == "employee":
+        handle_employee_menu(bank, session)
+    elif session.role == "admin":
+        handle_admin_menu(bank, session)
+
+def handle_client_menu(bank, session):
     """Handles client operations."""
     while True:
         print("\n=== Client Dashboard ===")
         print("1. View Balance")
         print("2. Transfer Money")
         print("3. View Transactions")
-        print("4. Logout")
+        print("4. Batch Transfer from File")
+        print("5. Scheduled Payments")
+        print("6. Export Statement")
+        print("7. Logout")
         
         choice = input("Choose an option: ").strip()
         
         if choice == '1':
-            show_balance(bank)
+            show_balance(bank, session)
         elif choice == '2':
-            transfer_money(bank)
+            transfer_money(bank, session)
         elif choice == '3':
-            view_transactions(bank)
+            view_transactions(bank, session)
         elif choice == '4':
+            batch_transfer(bank, session)
+        elif choice == '5':
+            scheduled_payments(bank, session)
+        elif choice == '6':
+            export_statement(bank, session)
+        elif choice == '7':
             print("Logging out...")
-            bank.current_user = None
+            bank.logout(session)
             break
         else:
             print("❌ Invalid choice. Please try again.")
 
-def show_balance(bank):
+def show_balance(bank, session):
     """Displays the user's account balance."""
-    user = bank.current_user
+    user = session.user
     if not user or user.role != "client":
         print("❌ Only clients can view balances.")
         return
 
     account = bank.db.accounts.get(user.account_id)
     if account:
-        print(f"💰 Current Balance: ${account.balance:.2f}")
+        print(f"💰 Current Balance: ${format_cents(account.balance)}")
     else:
         print("❌ Account not found.")
 
-def transfer_money(bank):
+def transfer_money(bank, session):
     """Handles money transfers."""
-    user = bank.current_user
+    user = session.user
     if not user or user.role != "client":
         print("❌ Only clients can transfer money.")
         return
@@ -118,7 +190,7 @@ def transfer_money(bank):
     recipient = input("Enter recipient's username: ").strip()
     
     try:
-        amount = float(input("Enter amount to transfer: ").strip())
+        amount = to_cents(input("Enter amount to transfer: "))
         if amount <= 0:
             print("❌ Amount must be greater than zero.")
             return
@@ -128,51 +200,177 @@ def transfer_money(bank):
 
     description = input("Enter a description: ").strip()
     
-    if bank.transfer_money(recipient, amount, description):
-        print(f"✅ Transfer of ${amount:.2f} to '{recipient}' successful!")
+    if bank.transfer_money(session, recipient, amount, description):
+        print(f"✅ Transfer of ${format_cents(amount)} to '{recipient}' successful!")
     else:
         print("❌ Transfer failed. Check your balance and recipient details.")
 
-def view_transactions(bank):
-    """Displays transaction history."""
-    user = bank.current_user
+def scheduled_payments(bank, session):
+    """Lists a client's scheduled payments and lets them add or cancel one."""
+    payments = bank.list_scheduled_payments(session)
+    if payments is None:
+        print("❌ Only clients can schedule payments.")
+        return
+
+    print("\n⏰ Scheduled Payments:")
+    if not payments:
+        print("  None.")
+    for number, payment in enumerate(payments, start=1):
+        due = datetime.fromtimestamp(payment["next_run"]).strftime("%Y-%m-%d %H:%M")
+        print(f"{number}. ${format_cents(payment['amount_cents'])} to '{payment['recipient_username']}' "
+              f"| next {due} | {payment['interval'] or 'once'} | {payment['description']}")
+
+    choice = input("\n(n)ew payment, (c)ancel one, or Enter to go back: ").strip().lower()
+    if choice == "n":
+        schedule_new_payment(bank, session)
+    elif choice == "c":
+        number = input("Number of the payment to cancel: ").strip()
+        if not number.isdigit() or not 1 <= int(number) <= len(payments):
+            print("❌ Invalid choice!")
+            return
+        if bank.cancel_scheduled_payment(session, payments[int(number) - 1]["schedule_id"]):
+            print("✅ Scheduled payment cancelled.")
+        else:
+            print("❌ Cancellation failed!")
+
+def schedule_new_payment(bank, session):
+    """Schedules a one-off or recurring transfer."""
+    recipient = input("Enter recipient's username: ").strip()
+    try:
+        amount = to_cents(input("Enter amount: "))
+    except ValueError:
+        print("❌ Invalid amount entered.")
+        return
+    first_run = input("First payment date (YYYY-MM-DD or YYYY-MM-DD HH:MM): ").strip()
+    interval = input("Repeat (daily/weekly/monthly, blank for once): ").strip().lower() or None
+    day = None
+    if interval == "monthly" and input("On the last day of every month? (y/N): ").strip().lower() == "y":
+        day = 31
+    description = input("Enter a description: ").strip()
+
+    if bank.schedule_payment(session, recipient, amount, first_run, interval, description, day):
+        print(f"✅ Payment of ${format_cents(amount)} to '{recipient}' scheduled!")
+    else:
+        print("❌ Scheduling failed. Check the recipient, amount, date and interval.")
+
+def read_amount_rows(path):
+    """Reads CSV/JSONL rows and converts their 'amount' column to cents."""
+    rows = []
+    for row in read_rows(path):
+        try:
+            row["amount"] = to_cents(row.get("amount", ""))
+        except ValueError:
+            pass  # Left as is; the bank reports it as an invalid amount
+        rows.append(row)
+    return rows
+
+def print_row_errors(errors, key):
+    """Prints the first rejected rows of a bulk operation."""
+    for error in errors[:20]:
+        where = f"row {error[key]}: " if error[key] is not None else ""
+        print(f"  {where}{error['error']}")
+    if len(errors) > 20:
+        print(f"  ... and {len(errors) - 20} more")
+
+def batch_transfer(bank, session):
+    """Makes all transfers listed in a file (recipient,amount,description), or none of them."""
+    path = input("Enter path of the CSV/JSONL file: ").strip()
+    try:
+        transfers = read_amount_rows(path)
+    except OSError as e:
+        print(f"❌ Cannot read '{path}': {e}")
+        return
+
+    result = bank.transfer_batch(session, transfers)
+    if result["ok"]:
+        print(f"✅ {result['transferred']} transfers totalling ${format_cents(result['total'])} completed!")
+    else:
+        print("❌ Batch transfer failed; nothing was transferred.")
+        print_row_errors(result["errors"], "index")
+
+def view_transactions(bank, session, page_size=20):
+    """Displays transaction history one page at a time."""
+    user = session.user
     if not user or user.role != "client":
         print("❌ Only clients can view transactions.")
         return
 
-    account = bank.db.accounts.get(user.account_id)
-    if not account or not account.transactions:
-        print("❌ No transactions found.")
-        return
+    since = input("From date (YYYY-MM-DD, blank for all): ").strip() or None
+    until = input("Until date (YYYY-MM-DD, exclusive, blank for now): ").strip() or None
 
+    cursor = None
     print("\n📜 Transaction History:")
-    for tx in account.transactions:
-        print(f"- {tx['timestamp']} | {tx['type'].upper()} | ${tx['amount']:.2f}")
-        print(f"  Description: {tx['description']}")
-        print("  ----------------------")
+    while True:
+        page = bank.get_transactions(session, since=since, until=until, limit=page_size, cursor=cursor)
+        if page is None:
+            print("❌ Invalid date entered.")
+            return
+        if not page["transactions"] and cursor is None:
+            print("❌ No transactions found.")
+            return
 
-def handle_employee_menu(bank):
+        for tx in page["transactions"]:
+            print(f"- {tx['timestamp']} | {tx['type'].upper()} | ${format_cents(tx['amount_cents'])}")
+            print(f"  Description: {tx['description']}")
+            print("  ----------------------")
+
+        cursor = page["next_cursor"]
+        if cursor is None or input("Press Enter for more, or 'q' to go back: ").strip().lower() == "q":
+            return
+
+def ask_export_options():
+    """Prompts for an export's file, format and range; None if the format is invalid."""
+    path = input("Export to file (end with .gz to compress): ").strip()
+    fmt = input("Format (csv/jsonl, default csv): ").strip().lower() or "csv"
+    if not path or fmt not in ("csv", "jsonl"):
+        print("❌ A file name and a format of csv or jsonl are required!")
+        return None
+    since = input("From date (YYYY-MM-DD, blank for all): ").strip() or None
+    until = input("Until date (YYYY-MM-DD, exclusive, blank for now): ").strip() or None
+    decrypt = input("Decrypt descriptions? (y/N): ").strip().lower() == "y"
+    return path, fmt, since, until, decrypt
+
+def print_export_result(result, path):
+    if result is None:
+        print("❌ Export failed!")
+        return
+    print(f"✅ {result['rows']} transactions written to '{path}'.")
+    if result["undecryptable"]:
+        print(f"❌ {result['undecryptable']} descriptions could not be decrypted; their stored text was written.")
+
+def export_statement(bank, session):
+    """Writes the client's transactions to a CSV or JSONL file."""
+    options = ask_export_options()
+    if options:
+        path, fmt, since, until, decrypt = options
+        print_export_result(bank.export_statement(session, path, fmt=fmt, since=since, until=until,
+                                                  decrypt=decrypt), path)
+
+def handle_employee_menu(bank, session):
     """Handles employee operations."""
     while True:
         print("\n=== Employee Dashboard ===")
         print("1. Process Customer Transaction")
         print("2. View Customer Info")
-        print("3. Logout")
+        print("3. Post Transactions from File")
+        print("4. Logout")
         
         choice = input("Choose an option: ").strip()
         
         if choice == "1":
-            process_customer_transaction(bank)
+            process_customer_transaction(bank, session)
         elif choice == "2":
-            view_customer_info(bank)
+            view_customer_info(bank, session)
         elif choice == "3":
+            post_transactions_from_file(bank, session)
+        elif choice == "4":
             print("Logging out...")
-            bank.current_user = None
+            bank.logout(session)
             break
         else:
             print("❌ Invalid choice!")
 
-def process_customer_transaction(bank):
+def process_customer_transaction(bank, session):
     """Handle customer deposits/withdrawals."""
     print("\n--- Process Transaction ---")
     
@@ -188,7 +386,7 @@ def process_customer_transaction(bank):
         return
         
     try:
-        amount = float(input("Enter amount: $").strip())
+        amount = to_cents(input("Enter amount: $"))
         if amount <= 0:
             print("❌ Amount must be positive!")
             return
@@ -199,15 +397,31 @@ def process_customer_transaction(bank):
     description = input("Enter transaction description: ").strip()
     
     transaction_type = "deposit" if type_choice == "1" else "withdrawal"
-    if bank.process_transaction(username, amount, transaction_type, description):
+    if bank.process_transaction(session, username, amount, transaction_type, description):
         print(f"✅ {transaction_type.title()} processed successfully!")
     else:
         print("❌ Transaction failed!")
 
-def view_customer_info(bank):
+def post_transactions_from_file(bank, session):
+    """Posts every deposit/withdrawal in a file (username,amount,type,description), or none of them."""
+    path = input("Enter path of the CSV/JSONL file: ").strip()
+    try:
+        rows = read_amount_rows(path)
+    except OSError as e:
+        print(f"❌ Cannot read '{path}': {e}")
+        return
+
+    result = bank.process_transactions_bulk(session, rows)
+    if result["ok"]:
+        print(f"✅ {result['processed']} transactions posted!")
+    else:
+        print("❌ Posting failed; no transactions were posted.")
+        print_row_errors(result["errors"], "row")
+
+def view_customer_info(bank, session):
     """Display customer account information."""
     username = input("\nEnter customer username: ").strip()
-    info = bank.get_customer_info(username)
+    info = bank.get_customer_info(session, username)
     
     if info:
         print("\n--- Customer Information ---")
@@ -215,48 +429,80 @@ def view_customer_info(bank):
         print(f"Role: {info['role']}")
         if "account_id" in info:
             print(f"Account ID: {info['account_id']}")
-            print(f"Balance: ${info['balance']:.2f}")
+            print(f"Balance: ${format_cents(info['balance'])}")
             print(f"Transaction count: {info['transaction_count']}")
+            print(f"Last activity: {info['last_activity'] or 'never'}")
     else:
         print("❌ Customer not found or access denied!")
 
-def handle_admin_menu(bank):
+def handle_admin_menu(bank, session):
     """Handles admin operations."""
     while True:
         print("\n=== Admin Dashboard ===")
         print("1. List All Users")
         print("2. Change User Role")
         print("3. View Customer Info")  # Admins can do everything employees can
-        print("4. Logout")
+        print("4. View Metrics")
+        print("5. Audit Ledgers")
+        print("6. Export Ledger")
+        print("7. Logout")
         
         choice = input("Choose an option: ").strip()
         
         if choice == "1":
-            list_all_users(bank)
+            list_all_users(bank, session)
         elif choice == "2":
-            change_user_role(bank)
+            change_user_role(bank, session)
         elif choice == "3":
-            view_customer_info(bank)
+            view_customer_info(bank, session)
         elif choice == "4":
+            view_metrics(bank, session)
+        elif choice == "5":
+            audit_ledgers(bank, session)
+        elif choice == "6":
+            export_ledger(bank, session)
+        elif choice == "7":
             print("Logging out...")
-            bank.current_user = None
+            bank.logout(session)
             break
         else:
             print("❌ Invalid choice!")
 
-def list_all_users(bank):
-    """Display all users in the system."""
-    users = bank.list_users()
-    
-    if users:
-        print("\n--- All Users ---")
-        for user in users:
+def list_all_users(bank, session, page_size=20):
+    """Display users one page at a time, optionally filtered by role and username prefix."""
+    role_map = {"1": "client", "2": "employee", "3": "admin"}
+    role_choice = input("Role (1. Client, 2. Employee, 3. Admin, blank for all): ").strip()
+    if role_choice and role_choice not in role_map:
+        print("❌ Invalid role choice!")
+        return
+    role = role_map.get(role_choice)
+    prefix = input("Username starts with (blank for all): ").strip()
+
+    total = bank.count_users(session, role=role)
+    if total is None:
+        print("❌ Access denied!")
+        return
+
+    cursor = None
+    print(f"\n--- Users ({total} {role + 's' if role else 'in total'}) ---")
+    while True:
+        page = bank.list_users(session, role=role, prefix=prefix, limit=page_size, cursor=cursor)
+        if page is None:
+            print("❌ Access denied!")
+            return
+        if not page["users"] and cursor is None:
+            print("❌ No users found!")
+            return
+
+        for user in page["users"]:
             account_status = "Has Account" if user["has_account"] else "No Account"
             print(f"• {user['username']} ({user['role']}) - {account_status}")
-    else:
-        print("❌ Access denied or no users found!")
 
-def change_user_role(bank):
+        cursor = page["next_cursor"]
+        if cursor is None or input("Press Enter for more, or 'q' to go back: ").strip().lower() == "q":
+            return
+
+def change_user_role(bank, session):
     """Change a user's role."""
     print("\n--- Change User Role ---")
     username = input("Enter username: ").strip()
@@ -272,10 +518,57 @@ def change_user_role(bank):
         print("❌ Invalid role choice!")
         return
         
-    if bank.change_user_role(username, role_map[role_choice]):
+    if bank.change_user_role(session, username, role_map[role_choice]):
         print(f"✅ Role updated for '{username}'!")
     else:
         print("❌ Role change failed!")
 
+def view_metrics(bank, session):
+    """Show call counts and latencies per operation, optionally exporting them for Prometheus."""
+    rows = bank.get_metrics(session)
+    if rows is None:
+        print("❌ Access denied!")
+        return
+
+    print("\n--- Metrics ---")
+    print(f"{'operation':<36} {'outcome':<20} {'calls':>8} {'mean ms':>10} {'p95 ms':>10}")
+    for row in rows:
+        operation = f"{row['component']}.{row['operation']}"
+        print(f"{operation:<36} {row['outcome']:<20} {row['count']:>8} {row['mean_ms']:>10.3f} "
+              f"{'<=' + format(row['p95_ms'], 'g'):>10}")
+
+    path = input("\nExport to Prometheus text file (path, Enter to skip): ").strip()
+    if path:
+        if bank.export_metrics(session, path):
+            print(f"✅ Metrics written to '{path}'.")
+        else:
+            print("❌ Could not write the metrics file!")
+
+def audit_ledgers(bank, session):
+    """Check every balance against its ledger while the bank keeps running."""
+    report = bank.audit_ledgers(session)
+    if report is None:
+        print("❌ Access denied!")
+        return
+
+    print(f"\n--- Ledger Audit ({report['accounts']} accounts, {report['transactions']} transactions) ---")
+    print(f"Total balance: ${format_cents(report['total_balance'])}")
+    if report["transfer_credits"] != report["transfer_debits"]:
+        print(f"❌ Transfer credits ${format_cents(report['transfer_credits'])} != "
+              f"debits ${format_cents(report['transfer_debits'])}")
+    for mismatch in report["mismatches"][:20]:
+        print(f"❌ {mismatch['owner_username']}: stored ${format_cents(mismatch['stored'])}, "
+              f"ledger says ${format_cents(mismatch['computed'])}")
+    if report["transfer_credits"] == report["transfer_debits"] and not report["mismatches"]:
+        print("✅ All balances match their ledgers.")
+
+def export_ledger(bank, session):
+    """Writes every account's transactions to one CSV or JSONL file."""
+    options = ask_export_options()
+    if options:
+        path, fmt, since, until, decrypt = options
+        print_export_result(bank.export_ledger(session, path, fmt, since, until, decrypt,
+                                               workers=os.cpu_count() or 1), path)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,212 @@
+"""Operation metrics: latency histograms and outcome counters with Prometheus text export.
+
+Every instrumented call is recorded under (component, operation, outcome)
+into a table owned by the calling thread, so the hot path takes no lock:
+one dict lookup, a bisect over the bucket bounds and two increments.
+Readers sum the tables of all threads; tables of threads that have ended
+are folded into a shared total so short-lived connection threads do not
+accumulate.
+
+The outcome of a call is "success" unless the function returns False
+("failure") or raises ("error"). Code names a more specific outcome for
+the innermost instrumented call with note_outcome(), e.g.
+note_outcome(INSUFFICIENT_FUNDS) before returning False; functions that
+signal failure by returning None must always do so.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Dict, List, Optional, Tuple
+
+# Upper bounds in seconds; PBKDF2 (~50ms) and snapshot writes land in the upper buckets
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+SUCCESS = "success"
+FAILURE = "failure"
+ERROR = "error"
+INSUFFICIENT_FUNDS = "insufficient_funds"
+UNKNOWN_USER = "unknown_user"
+DENIED = "denied"
+INVALID = "invalid"
+VELOCITY_LIMIT = "velocity_limit"
+
+Key = Tuple[str, str, str]  # (component, operation, outcome)
+
+
+class MetricsRegistry:
+    """Per-thread latency histograms keyed by (component, operation, outcome)."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.enabled = True
+        self._local = threading.local()
+        self._tables: List[Tuple[threading.Thread, Dict[Key, list]]] = []
+        self._retired: Dict[Key, list] = {}  # Totals of threads that have ended
+        self._tables_lock = threading.Lock()  # Taken when a thread records for the first time, and by readers
+
+    # ========== RECORDING ==========
+
+    def _table(self) -> Dict[Key, list]:
+        table = getattr(self._local, "table", None)
+        if table is None:
+            table = self._local.table = {}
+            self._local.outcomes = []
+            with self._tables_lock:
+                self._tables.append((threading.current_thread(), table))
+        return table
+
+    def observe(self, component: str, operation: str, outcome: str, seconds: float):
+        """Records one call. Each series is [count per bucket..., count above the last bucket, total seconds]."""
+        table = self._table()
+        series = table.get((component, operation, outcome))
+        if series is None:
+            series = table[(component, operation, outcome)] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, seconds)] += 1
+        series[-1] += seconds
+
+    def note_outcome(self, outcome: str):
+        """Names the outcome of the innermost instrumented call running on this thread."""
+        outcomes = getattr(self._local, "outcomes", None)
+        if outcomes:
+            outcomes[-1] = outcome
+
+    def last_outcome(self) -> Optional[str]:
+        """Outcome of the instrumented call that most recently finished on this thread."""
+        return getattr(self._local, "last_outcome", None)
+
+    def instrumented(self, component: str, operation: Optional[str] = None):
+        """Decorator timing every call of a function as component/operation (default: the function name)."""
+        def decorate(func):
+            name = operation or func.__name__
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                self._table()
+                outcomes = self._local.outcomes
+                outcomes.append(None)
+                outcome = ERROR
+                start = time.perf_counter()
+                try:
+                    result = func(*args, **kwargs)
+                    outcome = outcomes[-1] or (FAILURE if result is False else SUCCESS)
+                    return result
+                finally:
+                    elapsed = time.perf_counter() - start
+                    outcomes.pop()
+                    self._local.last_outcome = outcome
+                    self.observe(component, name, outcome, elapsed)
+            return wrapper
+        return decorate
+
+    # ========== READING ==========
+
+    def collect(self) -> Dict[Key, list]:
+        """Sums the series of every thread. Counts of calls still in flight on other threads may lag by one."""
+        with self._tables_lock:
+            alive = []
+            for thread, table in self._tables:
+                if thread.is_alive():
+                    alive.append((thread, table))
+                else:
+                    self._merge(self._retired, table)
+            self._tables = alive
+            totals = {key: list(series) for key, series in self._retired.items()}
+            for _, table in alive:
+                self._merge(totals, table)
+        return totals
+
+    @staticmethod
+    def _merge(into: Dict[Key, list], table: Dict[Key, list]):
+        for key, series in list(table.items()):
+            target = into.get(key)
+            if target is None:
+                into[key] = list(series)
+            else:
+                for i, value in enumerate(series):
+                    target[i] += value
+
+    def reset(self):
+        """Forgets everything recorded so far."""
+        with self._tables_lock:
+            for _, table in self._tables:
+                table.clear()
+            self._retired.clear()
+
+    def summary(self) -> List[dict]:
+        """One row per series with count, mean and estimated percentiles, sorted by component and operation."""
+        rows = []
+        for (component, operation, outcome), series in sorted(self.collect().items()):
+            count = sum(series[:-1])
+            if not count:
+                continue
+            rows.append({
+                "component": component,
+                "operation": operation,
+                "outcome": outcome,
+                "count": count,
+                "total_seconds": series[-1],
+                "mean_ms": series[-1] / count * 1000,
+                "p50_ms": self._quantile(series, count, 0.5) * 1000,
+                "p95_ms": self._quantile(series, count, 0.95) * 1000
+            })
+        return rows
+
+    def _quantile(self, series: list, count: int, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (the largest bound if it lies above all of them)."""
+        seen = 0
+        for bound, bucket_count in zip(self.buckets, series):
+            seen += bucket_count
+            if seen >= q * count:
+                return bound
+        return self.buckets[-1]
+
+    # ========== EXPORT ==========
+
+    def to_prometheus(self, prefix: str = "bank") -> str:
+        """Renders every series in the Prometheus text exposition format."""
+        totals = sorted(self.collect().items())
+        lines = [
+            f"# HELP {prefix}_operation_duration_seconds Latency of bank operations by outcome.",
+            f"# TYPE {prefix}_operation_duration_seconds histogram"
+        ]
+        for key, series in totals:
+            labels = _labels(key)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, series):
+                cumulative += bucket_count
+                lines.append(f'{prefix}_operation_duration_seconds_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{prefix}_operation_duration_seconds_bucket{{{labels},le="+Inf"}} {cumulative}')
+            lines.append(f"{prefix}_operation_duration_seconds_sum{{{labels}}} {series[-1]!r}")
+            lines.append(f"{prefix}_operation_duration_seconds_count{{{labels}}} {cumulative}")
+        lines.append(f"# HELP {prefix}_operations_total Completed bank operations by outcome.")
+        lines.append(f"# TYPE {prefix}_operations_total counter")
+        for key, series in totals:
+            lines.append(f"{prefix}_operations_total{{{_labels(key)}}} {sum(series[:-1])}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str, prefix: str = "bank"):
+        """Writes the metrics to a text file atomically, e.g. for node_exporter's textfile collector."""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(self.to_prometheus(prefix))
+        os.replace(temp_path, path)
+
+
+def _labels(key: Key) -> str:
+    names = ("component", "operation", "outcome")
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, key))
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Process-wide registry used by the instrumented modules
+METRICS = MetricsRegistry()
+instrumented = METRICS.instrumented
+note_outcome = METRICS.note_outcome
+last_outcome = METRICS.last_outcome
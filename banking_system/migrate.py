@@ -0,0 +1,67 @@
+"""One-shot migration from the users.json/accounts.json layout to SQLite or sharded files.
+
+Usage:
+    python banking_system/migrate.py [--data-dir DIR] [--output bank.db]
+    python banking_system/migrate.py --to sharded [--data-dir DIR]
+"""
+import argparse
+import os
+import sys
+from storage import JSONStorage
+from sqlite_storage import SQLiteStorage
+from sharded_storage import ShardedStorage
+
+def migrate_json_to_sqlite(data_dir: str = ".", filename: str = "bank.db") -> tuple:
+    """Copies every user, account, transaction and scheduled payment from the JSON files into SQLite.
+
+    Pending journal records are replayed first, so the migrated data matches
+    what the bank would have loaded. Returns (user count, account count).
+    """
+    source = JSONStorage(data_dir, journal=True)
+    source.load()
+
+    target = SQLiteStorage(data_dir, filename)
+    target.load()
+    try:
+        target.import_data(source.users.values(), source.accounts.values(), source.schedules.values())
+    finally:
+        target.close()
+    return len(source.users), len(source.accounts)
+
+def migrate_json_to_sharded(data_dir: str = ".") -> tuple:
+    """Writes every user and account from the JSON files into the sharded layout (data_dir/shards).
+
+    Returns (user count, account count).
+    """
+    source = JSONStorage(data_dir, journal=True)
+    source.load()
+
+    target = ShardedStorage(data_dir)
+    target.load()
+    try:
+        target.import_data(source.users.values(), source.accounts.values(), source.schedules.values())
+    finally:
+        target.close()
+    return len(source.users), len(source.accounts)
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate JSON bank data to SQLite or sharded files.")
+    parser.add_argument("--to", default="sqlite", choices=["sqlite", "sharded"], help="Target storage engine")
+    parser.add_argument("--data-dir", default=".", help="Directory holding users.json and accounts.json")
+    parser.add_argument("--output", default="bank.db", help="SQLite file name, created inside the data directory")
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(args.data_dir, "users.json")):
+        print(f"❌ No users.json found in '{args.data_dir}'.")
+        sys.exit(1)
+
+    if args.to == "sharded":
+        users, accounts = migrate_json_to_sharded(args.data_dir)
+        target = os.path.join(args.data_dir, "shards")
+    else:
+        users, accounts = migrate_json_to_sqlite(args.data_dir, args.output)
+        target = os.path.join(args.data_dir, args.output)
+    print(f"✅ Migrated {users} users and {accounts} accounts to '{target}'.")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,28 @@
+import logging
+import sys
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from calendar import monthrange
 from dataclasses import dataclass
-from datetime import datetime
-from typing import List, Optional
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+from logging_setup import lazy
+from money import format_cents, legacy_to_cents
 
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+TRANSACTION_TYPES = ("credit", "debit")  # Position is the 1-byte type code stored in a Ledger
+TYPE_CODES = {name: code for code, name in enumerate(TRANSACTION_TYPES)}
+# What caused an entry; transfers always come in debit/credit pairs, interest and fees are end-of-day postings
+TRANSACTION_KINDS = ("transfer", "deposit", "withdrawal", "interest", "fee")
+KIND_CODES = {name: code for code, name in enumerate(TRANSACTION_KINDS)}
+SCHEDULE_INTERVALS = ("daily", "weekly", "monthly")  # How often a standing order repeats
 
-@dataclass
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
 class User:
     """Represents a user in the banking system."""
     username: str
@@ -13,42 +32,392 @@ class User:
     account_id: Optional[str] = None  # Clients have accounts, employees/admins may not
 
 
-@dataclass
+class Ledger:
+    """Columnar, append-only transaction history of one account.
+
+    Instead of one dict per entry, each field lives in its own column:
+    epoch timestamps and integer-cent amounts in typed arrays, 1-byte type
+    and kind codes, interned description strings, and encrypted descriptions
+    packed into one shared byte buffer. Reading an entry (by index or
+    iteration) builds a dict on the fly with "timestamp", "amount_cents",
+    "type", "kind", "description" and, if present, "encrypted".
+
+    Time-range queries bisect the timestamp column directly while entries
+    were appended in time order (the normal case). If the clock ever went
+    backwards, a sorted index of positions is built on first use and kept
+    up to date on append.
+    """
+
+    __slots__ = ("timestamps", "amounts", "types", "kinds", "descriptions", "_enc_starts", "_enc_lengths",
+                 "_enc_blob", "_enc_dead", "_rewrites", "_in_order", "_order")
+
+    def __init__(self, transactions: Iterable[dict] = ()):
+        self.timestamps = array("d")  # Seconds since the epoch
+        self.amounts = array("q")  # Cents
+        self.types = array("b")  # Index into TRANSACTION_TYPES
+        self.kinds = array("b")  # Index into TRANSACTION_KINDS
+        self.descriptions: List[str] = []  # Interned, so repeated descriptions are stored once
+        self._enc_starts = array("q")  # Offset of each encrypted description in _enc_blob
+        self._enc_lengths = array("l")  # 0 when an entry has no encrypted description
+        self._enc_blob = bytearray()
+        self._enc_dead = 0  # Bytes of _enc_blob left behind by rewritten tokens
+        self._rewrites = 0  # Odd while a token is being rewritten
+        self._in_order = True  # Timestamps are non-decreasing
+        self._order: Optional[array] = None  # Positions sorted by (timestamp, position), once needed
+        for transaction in transactions:
+            self.append(transaction)
+
+    @classmethod
+    def from_columns(cls, timestamps: array, amounts: array, types: array, kinds: array, descriptions: List[str],
+                     encrypted_lengths: Iterable[int] = (), encrypted_blob: bytes = b"") -> "Ledger":
+        """Builds a ledger directly from its columns (e.g. read from a binary snapshot).
+
+        `encrypted_lengths` gives each entry's token length (0 for none; all
+        0 if not given) and `encrypted_blob` holds the tokens back to back.
+        """
+        ledger = cls.__new__(cls)  # Skips allocating columns that are replaced right away
+        ledger.timestamps, ledger.amounts, ledger.types, ledger.kinds = timestamps, amounts, types, kinds
+        ledger.descriptions = descriptions
+        ledger._enc_lengths = array("l", encrypted_lengths) if encrypted_lengths else array("l", [0]) * len(amounts)
+        ledger._enc_starts = array("q", accumulate(ledger._enc_lengths, initial=0))
+        ledger._enc_starts.pop()
+        ledger._enc_blob = bytearray(encrypted_blob)
+        ledger._enc_dead = ledger._rewrites = 0
+        ledger._in_order = all(a <= b for a, b in zip(timestamps, timestamps[1:]))
+        ledger._order = None
+        return ledger
+
+    def append(self, transaction: dict):
+        """Adds an entry given in dict form."""
+        timestamp = to_epoch(transaction["timestamp"])
+        amount, type_code = amount_cents(transaction), TYPE_CODES[transaction["type"]]
+        kind_code, description = KIND_CODES[transaction_kind(transaction)], sys.intern(transaction["description"])
+        # The token goes first, so a column holding the entry means its token is in place (see copy())
+        token = _token_bytes(transaction.get("encrypted"))
+        self._enc_starts.append(len(self._enc_blob))
+        self._enc_blob += token
+        self._enc_lengths.append(len(token))
+        if self._in_order and self.timestamps and timestamp < self.timestamps[-1]:
+            self._in_order = False
+        self.timestamps.append(timestamp)
+        self.amounts.append(amount)
+        self.types.append(type_code)
+        self.kinds.append(kind_code)
+        self.descriptions.append(description)
+        if self._order is not None:
+            position = len(self.amounts) - 1
+            self._order.insert(bisect_right(self._order, (timestamp, position), key=self._sort_key), position)
+
+    def encrypted(self, index: int) -> Optional[bytes]:
+        """The raw encrypted description of an entry, if it has one.
+
+        Read again if a rewrite ran meanwhile, so readers without the
+        account's lock never see half of one.
+        """
+        while True:
+            rewrites = self._rewrites
+            length = self._enc_lengths[index]
+            start = self._enc_starts[index]
+            token = bytes(self._enc_blob[start:start + length]) if length else None
+            if rewrites == self._rewrites and not rewrites & 1:
+                return token
+            time.sleep(0)  # Let the rewriting thread finish
+
+    def set_encrypted(self, index: int, token: Optional[bytes]):
+        """Replaces the encrypted description of an entry (e.g. after a key rotation)."""
+        self._store_encrypted(index, token)
+
+    def _store_encrypted(self, index: int, token: Union[str, bytes, None]):
+        """Replaces an entry's token in place when the size matches (the same text re-encrypted does).
+
+        Otherwise the new token is appended and the old bytes are counted as
+        dead; once they outgrow the live ones, the buffer is compacted.
+        """
+        token = _token_bytes(token)
+        self._rewrites += 1
+        try:
+            start, length = self._enc_starts[index], self._enc_lengths[index]
+            if len(token) == length:
+                self._enc_blob[start:start + length] = token
+                return
+            self._enc_dead += length
+            self._enc_starts[index] = len(self._enc_blob)
+            self._enc_lengths[index] = len(token)
+            self._enc_blob += token
+            if self._enc_dead * 2 > len(self._enc_blob):
+                self._compact_encrypted()
+        finally:
+            self._rewrites += 1
+
+    def _compact_encrypted(self):
+        """Rebuilds the token buffer without the bytes of rewritten tokens."""
+        blob = self._enc_blob
+        tokens = [blob[start:start + length] for start, length in zip(self._enc_starts, self._enc_lengths)]
+        starts = array("q", accumulate(self._enc_lengths, initial=0))
+        starts.pop()
+        self._enc_starts, self._enc_blob, self._enc_dead = starts, bytearray().join(tokens), 0
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        transaction = {
+            "timestamp": datetime.fromtimestamp(self.timestamps[index]).strftime(TIMESTAMP_FORMAT),
+            "amount_cents": self.amounts[index],
+            "type": TRANSACTION_TYPES[self.types[index]],
+            "kind": TRANSACTION_KINDS[self.kinds[index]],
+            "description": self.descriptions[index]
+        }
+        encrypted = self.encrypted(index)
+        if encrypted:
+            transaction["encrypted"] = encrypted.hex()
+        return transaction
+
+    def __setitem__(self, index: int, transaction: dict):
+        timestamp = to_epoch(transaction["timestamp"])
+        if timestamp != self.timestamps[index]:
+            self.timestamps[index] = timestamp
+            self._in_order = all(a <= b for a, b in zip(self.timestamps, self.timestamps[1:]))
+            self._order = None
+        self.amounts[index] = amount_cents(transaction)
+        self.types[index] = TYPE_CODES[transaction["type"]]
+        self.kinds[index] = KIND_CODES[transaction_kind(transaction)]
+        self.descriptions[index] = sys.intern(transaction["description"])
+        self._store_encrypted(index, transaction.get("encrypted"))
+
+    def __iter__(self) -> Iterator[dict]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def to_list(self) -> List[dict]:
+        """All entries in dict form, for serialization."""
+        return list(self)
+
+    def copy(self, length: Optional[int] = None) -> "Ledger":
+        """A copy of the first `length` entries, or of all those appended so far.
+
+        Safe while another thread appends: append() stores the encrypted
+        token first and then grows the other columns one after the other,
+        so only the prefix present in every column is taken and each of
+        those entries is complete. Tokens rewritten meanwhile (set_encrypted)
+        are read whole, see encrypted(); other rewrites need the account's lock.
+        """
+        count = min(len(self.timestamps), len(self.amounts), len(self.types), len(self.kinds),
+                    len(self.descriptions), len(self._enc_lengths))
+        if length is not None:
+            count = min(count, length)
+        tokens = [self.encrypted(i) or b"" for i in range(count)]
+        return Ledger.from_columns(self.timestamps[:count], self.amounts[:count], self.types[:count],
+                                   self.kinds[:count], self.descriptions[:count],
+                                   [len(token) for token in tokens], b"".join(tokens))
+
+    # ========== TIME-RANGE QUERIES ==========
+
+    def positions(self, since: Optional[float] = None, until: Optional[float] = None,
+                  cursor: Optional[str] = None) -> Iterator[int]:
+        """Positions of the entries with since <= timestamp < until, oldest first.
+
+        `cursor` (from cursor()) resumes right after the entry it was taken
+        from; entries appended since then are picked up.
+        """
+        after = self._parse_cursor(cursor) if cursor else None
+        if self._in_order:
+            timestamps = self.timestamps
+            lo = 0 if since is None else bisect_left(timestamps, since)
+            hi = len(timestamps) if until is None else bisect_left(timestamps, until)
+            if after is not None:
+                lo = max(lo, after[1] + 1)  # Position order is time order
+            return iter(range(lo, hi))
+
+        order = self._sorted_index()
+        lo = 0 if since is None else bisect_left(order, (since, -1), key=self._sort_key)
+        hi = len(order) if until is None else bisect_left(order, (until, -1), key=self._sort_key)
+        if after is not None:
+            lo = max(lo, bisect_right(order, after, key=self._sort_key))
+        return (order[i] for i in range(lo, hi))
+
+    def cursor(self, position: int) -> str:
+        """An opaque pagination cursor pointing just past an entry."""
+        return f"{self.timestamps[position]!r}:{position}"
+
+    @staticmethod
+    def _parse_cursor(cursor: str) -> Tuple[float, int]:
+        timestamp, _, position = cursor.rpartition(":")
+        return float(timestamp), int(position)  # ValueError for a malformed cursor
+
+    def _sort_key(self, position: int) -> Tuple[float, int]:
+        return self.timestamps[position], position
+
+    def _sorted_index(self) -> array:
+        if self._order is None:
+            self._order = array("q", sorted(range(len(self.timestamps)), key=self._sort_key))
+        return self._order
+
+    def net_cents(self) -> int:
+        """Credits minus debits over the whole history."""
+        credit = TYPE_CODES["credit"]
+        return sum(amount if code == credit else -amount for amount, code in zip(self.amounts, self.types))
+
+
+def _token_bytes(token: Union[str, bytes, None]) -> bytes:
+    """An encrypted description as raw bytes; the dict form carries hex, like the JSON files."""
+    if isinstance(token, str):
+        return bytes.fromhex(token)
+    return token or b""
+
+
+def to_epoch(value: Union[str, datetime]) -> float:
+    """Seconds since the epoch for a TIMESTAMP_FORMAT string (or any ISO date) or a datetime."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.timestamp()
+
+
+def amount_cents(transaction: dict) -> int:
+    """Amount of a transaction in dict form; older files stored float units under "amount"."""
+    if "amount_cents" in transaction:
+        return transaction["amount_cents"]
+    return legacy_to_cents(transaction["amount"])
+
+
+def transaction_kind(transaction: dict) -> str:
+    """Kind of a transaction in dict form, inferred from the description for older entries."""
+    kind = transaction.get("kind")
+    if kind:
+        return kind
+    # process_transaction has always prefixed its descriptions this way
+    if transaction["description"].startswith("Deposit - "):
+        return "deposit"
+    if transaction["description"].startswith("Withdrawal - "):
+        return "withdrawal"
+    return "transfer"
+
+
+@dataclass(slots=True, weakref_slot=True)  # Weak references let caches find accounts still in use
 class Account:
     """Represents a bank account."""
     account_id: str
     owner_username: str
-    balance: float
-    transactions: List[dict]
+    balance: int  # In cents
+    transactions: Ledger
 
-    def add_transaction(self, amount: float, transaction_type: str, description):
-        """Adds a transaction and updates the balance accordingly."""
+    def __post_init__(self):
+        # Accept the list-of-dicts form used by the JSON files and journal
+        if not isinstance(self.transactions, Ledger):
+            self.transactions = Ledger(self.transactions)
+
+    @property
+    def length(self) -> int:
+        """Entries in the ledger; read_views.AccountVersion has the same field for its prefix."""
+        return len(self.transactions)
+
+    def add_transaction(self, amount: int, transaction_type: str, description, kind: str = "transfer",
+                        timestamp: Optional[datetime] = None):
+        """Adds a transaction of `amount` cents and updates the balance accordingly.
+
+        The entry is dated now unless a `timestamp` (e.g. a business date's close) is given.
+        """
 
         # Ensure transaction type is valid
         if transaction_type not in ("credit", "debit"):
             raise ValueError(f"Invalid transaction type: {transaction_type}")
+        if kind not in KIND_CODES:
+            raise ValueError(f"Invalid transaction kind: {kind}")
 
         # If description is a dictionary, extract plaintext part
+        encrypted = None
         if isinstance(description, dict):
             description_text = description.get("plaintext", "No description")  # Fallback if missing
+            encrypted = description.get("encrypted")
         else:
             description_text = description
 
         # Record the transaction
         transaction = {
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "amount": round(amount, 2),
+            "timestamp": (timestamp or datetime.now()).strftime(TIMESTAMP_FORMAT),
+            "amount_cents": amount,
             "type": transaction_type,
+            "kind": kind,
             "description": description_text.strip()
         }
+        if encrypted:
+            transaction["encrypted"] = encrypted  # Hex of the key-ID-prefixed Fernet token
+
+        if transaction_type == "debit" and self.balance < amount:
+            logger.warning("❌ Warning: Insufficient funds! Transaction still recorded but may be declined.",
+                           extra={"event": "overdraft", "account_id": self.account_id, "amount_cents": amount})
+
+        self.apply_transaction(transaction)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("✅ Transaction recorded: %s $%s for %s", transaction_type, lazy(format_cents, amount),
+                         self.owner_username, extra={"event": "transaction_recorded", "account_id": self.account_id,
+                                                     "type": transaction_type, "amount_cents": amount})
+        return transaction
+
+    def apply_transaction(self, transaction: dict):
+        """Appends an already-built transaction and updates the balance (used for replay)."""
         self.transactions.append(transaction)
 
         # Update balance
-        if transaction_type == "credit":
-            self.balance += amount
-        elif transaction_type == "debit":
-            if self.balance < amount:
-                print("❌ Warning: Insufficient funds! Transaction still recorded but may be declined.")
-            self.balance -= amount
-
-        print(f"✅ Transaction recorded: {transaction_type} ${amount:.2f} for {self.owner_username}")
+        if transaction["type"] == "credit":
+            self.balance += amount_cents(transaction)
+        elif transaction["type"] == "debit":
+            self.balance -= amount_cents(transaction)
+
+
+@dataclass(slots=True)
+class ScheduledPayment:
+    """A transfer due at a future time, once or repeatedly (a standing order)."""
+    schedule_id: str
+    owner_username: str  # The paying client
+    recipient_username: str
+    amount_cents: int
+    description: str
+    next_run: float  # Epoch seconds at which the next payment is due
+    interval: Optional[str] = None  # None for a one-off payment, else one of SCHEDULE_INTERVALS
+    day: int = 0  # Day of the month monthly payments fall on; 31 means the last day of every month
+    runs: int = 0  # Payments made
+    failures: int = 0  # Due payments that could not be made, e.g. for insufficient funds
+
+    def advance(self) -> bool:
+        """Moves next_run to the following due time; False for a one-off payment, which is then done."""
+        if self.interval is None:
+            return False
+        due = datetime.fromtimestamp(self.next_run)
+        if self.interval == "daily":
+            due += timedelta(days=1)
+        elif self.interval == "weekly":
+            due += timedelta(weeks=1)
+        else:
+            year, month = due.year + due.month // 12, due.month % 12 + 1
+            due = due.replace(year=year, month=month, day=min(self.day, monthrange(year, month)[1]))
+        self.next_run = due.timestamp()
+        return True
+
+    def to_record(self) -> dict:
+        return {
+            "schedule_id": self.schedule_id,
+            "owner_username": self.owner_username,
+            "recipient_username": self.recipient_username,
+            "amount_cents": self.amount_cents,
+            "description": self.description,
+            "next_run": self.next_run,
+            "interval": self.interval,
+            "day": self.day,
+            "runs": self.runs,
+            "failures": self.failures
+        }
+
+    @classmethod
+    def from_record(cls, record: dict) -> "ScheduledPayment":
+        return cls(record["schedule_id"], record["owner_username"], record["recipient_username"],
+                   record["amount_cents"], record["description"], record["next_run"], record.get("interval"),
+                   record.get("day", 0), record.get("runs", 0), record.get("failures", 0))
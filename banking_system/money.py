@@ -0,0 +1,31 @@
+from decimal import Decimal, InvalidOperation
+from typing import Union
+
+CENTS_PER_UNIT = 100
+
+def to_cents(value: Union[str, int, float, Decimal]) -> int:
+    """Converts an amount in currency units (e.g. "12.34") to integer cents.
+
+    Parsing goes through Decimal, so "0.1" becomes exactly 10 cents. Amounts
+    with fractions of a cent are rejected rather than silently rounded.
+    """
+    try:
+        amount = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {value!r}")
+    if not amount.is_finite():
+        raise ValueError(f"Invalid amount: {value!r}")
+    cents = amount * CENTS_PER_UNIT
+    if cents != cents.to_integral_value():
+        raise ValueError(f"Amount has fractions of a cent: {value!r}")
+    return int(cents)
+
+def format_cents(cents: int) -> str:
+    """Formats integer cents as a plain decimal string, e.g. 1234 -> "12.34"."""
+    sign = "-" if cents < 0 else ""
+    units, remainder = divmod(abs(cents), CENTS_PER_UNIT)
+    return f"{sign}{units}.{remainder:02d}"
+
+def legacy_to_cents(amount: float) -> int:
+    """Converts a float amount from files written before amounts were stored in cents."""
+    return round(amount * CENTS_PER_UNIT)
@@ -0,0 +1,208 @@
+"""Point-in-time read views over users and accounts, kept with multi-version concurrency control.
+
+A report that walks many accounts while transfers run would otherwise see
+torn state: a transfer's debit without its credit, or a balance that does
+not match the ledger next to it. Database.snapshot() returns a ReadView
+pinned to a version number instead; it sees every change published up to
+that version and none after, and taking one costs a counter read.
+
+Writers publish their changes under a new version as they release the
+account locks (visibility, not durability: that is still commit()). For
+every account changed while a view is open, VersionStore keeps a short
+chain of the published (version, ledger length, balance) states. Ledgers
+are append-only, so a past state is just a shorter prefix of the live
+ledger and nothing is copied. Users are replaced rather than changed in
+place, so their chains hold the User objects themselves.
+
+A writer files an account's current state before changing it, so a view
+never reads a half-applied change. With no view open, chains are dropped
+as soon as their writer publishes; otherwise the oldest open view decides
+how much of each chain is kept.
+"""
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Set, Tuple
+from models import Account, Ledger, User
+
+AccountState = Tuple[int, Optional[int], Optional[int]]  # (version, ledger length, balance); None before opening
+
+
+@dataclass(slots=True)
+class AccountVersion:
+    """An account as a read view sees it: its balance then and the ledger prefix that existed then."""
+    account_id: str
+    owner_username: str
+    balance: int  # In cents
+    transactions: Ledger  # The live ledger; only its first `length` entries belong to this version
+    length: int
+
+    def positions(self, since: Optional[float] = None, until: Optional[float] = None,
+                  cursor: Optional[str] = None) -> Iterator[int]:
+        """Ledger.positions, limited to the entries of this version."""
+        length = self.length
+        return (position for position in self.transactions.positions(since, until, cursor) if position < length)
+
+    def entries(self, since: Optional[float] = None, until: Optional[float] = None) -> Iterator[dict]:
+        """The entries with since <= timestamp < until (epoch seconds) in dict form, oldest first."""
+        ledger = self.transactions
+        for position in self.positions(since, until):
+            yield ledger[position]
+
+
+class VersionStore:
+    """Version chains of the users and accounts changed while read views are open."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = 0  # Of the last published change
+        self._views: Dict[int, int] = {}  # Versions of the open views -> how many are open at each
+        self._accounts: Dict[str, List[AccountState]] = {}  # Oldest first
+        self._users: Dict[str, List[Tuple[int, Optional[User]]]] = {}
+        self._writing: Set[str] = set()  # Accounts between begin() and publish()
+
+    # ========== VIEWS ==========
+
+    def open_view(self) -> int:
+        """Registers a new view and returns its version."""
+        with self.lock:
+            self._views[self.version] = self._views.get(self.version, 0) + 1
+            return self.version
+
+    def close_view(self, version: int):
+        """Unregisters a view; the last one to close releases every chain no writer needs."""
+        with self.lock:
+            if self._views[version] > 1:
+                self._views[version] -= 1
+                return
+            del self._views[version]
+            if self._views:
+                return
+            self._users.clear()
+            # A writer still changing an account needs its last published state, tagged for any future view
+            self._accounts = {account_id: [(0,) + self._accounts[account_id][-1][1:]]
+                              for account_id in self._writing}
+
+    # ========== WRITERS ==========
+
+    def begin(self, accounts: Iterable[Account]):
+        """Files the current state of accounts about to change; the caller holds their locks."""
+        with self.lock:
+            for account in accounts:
+                if account.account_id not in self._accounts:
+                    self._accounts[account.account_id] = [(0, len(account.transactions), account.balance)]
+                self._writing.add(account.account_id)
+
+    def publish(self, accounts: Iterable[Account]):
+        """Makes the changes to accounts since begin() visible to views opened from now on, as one version."""
+        with self.lock:
+            self.version += 1
+            oldest = min(self._views, default=None)
+            for account in accounts:
+                self._writing.discard(account.account_id)
+                if oldest is None:
+                    self._accounts.pop(account.account_id, None)
+                    continue
+                chain = self._accounts[account.account_id]
+                state = (len(account.transactions), account.balance)
+                if chain[-1][1:] != state:
+                    chain.append((self.version,) + state)
+                    self._prune(chain, oldest)
+
+    def publish_account(self, account: Account):
+        """Publishes a newly opened account; the caller holds the lock and then stores it."""
+        self.version += 1
+        if self._views:
+            self._accounts[account.account_id] = [(0, None, None),
+                                                  (self.version, len(account.transactions), account.balance)]
+
+    def publish_user(self, username: str, old: Optional[User], new: User):
+        """Publishes a user replacing `old`; the caller holds the lock and then stores it."""
+        self.version += 1
+        if self._views:
+            chain = self._users.setdefault(username, [(0, old)])
+            chain.append((self.version, new))
+            self._prune(chain, min(self._views))
+
+    @staticmethod
+    def _prune(chain: list, oldest: int):
+        """Drops the states no open view can see: those older than the newest one at or before `oldest`."""
+        keep = 0
+        while keep + 1 < len(chain) and chain[keep + 1][0] <= oldest:
+            keep += 1
+        del chain[:keep]
+
+    # ========== READERS ==========
+
+    def account_at(self, account: Account, version: int) -> Optional[AccountVersion]:
+        """An account (the live object) as of a version, or None if it was not open yet."""
+        with self.lock:
+            chain = self._accounts.get(account.account_id)
+            if chain is None:  # Not changed since before every open view, nor being changed now
+                length, balance = len(account.transactions), account.balance
+            else:
+                _, length, balance = next(state for state in reversed(chain) if state[0] <= version)
+        if length is None:
+            return None
+        return AccountVersion(account.account_id, account.owner_username, balance, account.transactions, length)
+
+    def user_at(self, username: str, user: Optional[User], version: int) -> Optional[User]:
+        """A user as of a version, given the live one, or None if it did not exist yet."""
+        with self.lock:
+            chain = self._users.get(username)
+            if chain is None:
+                return user
+            return next(state for state in reversed(chain) if state[0] <= version)[1]
+
+
+class ReadView:
+    """Users and accounts as of one version; see Database.snapshot().
+
+    Close the view (or use it as a context manager) when done: while it is
+    open, every account changed since it was taken keeps a chain of states.
+    """
+
+    def __init__(self, users: Mapping[str, User], accounts: Mapping[str, Account], store: VersionStore):
+        self._users = users
+        self._accounts = accounts
+        self._store = store
+        self.version = store.open_view()
+        self._closed = False
+
+    def user(self, username: str) -> Optional[User]:
+        return self._store.user_at(username, self._users.get(username), self.version)
+
+    def account(self, account_id: str) -> Optional[AccountVersion]:
+        account = self._accounts.get(account_id)
+        return None if account is None else self._store.account_at(account, self.version)
+
+    def users(self) -> Iterator[User]:
+        """Every user of this version, in no particular order."""
+        for username, user in _items(self._users):
+            user = self._store.user_at(username, user, self.version)
+            if user is not None:
+                yield user
+
+    def accounts(self) -> Iterator[AccountVersion]:
+        """Every account of this version, in no particular order."""
+        for _, account in _items(self._accounts):
+            version = self._store.account_at(account, self.version)
+            if version is not None:
+                yield version
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._store.close_view(self.version)
+
+    def __enter__(self) -> "ReadView":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _items(mapping: Mapping) -> Iterable[tuple]:
+    """A mapping's items, safe to walk while other threads insert."""
+    if isinstance(mapping, dict):
+        return list(mapping.items())  # One C-level copy; iterating the dict itself fails if it grows
+    return mapping.items()  # Lazy engines scan their storage and tolerate inserts
@@ -0,0 +1,92 @@
+"""Due-time ordering of scheduled payments for the scheduler tick.
+
+Scheduled payments live in Database.schedules; PaymentSchedule keeps a
+binary heap of (next_run, schedule_id) over them, so finding the next due
+payment is O(1) and taking it off or putting it back is O(log n). A tick
+never scans the payments that are not due yet.
+
+Cancelled payments are not searched for in the heap: their entries are
+skipped when they surface, as are entries whose payment has since moved to
+another time. The heap is rebuilt once stale entries outnumber live ones.
+"""
+import heapq
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+from models import ScheduledPayment
+
+
+class PaymentSchedule:
+    """Min-heap of scheduled payments by due time, with a per-owner index."""
+
+    def __init__(self, schedules: Dict[str, ScheduledPayment]):
+        self._schedules = schedules  # The database's payments by schedule ID; the heap only holds keys
+        self._heap: List[Tuple[float, str]] = [(s.next_run, s.schedule_id) for s in schedules.values()]
+        heapq.heapify(self._heap)  # O(n), against O(n log n) for pushing one at a time
+        self._by_owner: Dict[str, Set[str]] = {}
+        for schedule in schedules.values():
+            self._by_owner.setdefault(schedule.owner_username, set()).add(schedule.schedule_id)
+        self._queued: Set[str] = set(schedules)  # Payments with a current heap entry
+        self._stale = 0  # Heap entries left behind by cancelled or re-filed payments
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._queued)
+
+    def push(self, schedule: ScheduledPayment):
+        """Files a new payment, or one whose next_run has just been advanced, under its due time."""
+        with self._lock:
+            if schedule.schedule_id in self._queued:
+                self._stale += 1  # Its earlier entry no longer matches next_run
+            self._queued.add(schedule.schedule_id)
+            heapq.heappush(self._heap, (schedule.next_run, schedule.schedule_id))
+            self._by_owner.setdefault(schedule.owner_username, set()).add(schedule.schedule_id)
+
+    def remove(self, schedule: ScheduledPayment):
+        """Forgets a cancelled or finished payment; its heap entry is dropped lazily."""
+        with self._lock:
+            owned = self._by_owner.get(schedule.owner_username)
+            if owned is not None:
+                owned.discard(schedule.schedule_id)
+                if not owned:
+                    del self._by_owner[schedule.owner_username]
+            if schedule.schedule_id not in self._queued:
+                return  # Taken off by pop_due already
+            self._queued.discard(schedule.schedule_id)
+            self._stale += 1
+            if self._stale > len(self._queued):
+                self._heap = [entry for entry in self._heap if self._live(entry)]
+                heapq.heapify(self._heap)
+                self._stale = 0
+
+    def pop_due(self, now: float) -> Optional[ScheduledPayment]:
+        """Takes the earliest payment due at or before `now` off the heap, or returns None.
+
+        The caller pushes it back after advancing it, unless it is finished.
+        """
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                entry = heapq.heappop(self._heap)
+                if self._live(entry):
+                    self._queued.discard(entry[1])
+                    return self._schedules[entry[1]]
+                self._stale -= 1
+            return None
+
+    def next_due(self) -> Optional[float]:
+        """Due time of the earliest payment, or None if nothing is scheduled."""
+        with self._lock:
+            while self._heap and not self._live(self._heap[0]):
+                heapq.heappop(self._heap)
+                self._stale -= 1
+            return self._heap[0][0] if self._heap else None
+
+    def owned_by(self, owner_username: str) -> List[ScheduledPayment]:
+        """An owner's payments, soonest first."""
+        with self._lock:
+            ids = list(self._by_owner.get(owner_username, ()))
+        payments = [self._schedules[i] for i in ids if i in self._schedules]
+        return sorted(payments, key=lambda s: (s.next_run, s.schedule_id))
+
+    def _live(self, entry: Tuple[float, str]) -> bool:
+        schedule = self._schedules.get(entry[1])
+        return schedule is not None and schedule.next_run == entry[0] and entry[1] in self._queued
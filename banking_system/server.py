@@ -0,0 +1,267 @@
+"""asyncio network front-end for BankingSystem.
+
+The protocol is newline-delimited JSON over TCP. Each request is an object
+such as
+
+    {"id": 1, "op": "transfer", "session": "<token>", "args": {"recipient": "bob", "amount": 5, "description": "lunch"}}
+
+and is answered with {"id": 1, "ok": true, "result": ...} or
+{"id": 1, "ok": false, "error": "..."}. Clients may pipeline requests
+without waiting; responses carry the request id and can arrive out of
+order. Amounts are decimal units ("5", "12.34"; strings avoid float
+rounding) and balances come back as {"balance_cents": 1234, "balance": "12.34"}.
+"login" returns a signed session token that authenticates later
+requests without re-running PBKDF2. Scheduled payments are made by a
+background thread as they fall due. All BankingSystem calls (including PBKDF2 hashing and Fernet
+encryption) run in a thread pool so the event loop never blocks.
+
+Usage:
+    python banking_system/server.py [--host 127.0.0.1] [--port 8765] [--data-dir .] [--engine json]
+        [--log-file server.log] [--log-level INFO] [--log-sample-rate 1.0] [--schedule-interval 60]
+        [--velocity-rule sender:3600:20:5000 ...]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+from bank_system import BankingSystem
+from logging_setup import configure_logging
+from money import format_cents, to_cents
+from velocity import VelocityRule
+from database import Database, ENGINES
+
+logger = logging.getLogger(__name__)
+REFUSE_DRAIN_SECONDS = 5  # How long a refused connection may keep sending before it is closed anyway
+
+class BankServer:
+    """Serves a BankingSystem over a local TCP JSON-lines protocol."""
+
+    def __init__(self, bank: BankingSystem, max_connections: int = 256, max_pipeline: int = 64,
+                 workers: int = 16):
+        self.bank = bank
+        self.max_connections = max_connections
+        self.max_pipeline = max_pipeline  # In-flight requests allowed per connection
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bank-worker")
+        self.connections = 0
+        self.handlers: Dict[str, Callable[[Optional[object], dict], object]] = {
+            "register": self._register,
+            "login": self._login,
+            "logout": self._logout,
+            "balance": self._balance,
+            "transactions": self._transactions,
+            "transfer": self._transfer,
+            "process_transaction": self._process_transaction,
+            "list_users": self._list_users,
+            "change_role": self._change_role,
+            "schedule_payment": self._schedule_payment,
+            "cancel_payment": self._cancel_payment,
+            "scheduled_payments": self._scheduled_payments,
+        }
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765):
+        """Accepts connections until SIGINT or SIGTERM."""
+        stopped = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stopped.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # Not supported on this platform; Ctrl+C still raises KeyboardInterrupt
+
+        server = await asyncio.start_server(self._handle_connection, host, port, limit=1 << 20)
+        logger.info("✅ Bank server listening on %s:%s", host, port)
+        async with server:
+            await stopped.wait()
+
+    # ========== CONNECTION HANDLING ==========
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        if self.connections >= self.max_connections:
+            writer.write(self._encode({"id": None, "ok": False, "error": "Too many connections"}))
+            await writer.drain()
+            writer.close()
+            return
+
+        self.connections += 1
+        in_flight = asyncio.Semaphore(self.max_pipeline)
+        write_lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                await in_flight.acquire()  # Back-pressure: stop reading when the pipeline is full
+                task = asyncio.create_task(self._serve_request(line, writer, write_lock, in_flight))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except ValueError:  # readline() past the stream limit: answer what came before, then refuse the line
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            logger.warning("❌ Request line over the size limit; closing connection.",
+                           extra={"event": "request_too_large"})
+            await self._refuse(reader, writer, write_lock, "Request too large")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def _refuse(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, write_lock: asyncio.Lock,
+                      error: str):
+        """Sends a final error and half-closes, discarding unread input so closing does not reset the reply away."""
+        try:
+            async with write_lock:
+                writer.write(self._encode({"id": None, "ok": False, "error": error}))
+                await writer.drain()
+            if writer.can_write_eof():
+                writer.write_eof()
+            while await asyncio.wait_for(reader.read(65536), REFUSE_DRAIN_SECONDS):
+                pass
+        except (ConnectionError, asyncio.TimeoutError):
+            pass
+
+    async def _serve_request(self, line: bytes, writer: asyncio.StreamWriter, write_lock: asyncio.Lock,
+                             in_flight: asyncio.Semaphore):
+        try:
+            response = await self._dispatch(line)
+            async with write_lock:
+                writer.write(self._encode(response))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            in_flight.release()
+
+    async def _dispatch(self, line: bytes) -> dict:
+        """Decodes one request and runs its handler on the worker pool."""
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError:
+            return {"id": None, "ok": False, "error": "Malformed JSON"}
+        if not isinstance(request, dict):
+            return {"id": None, "ok": False, "error": "Bad request"}
+
+        request_id, op, args = request.get("id"), request.get("op"), request.get("args") or {}
+        if not isinstance(args, dict):
+            return {"id": request_id, "ok": False, "error": "Bad request"}
+        handler = self.handlers.get(op) if isinstance(op, str) else None
+        if handler is None:
+            return {"id": request_id, "ok": False, "error": f"Unknown operation: {op}"}
+
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(self.executor, self._call, handler, request.get("session"), args)
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            return {"id": request_id, "ok": False, "error": f"Bad request: {e}"}
+        except Exception:  # A handler bug must still answer the request the client is waiting on
+            logger.exception("❌ Unexpected error serving '%s'.", op, extra={"event": "request_error"})
+            return {"id": request_id, "ok": False, "error": "Internal error"}
+        if result is False or result is None:
+            return {"id": request_id, "ok": False, "error": "Operation failed"}
+        return {"id": request_id, "ok": True, "result": result}
+
+    @staticmethod
+    def _encode(response: dict) -> bytes:
+        return json.dumps(response, separators=(",", ":")).encode() + b"\n"
+
+    # ========== HANDLERS (run on worker threads) ==========
+
+    def _call(self, handler, token: Optional[str], args: dict):
+        """Resolves the session token (one HMAC check) and runs the handler."""
+        session = self.bank.get_session(token) if token else None
+        return handler(session, args)
+
+    def _register(self, session, args):
+        return self.bank.register_user(args["username"], args["password"], args.get("role", "client"))
+
+    def _login(self, session, args):
+        new_session = self.bank.login(args["username"], args["password"])
+        return {"session": new_session.token, "role": new_session.role,
+                "expires_at": new_session.expires_at} if new_session else None
+
+    def _logout(self, session, args):
+        if session is None:
+            return False
+        self.bank.logout(session)
+        return True
+
+    def _balance(self, session, args):
+        balance = self.bank.get_balance(session)
+        return None if balance is None else {"balance_cents": balance, "balance": format_cents(balance)}
+
+    def _transactions(self, session, args):
+        return self.bank.get_transactions(session, args.get("username"), args.get("since"), args.get("until"),
+                                          int(args.get("limit", 50)), args.get("cursor"))
+
+    def _transfer(self, session, args):
+        return self.bank.transfer_money(session, args["recipient"], to_cents(args["amount"]),
+                                        args.get("description", ""))
+
+    def _process_transaction(self, session, args):
+        return self.bank.process_transaction(session, args["username"], to_cents(args["amount"]),
+                                             args["type"], args.get("description", ""))
+
+    def _list_users(self, session, args):
+        return self.bank.list_users(session, role=args.get("role"), has_account=args.get("has_account"),
+                                    prefix=args.get("prefix", ""), limit=int(args.get("limit", 50)),
+                                    cursor=args.get("cursor"))
+
+    def _change_role(self, session, args):
+        return self.bank.change_user_role(session, args["username"], args["role"])
+
+    def _schedule_payment(self, session, args):
+        return self.bank.schedule_payment(session, args["recipient"], to_cents(args["amount"]), args["first_run"],
+                                          args.get("interval"), args.get("description", ""), args.get("day"))
+
+    def _cancel_payment(self, session, args):
+        return self.bank.cancel_scheduled_payment(session, args["schedule_id"])
+
+    def _scheduled_payments(self, session, args):
+        return self.bank.list_scheduled_payments(session)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the bank's JSON-lines TCP server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--data-dir", default=".")
+    parser.add_argument("--engine", default="json", choices=list(ENGINES))
+    parser.add_argument("--max-connections", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--schedule-interval", type=float, default=60.0,
+                        help="Longest wait, in seconds, between checks for due scheduled payments")
+    parser.add_argument("--log-file", help="Write JSON log lines here instead of stderr")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    parser.add_argument("--log-sample-rate", type=float, default=1.0,
+                        help="Fraction of success (INFO/DEBUG) records to keep; warnings are always kept")
+    parser.add_argument("--velocity-rule", action="append", default=[], type=VelocityRule.parse,
+                        help="Transfer limit scope:window_seconds:max_count:max_amount, e.g. sender:3600:20:5000; "
+                             "repeatable")
+    args = parser.parse_args()
+
+    configure_logging(args.log_file, level=getattr(logging, args.log_level), sample_rate=args.log_sample_rate)
+
+    options = {"journal": True} if args.engine == "json" else {}
+    # Group commit keeps disk writes off the request path
+    db = Database(args.data_dir, engine=args.engine, flush_interval=0.005, **options)
+    bank = BankingSystem(db, velocity_rules=args.velocity_rule)
+    bank.run_due_payments()  # Catch up on payments that fell due while the server was down
+    bank.start_scheduler(args.schedule_interval)
+    server = BankServer(bank, max_connections=args.max_connections, workers=args.workers)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("Shutting down...")
+        server.executor.shutdown()
+        bank.stop_scheduler()
+        db.close()
+
+if __name__ == "__main__":
+    main()
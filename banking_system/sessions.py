@@ -0,0 +1,142 @@
+import base64
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+from models import User
+
+
+@dataclass
+class Session:
+    """A logged-in user. Returned by BankingSystem.login and passed to every operation."""
+    user: User
+    session_id: str = field(default_factory=lambda: secrets.token_hex(16))
+    created_at: float = field(default_factory=time.time)
+    expires_at: float = 0.0
+    token: str = ""  # Signed token a stateless client presents instead of its password
+
+    @property
+    def username(self) -> str:
+        return self.user.username
+
+    @property
+    def role(self) -> str:
+        return self.user.role
+
+
+class SessionManager:
+    """Issues and verifies HMAC-signed, expiring session tokens.
+
+    A token is `<payload>.<signature>` where the payload carries the session
+    ID, issue time, expiry and username, and the signature is HMAC-SHA256
+    under the server key. Verifying a token costs one HMAC instead of a
+    PBKDF2 derivation. Recently used sessions are kept in an LRU; logged-out
+    session IDs are kept in a revocation set until they expire, and
+    revoke_user() invalidates every token issued to a user before that moment.
+    """
+
+    def __init__(self, secret_key: Optional[bytes] = None, ttl: float = 3600.0, max_sessions: int = 100_000):
+        self.secret_key = secret_key or secrets.token_bytes(32)
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._active: "OrderedDict[str, Session]" = OrderedDict()  # LRU of sessions by ID
+        self._revoked: Dict[str, float] = {}  # Revoked session ID -> token expiry
+        self._not_before: Dict[str, float] = {}  # Username -> tokens issued earlier are invalid
+        self._lock = threading.Lock()
+
+    def issue(self, user: User) -> Session:
+        """Opens a new session for a user and signs its token."""
+        session = Session(user=user)
+        session.expires_at = session.created_at + self.ttl
+        payload = f"{session.session_id}:{session.created_at:.6f}:{session.expires_at:.0f}:{user.username}"
+        session.token = f"{self._b64(payload.encode())}.{self._b64(self._sign(payload.encode()))}"
+        with self._lock:
+            self._remember(session)
+        return session
+
+    def verify(self, token: str, load_user: Callable[[str], Optional[User]]) -> Optional[Session]:
+        """Returns the session a token belongs to, or None if it is forged, expired or revoked."""
+        try:
+            encoded_payload, encoded_signature = token.split(".", 1)
+            payload = self._unb64(encoded_payload)
+            signature = self._unb64(encoded_signature)
+        except (ValueError, AttributeError):
+            return None
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            return None
+
+        try:
+            session_id, created_at, expires_at, username = payload.decode().split(":", 3)
+            created, expires = float(created_at), float(expires_at)
+        except (UnicodeDecodeError, ValueError):
+            return None
+
+        with self._lock:
+            if not self._valid(session_id, username, created, expires):
+                return None
+            session = self._active.get(session_id)
+            if session is not None:
+                self._active.move_to_end(session_id)
+                return session
+
+        # Evicted from the LRU (or issued before a restart with the same key): rebuild it
+        user = load_user(username)
+        if user is None:
+            return None
+        session = Session(user=user, session_id=session_id, created_at=created, expires_at=expires, token=token)
+        with self._lock:
+            self._remember(session)
+        return session
+
+    def is_active(self, session: Session) -> bool:
+        """Cheap check used on every operation: the session is neither expired nor revoked."""
+        return self._valid(session.session_id, session.username, session.created_at, session.expires_at)
+
+    def revoke(self, session: Session):
+        """Logs a single session out."""
+        with self._lock:
+            self._active.pop(session.session_id, None)
+            self._revoked[session.session_id] = session.expires_at
+            self._prune()
+
+    def revoke_user(self, username: str):
+        """Invalidates every session issued to a user so far, e.g. after a role change."""
+        with self._lock:
+            self._not_before[username] = time.time()
+            for session_id in [sid for sid, s in self._active.items() if s.username == username]:
+                del self._active[session_id]
+
+    # ========== INTERNALS ==========
+
+    def _valid(self, session_id: str, username: str, created_at: float, expires_at: float) -> bool:
+        return (expires_at > time.time()
+                and session_id not in self._revoked
+                and created_at > self._not_before.get(username, 0.0))
+
+    def _remember(self, session: Session):
+        """Adds a session to the LRU, evicting the least recently used one when full."""
+        self._active[session.session_id] = session
+        self._active.move_to_end(session.session_id)
+        while len(self._active) > self.max_sessions:
+            self._active.popitem(last=False)
+
+    def _prune(self):
+        """Drops revocations whose tokens have expired anyway."""
+        now = time.time()
+        for session_id in [sid for sid, expires in self._revoked.items() if expires <= now]:
+            del self._revoked[session_id]
+
+    def _sign(self, payload: bytes) -> bytes:
+        return hmac.new(self.secret_key, payload, hashlib.sha256).digest()
+
+    @staticmethod
+    def _b64(data: bytes) -> str:
+        return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+    @staticmethod
+    def _unb64(data: str) -> bytes:
+        return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
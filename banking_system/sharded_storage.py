@@ -0,0 +1,469 @@
+"""Storage engine that keeps every account in its own small file and loads it on demand.
+
+Layout, below <data_dir>/shards:
+
+    manifest.json             sequence number of the last checkpoint, user/account counts, shard count
+    schedules.json            every scheduled payment, as of the last checkpoint
+    journal.log               checksummed change records written since that checkpoint
+    users/<shard>.bin         the users whose username hashes to the shard; these files are
+                              also the username -> account_id index
+    accounts/<shard>/<id>.bin one account and its ledger, sharded by account ID hash
+
+Files use the binary_snapshot format. Startup reads the manifest and
+replays the journal, so it takes the same time for ten accounts or ten
+million. Accounts are loaded on first access into a bounded LRU cache;
+user shards likewise. Every commit is appended to the journal; changed
+accounts are written back to their own file when they are evicted and at
+each checkpoint, after which the journal starts over. Files only ever get
+what journal records already written cover, so a crash cannot leave half
+of a transfer in them.
+"""
+import json
+import os
+import threading
+import weakref
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, List, MutableMapping, Optional, Set, Tuple
+import binary_snapshot
+from models import User, Account, ScheduledPayment
+from storage import (StorageEngine, balance_cents, decode_schedules, encode_journal_record, encode_schedules,
+                     read_journal, write_atomic)
+
+class ShardedStorage(StorageEngine):
+    """Lazily loaded, sharded per-account files with write-back caching.
+
+    Changed accounts (see touch()) stay in memory, by identity, until they
+    have been written back; unchanged ones are simply dropped from the cache.
+    Other threads may be changing an account while it is written back, with
+    their records still staged or queued, so what is written is the ledger
+    prefix and balance of the account's last record in the journal.
+    """
+
+    def __init__(self, data_dir: str = ".", shards: int = 1024, cache_size: int = 10_000,
+                 checkpoint_every: int = 1000):
+        self.root = os.path.join(data_dir, "shards")
+        self.manifest_file = os.path.join(self.root, "manifest.json")
+        self.journal_file = os.path.join(self.root, "journal.log")
+        self.schedules_file = os.path.join(self.root, "schedules.json")
+        self.shards = shards
+        self.cache_size = cache_size  # Accounts (and users) kept loaded, excluding unwritten changes
+        self.checkpoint_every = checkpoint_every  # Journal records between checkpoints
+        self.users = ShardedUsers(self)
+        self.accounts = ShardedAccounts(self)
+        self.schedules: Dict[str, ScheduledPayment] = {}  # Always loaded; the scheduler keeps them in a heap
+        self._lock = threading.RLock()  # Guards the caches and everything below
+        self._dirty_accounts: Dict[str, Account] = {}  # Changed since they were last written back
+        # (ledger length, balance) of changed accounts as of their last record in the journal
+        self._journaled: Dict[str, Tuple[int, int]] = {}
+        self._dirty_shards: Set[int] = set()  # User shards changed since the last checkpoint
+        self._schedules_dirty = False  # Scheduled payments changed since the last checkpoint
+        self._user_count = 0  # Users and accounts whose creation is in the journal or the files
+        self._account_count = 0
+        self._new_usernames: Set[str] = set()  # Created but not yet journaled
+        self._new_account_ids: Set[str] = set()
+        self._journal_size = 0  # Records currently in the journal file
+        self._seq = 0  # Sequence number of the last record written
+        self._account_dirs: Set[str] = set()  # Shard directories known to exist
+
+    def load(self):
+        """Reads the manifest and replays the journal; accounts themselves load on first access."""
+        os.makedirs(os.path.join(self.root, "users"), exist_ok=True)
+        os.makedirs(os.path.join(self.root, "accounts"), exist_ok=True)
+        checkpoint_seq = 0
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file, "r") as f:
+                manifest = json.load(f)
+            checkpoint_seq = manifest["seq"]
+            self.shards = manifest["shards"]  # The layout is fixed when the bank is created
+            self._user_count, self._account_count = manifest["users"], manifest["accounts"]
+        if os.path.exists(self.schedules_file):
+            with open(self.schedules_file, "rb") as f:
+                self.schedules = decode_schedules(f.read())
+        self._seq = checkpoint_seq
+        if os.path.exists(self.journal_file):
+            self._replay_journal(checkpoint_seq)
+
+    def write(self, records: List[dict], fsync: bool = False) -> bool:
+        """Appends the records to the journal and writes back evicted changes."""
+        if not records:
+            return True
+        for record in records:
+            self._seq += 1
+            record["seq"] = self._seq
+        for record in records:
+            record["batch"] = self._seq  # Replay applies the records only if the last one made it
+
+        lines = "".join(encode_journal_record(record) for record in records)
+        try:
+            with open(self.journal_file, "a") as f:
+                f.write(lines)
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+        except Exception as e:
+            print(f"❌ Error: Failed to append to '{self.journal_file}'. {e}")
+            return False
+        self._journal_size += len(records)
+        with self._lock:
+            for record in records:
+                if record["op"] == "user" and record["username"] in self._new_usernames:
+                    self._new_usernames.discard(record["username"])
+                    self._user_count += 1
+                elif record["op"] == "account" and record["account_id"] in self._new_account_ids:
+                    self._new_account_ids.discard(record["account_id"])
+                    self._account_count += 1
+                elif record["op"].startswith("schedule"):
+                    self._schedules_dirty = True
+                if record["op"] == "tx":
+                    self._journaled[record["account_id"]] = (record["index"] + 1, balance_cents(record))
+                elif record["op"] == "tx_update":
+                    self._journaled[record["account_id"]] = (record["length"], balance_cents(record))
+                elif record["op"] == "account":
+                    self._journaled.setdefault(record["account_id"], (0, balance_cents(record)))
+
+        if self._journal_size >= self.checkpoint_every:
+            return self.save_snapshot(fsync)
+        with self._lock:
+            evicted = [a for a in self._dirty_accounts.values() if a.account_id not in self.accounts._cache]
+            return self._write_back(evicted, [], fsync)
+
+    def save_snapshot(self, fsync: bool = False) -> bool:
+        """Writes back every change and starts a new journal (a checkpoint)."""
+        with self._lock:
+            seq = self._seq
+            if not self._write_back(list(self._dirty_accounts.values()), sorted(self._dirty_shards), fsync):
+                return False
+            manifest = {"seq": seq, "shards": self.shards, "users": self._user_count,
+                        "accounts": self._account_count}
+            try:
+                if self._schedules_dirty:  # Before the manifest, which makes the journal disposable
+                    write_atomic(self.schedules_file, encode_schedules(list(self.schedules.values())), fsync)
+                    self._schedules_dirty = False
+                write_atomic(self.manifest_file, json.dumps(manifest).encode(), fsync)
+                # Records up to `seq` are in the files now; later ones cannot exist, writes hold the io lock
+                open(self.journal_file, "w").close()
+            except Exception as e:
+                print(f"❌ Error: Failed to save '{self.manifest_file}'. {e}")
+                return False
+            self._journal_size = 0
+        return True
+
+    def compact(self, fsync: bool = False) -> bool:
+        """Checkpoints if the journal holds any records."""
+        if not (self._journal_size or self._dirty_accounts or self._dirty_shards or self._schedules_dirty):
+            return True
+        return self.save_snapshot(fsync)
+
+    def touch(self, account: Account):
+        """Pins a changed account in memory until it has been written back."""
+        with self._lock:
+            self._dirty_accounts[account.account_id] = account
+            self.accounts._remember(account.account_id, account)
+
+    def close(self):
+        """Checkpoints so the next start has nothing to replay."""
+        self.compact()
+
+    # ========== BULK LOADING ==========
+
+    def import_data(self, users: Iterable[User], accounts: Iterable[Account],
+                    schedules: Iterable[ScheduledPayment] = ()):
+        """Writes complete users and accounts (with history) straight to their files."""
+        for schedule in schedules:
+            self.schedules[schedule.schedule_id] = schedule
+            self._schedules_dirty = True
+        by_shard: Dict[int, List[User]] = {}
+        for user in users:
+            by_shard.setdefault(self._shard(user.username), []).append(user)
+        with self._lock:
+            for shard, shard_users in by_shard.items():
+                stored = self.users._shard_users(shard)
+                self._user_count += sum(1 for user in shard_users if user.username not in stored)
+                stored.update((user.username, user) for user in shard_users)
+                write_atomic(self._user_shard_file(shard), binary_snapshot.encode_users(stored.values()))
+                self.users._evict(shard)
+            for account in accounts:
+                path = self._account_file(account.account_id, create=True)
+                if not os.path.exists(path):
+                    self._account_count += 1
+                write_atomic(path, binary_snapshot.encode_accounts([account]))
+        self.save_snapshot(fsync=True)
+
+    # ========== FILES ==========
+
+    def _shard(self, key: str) -> int:
+        return zlib.crc32(key.encode()) % self.shards
+
+    def _user_shard_file(self, shard: int) -> str:
+        return os.path.join(self.root, "users", f"{shard:04x}.bin")
+
+    def _account_file(self, account_id: str, create: bool = False) -> str:
+        """The account's file; with `create`, its shard directory is made if missing (only writers need it)."""
+        directory = os.path.join(self.root, "accounts", f"{self._shard(account_id):04x}")
+        if create and directory not in self._account_dirs:
+            os.makedirs(directory, exist_ok=True)
+            self._account_dirs.add(directory)
+        return os.path.join(directory, account_id + ".bin")
+
+    def _read_user_shard(self, shard: int) -> Dict[str, User]:
+        try:
+            with open(self._user_shard_file(shard), "rb") as f:
+                return binary_snapshot.decode_users(f.read())
+        except FileNotFoundError:
+            return {}
+
+    def _read_account(self, account_id: str) -> Optional[Account]:
+        try:
+            with open(self._account_file(account_id), "rb") as f:
+                return binary_snapshot.decode_accounts(f.read()).get(account_id)
+        except FileNotFoundError:
+            return None
+
+    def _scan_accounts(self) -> Iterator[Tuple[str, Account]]:
+        """Every account file, decoded without going through the cache."""
+        accounts_dir = os.path.join(self.root, "accounts")
+        for directory in sorted(os.listdir(accounts_dir)):
+            with os.scandir(os.path.join(accounts_dir, directory)) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".bin"):
+                        with open(entry.path, "rb") as f:
+                            yield from binary_snapshot.decode_accounts(f.read()).items()
+
+    def _write_back(self, accounts: List[Account], shards: List[int], fsync: bool) -> bool:
+        """Writes accounts and user shards to their files, as far as the journal covers them.
+
+        Called with the lock held. An account gets the ledger prefix and
+        balance of its last journaled record and stays pinned while it has
+        changes beyond them; users whose creation is not journaled yet are
+        left out of their shard until the next checkpoint.
+        """
+        for account in accounts:
+            covered = self._journaled.pop(account.account_id, None)
+            if covered is None:
+                continue  # None of its changes are journaled yet, so its file is still current
+            length, balance = covered
+            snapshot = Account(account_id=account.account_id, owner_username=account.owner_username,
+                               balance=balance, transactions=account.transactions.copy(length))
+            try:
+                write_atomic(self._account_file(account.account_id, create=True),
+                             binary_snapshot.encode_accounts([snapshot]), fsync)
+            except Exception as e:
+                print(f"❌ Error: Failed to write account '{account.account_id}'. {e}")
+                self._journaled.setdefault(account.account_id, covered)
+                return False
+            # touch() takes the lock too, so a change finishing after this check pins the account again
+            if account.length == length and account.balance == balance:
+                del self._dirty_accounts[account.account_id]
+
+        for shard in shards:
+            stored = self.users._shards[shard]
+            users = [user for username, user in stored.items() if username not in self._new_usernames]
+            try:
+                write_atomic(self._user_shard_file(shard), binary_snapshot.encode_users(users), fsync)
+            except Exception as e:
+                print(f"❌ Error: Failed to write user shard {shard:04x}. {e}")
+                return False
+            if len(users) == len(stored):
+                self._dirty_shards.discard(shard)
+        self.accounts._trim()
+        self.users._trim()
+        return True
+
+    # ========== JOURNAL ==========
+
+    def _replay_journal(self, after_seq: int):
+        """Applies the journal records written after the checkpoint."""
+        for record in read_journal(self.journal_file, truncate=True):
+            self._journal_size += 1
+            if record["seq"] <= after_seq:
+                continue  # Already written back before the checkpoint
+            self._apply_record(record)
+            self._seq = max(self._seq, record["seq"])
+
+    def _apply_record(self, record: dict):
+        """Applies a journal record and pins the account it changed."""
+        if record["op"] == "tx":
+            account = self.accounts.get(record["account_id"])
+            if account is None:
+                print(f"❌ Warning: Journal references unknown account '{record['account_id']}'.")
+                return
+            ledger = account.transactions
+            if record["index"] == len(ledger):
+                account.apply_transaction(record["transaction"])
+            elif record["index"] < len(ledger):
+                ledger[record["index"]] = record["transaction"]  # Already written back, maybe mid-change
+            account.balance = balance_cents(record)  # The balance right after this transaction
+            self._pin_replayed(account)
+            return
+        if record["op"] == "user" and record["username"] not in self.users:
+            self._user_count += 1
+        elif record["op"] == "account":
+            self._account_count += 1  # Counts in the manifest only cover records up to its checkpoint
+        elif record["op"].startswith("schedule"):
+            self._schedules_dirty = True
+        super()._apply_record(record)
+        self._new_usernames.clear()
+        self._new_account_ids.clear()
+        if record["op"] in ("account", "tx_update"):
+            account = self.accounts.get(record["account_id"])
+            if account is not None:
+                self._pin_replayed(account)
+
+    def _pin_replayed(self, account: Account):
+        """Pins an account changed by replay; all of its state is in the journal."""
+        self.touch(account)
+        self._journaled[account.account_id] = (account.length, account.balance)
+
+
+class ShardedUsers(MutableMapping):
+    """Users by username, loaded one shard file at a time."""
+
+    def __init__(self, storage: ShardedStorage):
+        self._storage = storage
+        self._shards: "OrderedDict[int, Dict[str, User]]" = OrderedDict()  # Least recently used first
+        self._cached_users = 0
+
+    def _shard_users(self, shard: int) -> Dict[str, User]:
+        """The users of a shard, loading it if needed. Called with the storage lock held."""
+        users = self._shards.get(shard)
+        if users is None:
+            self._trim()  # Before inserting, so the shard being loaded is never the one dropped
+            users = self._shards[shard] = self._storage._read_user_shard(shard)
+            self._cached_users += len(users)
+        else:
+            self._shards.move_to_end(shard)
+        return users
+
+    def _evict(self, shard: int):
+        users = self._shards.pop(shard, None)
+        if users is not None:
+            self._cached_users -= len(users)
+
+    def _trim(self):
+        """Drops the least recently used unchanged shards beyond the cache size."""
+        for shard in list(self._shards):
+            if self._cached_users <= self._storage.cache_size or len(self._shards) <= 1:
+                break
+            if shard not in self._storage._dirty_shards:
+                self._evict(shard)
+
+    def __getitem__(self, username: str) -> User:
+        storage = self._storage
+        with storage._lock:
+            return self._shard_users(storage._shard(username))[username]
+
+    def __setitem__(self, username: str, user: User):
+        storage = self._storage
+        with storage._lock:
+            shard = storage._shard(username)
+            users = self._shard_users(shard)
+            if username not in users:
+                storage._new_usernames.add(username)
+                self._cached_users += 1
+            users[username] = user
+            storage._dirty_shards.add(shard)
+
+    def __delitem__(self, username: str):
+        raise TypeError("Stored records cannot be deleted")
+
+    def __contains__(self, username) -> bool:
+        try:
+            self[username]
+        except KeyError:
+            return False
+        return True
+
+    def __len__(self) -> int:
+        return self._storage._user_count + len(self._storage._new_usernames)
+
+    def __iter__(self):
+        for username, _ in self.items():
+            yield username
+
+    def items(self):
+        """Scans every shard, preferring loaded shards over their files."""
+        storage = self._storage
+        for shard in range(storage.shards):
+            with storage._lock:
+                users = self._shards.get(shard)
+                users = dict(users) if users is not None else storage._read_user_shard(shard)
+            yield from users.items()
+
+    def values(self):
+        for _, user in self.items():
+            yield user
+
+
+class ShardedAccounts(MutableMapping):
+    """Accounts by ID, loaded from their own files into a bounded LRU cache."""
+
+    def __init__(self, storage: ShardedStorage):
+        self._storage = storage
+        self._cache: "OrderedDict[str, Account]" = OrderedDict()  # Least recently used first
+        # Evicted accounts some caller still holds; handing out a second copy would split their changes
+        self._live: "weakref.WeakValueDictionary[str, Account]" = weakref.WeakValueDictionary()
+
+    def _remember(self, account_id: str, account: Account):
+        self._cache[account_id] = account
+        self._live[account_id] = account
+        self._cache.move_to_end(account_id)
+        self._trim()
+
+    def _trim(self):
+        # Changed accounts remain pinned in the storage's dirty set until written back
+        while len(self._cache) > self._storage.cache_size:
+            self._cache.popitem(last=False)
+
+    def __getitem__(self, account_id: str) -> Account:
+        storage = self._storage
+        with storage._lock:
+            account = (storage._dirty_accounts.get(account_id) or self._cache.get(account_id)
+                       or self._live.get(account_id))
+            if account is None:
+                account = storage._read_account(account_id)
+                if account is None:
+                    raise KeyError(account_id)
+                self._live[account_id] = account
+            self._remember(account_id, account)
+            return account
+
+    def __setitem__(self, account_id: str, account: Account):
+        storage = self._storage
+        with storage._lock:
+            if account_id not in self:
+                storage._new_account_ids.add(account_id)
+            storage.touch(account)
+
+    def __delitem__(self, account_id: str):
+        raise TypeError("Stored records cannot be deleted")
+
+    def __contains__(self, account_id) -> bool:
+        storage = self._storage
+        with storage._lock:
+            return (account_id in storage._dirty_accounts or account_id in self._cache
+                    or account_id in self._live or os.path.exists(storage._account_file(account_id)))
+
+    def __len__(self) -> int:
+        return self._storage._account_count + len(self._storage._new_account_ids)
+
+    def __iter__(self):
+        for account_id, _ in self.items():
+            yield account_id
+
+    def items(self):
+        """Scans every account file, preferring loaded accounts; nothing is added to the cache."""
+        storage = self._storage
+        with storage._lock:
+            unwritten = dict(storage._dirty_accounts)
+        for account_id, account in storage._scan_accounts():
+            with storage._lock:
+                loaded = (storage._dirty_accounts.get(account_id) or self._cache.get(account_id)
+                          or self._live.get(account_id))
+            unwritten.pop(account_id, None)
+            yield account_id, loaded or account
+        yield from unwritten.items()
+
+    def values(self):
+        for _, account in self.items():
+            yield account
@@ -0,0 +1,281 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+from models import User, Account, ScheduledPayment, transaction_kind, amount_cents
+from storage import StorageEngine, LazyTable, balance_cents
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password_hash BLOB NOT NULL,
+    salt BLOB NOT NULL,
+    role TEXT NOT NULL,
+    account_id TEXT
+);
+CREATE TABLE IF NOT EXISTS accounts (
+    account_id TEXT PRIMARY KEY,
+    owner_username TEXT NOT NULL,
+    balance_cents INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    account_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    amount_cents INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    kind TEXT NOT NULL DEFAULT 'transfer',
+    description TEXT NOT NULL,
+    encrypted TEXT,
+    PRIMARY KEY (account_id, position)
+);
+CREATE TABLE IF NOT EXISTS schedules (
+    schedule_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_accounts_owner ON accounts (owner_username);
+CREATE INDEX IF NOT EXISTS idx_transactions_time ON transactions (account_id, timestamp);
+"""
+
+# Databases created before amounts were kept in integer cents store REAL units;
+# the tables are rebuilt once, in a single transaction
+MIGRATE_TO_CENTS = """
+BEGIN;
+ALTER TABLE accounts RENAME TO accounts_legacy;
+ALTER TABLE transactions RENAME TO transactions_legacy;
+CREATE TABLE accounts (
+    account_id TEXT PRIMARY KEY,
+    owner_username TEXT NOT NULL,
+    balance_cents INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE transactions (
+    account_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    amount_cents INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    kind TEXT NOT NULL DEFAULT 'transfer',
+    description TEXT NOT NULL,
+    encrypted TEXT,
+    PRIMARY KEY (account_id, position)
+);
+INSERT INTO accounts SELECT account_id, owner_username, CAST(ROUND(balance * 100) AS INTEGER) FROM accounts_legacy;
+INSERT INTO transactions
+    SELECT account_id, position, timestamp, CAST(ROUND(amount * 100) AS INTEGER), type,
+           CASE WHEN description LIKE 'Deposit - %' THEN 'deposit'
+                WHEN description LIKE 'Withdrawal - %' THEN 'withdrawal'
+                ELSE 'transfer' END,
+           description, encrypted
+    FROM transactions_legacy;
+DROP TABLE accounts_legacy;
+DROP TABLE transactions_legacy;
+COMMIT;
+"""
+
+INSERT_TRANSACTION = ("INSERT {} INTO transactions "
+                      "(account_id, position, timestamp, amount_cents, type, kind, description, encrypted) "
+                      "VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+
+class SQLiteStorage(StorageEngine):
+    """Stores users, accounts and transactions in indexed SQLite tables.
+
+    Only scheduled payments are read at startup: users and accounts are
+    fetched by primary key the first time they are looked up, and every
+    batch of change records is written in a single SQLite transaction.
+    """
+
+    def __init__(self, data_dir: str = ".", filename: str = "bank.db"):
+        self.path = os.path.join(data_dir, filename)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()  # One connection shared by every thread
+        self._synchronous: Optional[bool] = None  # Last PRAGMA synchronous setting
+        self.users = LazyTable(self._fetch_user, self._scan_users, lambda: self._count("users"))
+        self.accounts = LazyTable(self._fetch_account, self._scan_accounts, lambda: self._count("accounts"))
+        self.schedules: Dict[str, ScheduledPayment] = {}
+
+    def load(self):
+        """Opens the database file and creates the schema if needed."""
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(transactions)")}
+        if "encrypted" not in columns:  # Databases created before descriptions were kept encrypted
+            self._conn.execute("ALTER TABLE transactions ADD COLUMN encrypted TEXT")
+        if "amount_cents" not in columns:
+            self._conn.executescript(MIGRATE_TO_CENTS)
+            self._conn.executescript(SCHEMA)  # Recreates the indexes dropped with the legacy tables
+        for (data,) in self._conn.execute("SELECT data FROM schedules"):
+            schedule = ScheduledPayment.from_record(json.loads(data))
+            self.schedules[schedule.schedule_id] = schedule
+
+    def write(self, records: List[dict], fsync: bool = False) -> bool:
+        """Applies all records in one transaction; either all of them land or none do."""
+        if not records:
+            return True
+        try:
+            with self._lock:
+                if fsync != self._synchronous:
+                    self._conn.execute(f"PRAGMA synchronous={'FULL' if fsync else 'OFF'}")
+                    self._synchronous = fsync
+                with self._conn:
+                    for record in records:
+                        self._apply_record(record)
+        except sqlite3.Error as e:
+            print(f"❌ Error: Failed to write to '{self.path}'. {e}")
+            return False
+        self.users.mark_persisted()
+        self.accounts.mark_persisted()
+        return True
+
+    def history(self, account_id: str, since: Optional[str] = None, until: Optional[str] = None,
+                limit: Optional[int] = None) -> List[dict]:
+        """Returns an account's transactions in a time range using the (account_id, timestamp) index."""
+        query = ("SELECT timestamp, amount_cents, type, kind, description, encrypted FROM transactions "
+                 "WHERE account_id = ?")
+        params: list = [account_id]
+        if since is not None:
+            query += " AND timestamp >= ?"
+            params.append(since)
+        if until is not None:
+            query += " AND timestamp < ?"
+            params.append(until)
+        query += " ORDER BY timestamp, position"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._transaction_from_row(row) for row in rows]
+
+    def close(self):
+        """Closes the database connection."""
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+            self._conn = None
+
+    # ========== BULK LOADING ==========
+
+    def import_data(self, users: Iterable[User], accounts: Iterable[Account],
+                    schedules: Iterable[ScheduledPayment] = ()):
+        """Inserts complete users and accounts (with history) and scheduled payments in one transaction."""
+        with self._lock, self._conn:
+            for schedule in schedules:
+                self._apply_record({"op": "schedule", "schedule": schedule.to_record()})
+                self.schedules[schedule.schedule_id] = schedule
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO users VALUES (?, ?, ?, ?, ?)",
+                ((u.username, u.password_hash, u.salt, u.role, u.account_id) for u in users)
+            )
+            for account in accounts:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO accounts (account_id, owner_username, balance_cents) VALUES (?, ?, ?)",
+                    (account.account_id, account.owner_username, account.balance)
+                )
+                self._conn.execute("DELETE FROM transactions WHERE account_id = ?", (account.account_id,))
+                self._conn.executemany(
+                    INSERT_TRANSACTION.format(""),
+                    (self._transaction_row(account.account_id, position, tx)
+                     for position, tx in enumerate(account.transactions))
+                )
+
+    # ========== ROW MAPPING ==========
+
+    def _apply_record(self, record: dict):
+        """Translates one change record into SQL statements."""
+        op = record["op"]
+        if op == "user":
+            self._conn.execute(
+                "INSERT OR REPLACE INTO users VALUES (?, ?, ?, ?, ?)",
+                (record["username"], bytes.fromhex(record["password_hash"]), bytes.fromhex(record["salt"]),
+                 record["role"], record.get("account_id"))
+            )
+        elif op == "account":
+            self._conn.execute(
+                "INSERT OR IGNORE INTO accounts (account_id, owner_username, balance_cents) VALUES (?, ?, ?)",
+                (record["account_id"], record["owner_username"], balance_cents(record))
+            )
+        elif op == "tx":
+            cursor = self._conn.execute(
+                INSERT_TRANSACTION.format("OR IGNORE"),
+                self._transaction_row(record["account_id"], record["index"], record["transaction"])
+            )
+            if cursor.rowcount:
+                self._conn.execute(
+                    "UPDATE accounts SET balance_cents = ? WHERE account_id = ?",
+                    (balance_cents(record), record["account_id"])
+                )
+        elif op == "tx_update":
+            tx = record["transaction"]
+            self._conn.execute(
+                "UPDATE transactions SET description = ?, encrypted = ? WHERE account_id = ? AND position = ?",
+                (tx["description"], tx.get("encrypted"), record["account_id"], record["index"])
+            )
+        elif op == "schedule":
+            self._conn.execute(
+                "INSERT OR REPLACE INTO schedules (schedule_id, data) VALUES (?, ?)",
+                (record["schedule"]["schedule_id"], json.dumps(record["schedule"]))
+            )
+        elif op == "schedule_delete":
+            self._conn.execute("DELETE FROM schedules WHERE schedule_id = ?", (record["schedule_id"],))
+
+    def _count(self, table: str) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def _fetch_user(self, username: str) -> Optional[User]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+        return self._user_from_row(row) if row else None
+
+    def _scan_users(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM users ORDER BY username").fetchall()
+        for row in rows:
+            yield row[0], self._user_from_row(row)
+
+    def _fetch_account(self, account_id: str) -> Optional[Account]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM accounts WHERE account_id = ?", (account_id,)).fetchone()
+        return self._account_from_row(row) if row else None
+
+    def _scan_accounts(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM accounts ORDER BY account_id").fetchall()
+        for row in rows:
+            yield row[0], self._account_from_row(row)
+
+    def _account_from_row(self, row) -> Account:
+        account_id, owner_username, balance = row
+        with self._lock:
+            tx_rows = self._conn.execute(
+                "SELECT timestamp, amount_cents, type, kind, description, encrypted FROM transactions "
+                "WHERE account_id = ? ORDER BY position", (account_id,)
+            ).fetchall()
+        return Account(
+            account_id=account_id,
+            owner_username=owner_username,
+            balance=balance,
+            transactions=[self._transaction_from_row(tx_row) for tx_row in tx_rows]
+        )
+
+    @staticmethod
+    def _user_from_row(row) -> User:
+        username, password_hash, salt, role, account_id = row
+        return User(username=username, password_hash=bytes(password_hash), salt=bytes(salt),
+                    role=role, account_id=account_id)
+
+    @staticmethod
+    def _transaction_row(account_id: str, position: int, tx: dict) -> tuple:
+        return (account_id, position, tx["timestamp"], amount_cents(tx), tx["type"], transaction_kind(tx),
+                tx["description"], tx.get("encrypted"))
+
+    @staticmethod
+    def _transaction_from_row(row) -> dict:
+        timestamp, cents, tx_type, kind, description, encrypted = row
+        transaction = {"timestamp": timestamp, "amount_cents": cents, "type": tx_type, "kind": kind,
+                       "description": description}
+        if encrypted:
+            transaction["encrypted"] = encrypted
+        return transaction
@@ -0,0 +1,632 @@
+import gc
+import json
+import mmap
+import os
+import threading
+import zlib
+from contextlib import contextmanager
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, MutableMapping, Optional, Tuple
+from models import User, Account, ScheduledPayment, to_epoch
+from money import legacy_to_cents
+from read_views import AccountVersion
+import binary_snapshot
+
+SNAPSHOT_FORMATS = {"json": ".json", "binary": ".bin"}  # Format -> snapshot file extension
+
+class StorageEngine:
+    """Interface implemented by every storage backend behind Database.
+
+    An engine exposes `users` and `accounts` as mappings (which may load
+    lazily) and persists the change records staged by Database. Scheduled
+    payments are always held in memory, in `schedules`, since the scheduler
+    needs every due time at startup.
+    """
+
+    users: MutableMapping[str, User]
+    accounts: MutableMapping[str, Account]
+    schedules: Dict[str, ScheduledPayment]
+
+    def load(self):
+        """Loads (or connects to) the stored data."""
+        raise NotImplementedError
+
+    def write(self, records: List[dict], fsync: bool = False) -> bool:
+        """Persists a batch of change records as one unit, optionally forcing it to disk."""
+        raise NotImplementedError
+
+    def save_snapshot(self, fsync: bool = False) -> bool:
+        """Writes the complete current state, if the engine keeps snapshots."""
+        return True
+
+    def compact(self, fsync: bool = False) -> bool:
+        """Reclaims space used by incremental writes, if the engine has any."""
+        return True
+
+    def history(self, account_id: str, since: Optional[str] = None, until: Optional[str] = None,
+                limit: Optional[int] = None) -> List[dict]:
+        """Returns an account's transactions with since <= timestamp < until."""
+        account = self.accounts.get(account_id)
+        if account is None:
+            return []
+        ledger = account.transactions
+        positions = ledger.positions(None if since is None else to_epoch(since),
+                                     None if until is None else to_epoch(until))
+        return [ledger[position] for position in islice(positions, limit)]
+
+    def touch(self, account: Account):
+        """Called whenever an account is changed, before the change is written."""
+
+    def close(self):
+        """Releases any resources held by the engine."""
+
+    def _apply_record(self, record: dict):
+        """Applies a single journal record to the users and accounts mappings."""
+        op = record["op"]
+        if op == "user":
+            self.users[record["username"]] = user_from_record(record)
+        elif op == "account":
+            if record["account_id"] not in self.accounts:
+                self.accounts[record["account_id"]] = Account(
+                    account_id=record["account_id"],
+                    owner_username=record["owner_username"],
+                    balance=balance_cents(record),
+                    transactions=[]
+                )
+        elif op == "tx":
+            account = self.accounts.get(record["account_id"])
+            if account is None:
+                print(f"❌ Warning: Journal references unknown account '{record['account_id']}'.")
+                return
+            # Records already folded into the snapshot are skipped
+            if record["index"] == len(account.transactions):
+                account.apply_transaction(record["transaction"])
+        elif op == "tx_update":
+            account = self.accounts.get(record["account_id"])
+            if account is not None and record["index"] < len(account.transactions):
+                account.transactions[record["index"]] = record["transaction"]
+        elif op == "schedule":
+            schedule = ScheduledPayment.from_record(record["schedule"])
+            self.schedules[schedule.schedule_id] = schedule
+        elif op == "schedule_delete":
+            self.schedules.pop(record["schedule_id"], None)
+
+
+def encode_schedules(schedules: Iterable[ScheduledPayment]) -> bytes:
+    """Scheduled payments as one compact JSON object keyed by schedule ID."""
+    return json.dumps({schedule.schedule_id: schedule.to_record() for schedule in schedules},
+                      separators=(",", ":")).encode()
+
+
+def decode_schedules(data) -> Dict[str, ScheduledPayment]:
+    return {schedule_id: ScheduledPayment.from_record(record)
+            for schedule_id, record in (json.loads(data[:]) if len(data) else {}).items()}
+
+
+class LazyTable(MutableMapping):
+    """A mapping that loads values from storage on first access and caches them.
+
+    Cached objects are handed out by identity, so in-place changes to a user
+    or account are visible to later lookups until they are committed.
+    """
+
+    def __init__(self, fetch: Callable[[str], Optional[object]], scan: Callable[[], Iterator[Tuple[str, object]]],
+                 count: Callable[[], int]):
+        self._cache: Dict[str, object] = {}
+        self._new: Dict[str, object] = {}  # Inserted but not yet persisted
+        self._fetch = fetch
+        self._scan = scan
+        self._count = count
+        self._lock = threading.RLock()  # Makes sure each key is only ever loaded once
+
+    def __getitem__(self, key):
+        value = self._cache.get(key)
+        if value is None:
+            with self._lock:
+                value = self._cache.get(key)
+                if value is None:
+                    value = self._fetch(key)
+                    if value is None:
+                        raise KeyError(key)
+                    self._cache[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            if key not in self._cache and self._fetch(key) is None:
+                self._new[key] = value
+            self._cache[key] = value
+
+    def __delitem__(self, key):
+        raise TypeError("Stored records cannot be deleted")
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        for key, _ in self.items():
+            yield key
+
+    def __len__(self):
+        return self._count() + len(self._new)
+
+    def items(self):
+        """Scans storage, preferring cached objects over freshly loaded copies."""
+        for key, value in self._scan():
+            yield key, self._cache.get(key, value)
+        with self._lock:
+            new_items = list(self._new.items())
+        yield from new_items
+
+    def values(self):
+        for _, value in self.items():
+            yield value
+
+    def mark_persisted(self):
+        """Forgets which keys were new once the engine has written them."""
+        with self._lock:
+            self._new.clear()
+
+
+def write_atomic(path: str, data: bytes, fsync: bool = False):
+    """Writes to a temporary file and renames it over the target.
+
+    Readers see either the old or the new file, never a partial one. With
+    fsync the data and the rename are forced to disk before returning.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    if fsync and hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def balance_cents(record: dict) -> int:
+    """Balance of an account or journal record; older files stored float units under "balance"."""
+    if "balance_cents" in record:
+        return record["balance_cents"]
+    return legacy_to_cents(record.get("balance", 0.0))  # Default to 0 if missing
+
+
+def user_from_record(record: dict, username: Optional[str] = None) -> User:
+    """Builds a User from its JSON representation."""
+    return User(
+        username=username or record["username"],
+        password_hash=bytes.fromhex(record["password_hash"]),
+        salt=bytes.fromhex(record["salt"]),
+        role=record["role"],
+        account_id=record.get("account_id")  # May be None
+    )
+
+
+def encode_journal_record(record: dict) -> str:
+    """One journal line: the CRC32 of the JSON record, a space, the record."""
+    line = json.dumps(record, separators=(",", ":"))
+    return f"{zlib.crc32(line.encode()):08x} {line}\n"
+
+
+def decode_journal_record(line: str) -> Optional[dict]:
+    """Parses and verifies a journal line; None if it is damaged."""
+    line = line.rstrip("\n")
+    if line.startswith("{"):  # Written before records were checksummed
+        checksum, body = None, line
+    else:
+        checksum, _, body = line.partition(" ")
+    try:
+        if checksum is not None and int(checksum, 16) != zlib.crc32(body.encode()):
+            return None
+        return json.loads(body)
+    except ValueError:  # Also covers json.JSONDecodeError
+        return None
+
+
+def read_journal(path: str, truncate: bool = False) -> Iterator[dict]:
+    """Yields the records of a journal file that belong to complete batches.
+
+    Every record written by one write() call carries the sequence number of
+    the batch's last record under "batch", so a batch cut short by a crash
+    is dropped as a whole: batches land completely or not at all. Reading
+    stops at the first damaged record; with `truncate`, the file is cut back
+    to the end of the last complete batch so new records are not appended
+    after the damage.
+    """
+    intact = 0  # Bytes up to the end of the last complete batch
+    position = 0
+    batch: List[dict] = []
+    with open(path, "r") as f:
+        for line_number, line in enumerate(f, start=1):
+            record = decode_journal_record(line)
+            if record is None:
+                # A torn or corrupted write; records after it cannot be applied in order
+                print(f"❌ Warning: Ignoring damaged record at '{path}' line {line_number} and after.")
+                break
+            position += len(line.encode())
+            if "batch" not in record:  # Written before batches were marked
+                yield record
+                intact = position
+                continue
+            batch.append(record)
+            if record["seq"] == record["batch"]:
+                yield from batch
+                batch = []
+                intact = position
+        else:
+            if not batch:
+                return
+            print(f"❌ Warning: Ignoring incomplete batch of {len(batch)} records at the end of '{path}'.")
+    if truncate:
+        os.truncate(path, intact)
+
+
+class JSONStorage(StorageEngine):
+    """Stores data in users/accounts snapshot files, optionally with an append-only journal.
+
+    Snapshots are pretty-printed JSON (users.json, accounts.json) or the
+    compact binary format of binary_snapshot (users.bin, accounts.bin).
+
+    In snapshot mode every write rewrites users.json and accounts.json.
+    In journal mode every write appends one compact record per change to
+    journal.log; the snapshots are only rewritten on compaction and the
+    journal is replayed on top of them when the data is loaded.
+
+    Every snapshot is a checkpoint: checkpoint.json records the sequence
+    number of the last change it contains and CRC32s of both files, for the
+    current and the previous checkpoint. Journal records carry their own
+    sequence number and CRC32. Recovery loads the newest checkpoint whose
+    files check out (falling back to the previous one, e.g. after a torn
+    write) and replays only the records written after it. Scheduled
+    payments are part of every checkpoint, in schedules.json.
+
+    A checkpoint holds exactly the state its sequence number covers, even
+    while other threads are changing accounts: the engine follows each
+    account's ledger length and balance, and the users and scheduled
+    payments, as of the records written so far, and snapshots those.
+    """
+
+    def __init__(self, data_dir: str = ".", journal: bool = False, compact_every: int = 1000,
+                 snapshot_format: str = "json"):
+        if snapshot_format not in SNAPSHOT_FORMATS:
+            raise ValueError(f"Unknown snapshot format: {snapshot_format}")
+        self.users: Dict[str, User] = {}  # Stores users by username
+        self.accounts: Dict[str, Account] = {}  # Stores accounts by account ID
+        self.schedules: Dict[str, ScheduledPayment] = {}  # Stores scheduled payments by schedule ID
+        self.data_dir = data_dir
+        self._use_format(snapshot_format)
+        self.schedules_file = os.path.join(data_dir, "schedules.json")  # Same format for every snapshot format
+        self.journal_file = os.path.join(data_dir, "journal.log")
+        self.checkpoint_file = os.path.join(data_dir, "checkpoint.json")
+        self.journal = journal
+        self.compact_every = compact_every  # Journal records between checkpoints
+        self._journal_size = 0  # Records currently in the journal file
+        self._seq = 0  # Sequence number of the last record written
+        self._checkpoints: List[dict] = []  # Newest first: {"seq", "users_crc", "accounts_crc"}
+        # The data as of the last record written, which is what snapshots hold
+        self._covered_users: Dict[str, User] = {}
+        self._covered_accounts: Dict[str, Tuple[int, int]] = {}  # (ledger length, balance) by account ID
+        self._covered_schedules: Dict[str, ScheduledPayment] = {}
+
+    def load(self):
+        """Loads the latest valid checkpoint and replays the journal written after it."""
+        self._checkpoints = self._read_manifest()
+        checkpoint_seq = self._load_checkpoint()
+        self._seq = checkpoint_seq
+
+        # Replay changes made since the checkpoint; the previous journal is
+        # only needed when recovery fell back to the previous checkpoint
+        for path in (self._previous(self.journal_file), self.journal_file):
+            if os.path.exists(path):
+                self._replay_journal(path, checkpoint_seq)
+        self._cover_all()
+
+    def write(self, records: List[dict], fsync: bool = False) -> bool:
+        """Appends the records to the journal, or rewrites the snapshots in snapshot mode."""
+        for record in records:
+            self._seq += 1
+            record["seq"] = self._seq
+        for record in records:
+            record["batch"] = self._seq  # Replay applies the records only if the last one made it
+
+        if not self.journal:
+            self._cover(records)
+            return self.save_snapshot(fsync)
+
+        if not records:
+            return True
+
+        lines = "".join(encode_journal_record(record) for record in records)
+        try:
+            with open(self.journal_file, "a") as f:
+                f.write(lines)
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+        except Exception as e:
+            print(f"❌ Error: Failed to append to '{self.journal_file}'. {e}")
+            return False
+
+        self._cover(records)
+        self._journal_size += len(records)
+        if self._journal_size >= self.compact_every:
+            return self.compact(fsync)
+        return True
+
+    def save_snapshot(self, fsync: bool = False) -> bool:
+        """Saves user and account data to snapshot files as a new checkpoint.
+
+        The current files become the previous checkpoint, so a crash at any
+        point leaves at least one checkpoint whose checksums match. Called
+        with the database's io lock held, so no records are written meanwhile.
+        """
+        seq = self._seq
+        users = list(self._covered_users.values())
+        accounts = [AccountVersion(account_id, self.accounts[account_id].owner_username, balance,
+                                   self.accounts[account_id].transactions, length)
+                    for account_id, (length, balance) in self._covered_accounts.items()]
+        schedules = list(self._covered_schedules.values())
+
+        # Keep the current checkpoint (and the journal written since it) as the fallback
+        try:
+            for path in (self.users_file, self.accounts_file, self.schedules_file, self.journal_file):
+                if os.path.exists(path):
+                    os.replace(path, self._previous(path))
+            self._journal_size = 0
+            users_bytes = self._encode_users(users)
+            write_atomic(self.users_file, users_bytes, fsync)
+        except Exception as e:
+            print(f"❌ Error: Failed to save '{self.users_file}'. {e}")
+            return False
+
+        try:
+            accounts_bytes = self._encode_accounts(accounts)
+            write_atomic(self.accounts_file, accounts_bytes, fsync)
+        except Exception as e:
+            print(f"❌ Error: Failed to save '{self.accounts_file}'. {e}")
+            return False
+        try:
+            schedules_bytes = encode_schedules(schedules)
+            write_atomic(self.schedules_file, schedules_bytes, fsync)
+        except Exception as e:
+            print(f"❌ Error: Failed to save '{self.schedules_file}'. {e}")
+            return False
+        users_crc, accounts_crc = zlib.crc32(users_bytes), zlib.crc32(accounts_bytes)
+
+        # The manifest is written last: until it lands, recovery uses the previous checkpoint
+        checkpoint = {"seq": seq, "users_crc": users_crc, "accounts_crc": accounts_crc,
+                      "schedules_crc": zlib.crc32(schedules_bytes)}
+        self._checkpoints = [checkpoint] + self._checkpoints[:1]
+        try:
+            self._write_json_atomic(self.checkpoint_file, {"checkpoints": self._checkpoints}, fsync=fsync)
+        except Exception as e:
+            print(f"❌ Error: Failed to save '{self.checkpoint_file}'. {e}")
+            return False
+        return True
+
+    def import_data(self, users: Iterable[User], accounts: Iterable[Account],
+                    schedules: Iterable[ScheduledPayment] = ()):
+        """Adds complete users and accounts (with history) and scheduled payments, then writes a checkpoint."""
+        self.users.update((user.username, user) for user in users)
+        self.accounts.update((account.account_id, account) for account in accounts)
+        self.schedules.update((schedule.schedule_id, schedule) for schedule in schedules)
+        self._cover_all()
+        self.save_snapshot(fsync=True)
+
+    def convert(self, snapshot_format: str, fsync: bool = True) -> bool:
+        """Rewrites the loaded data as a checkpoint in another snapshot format and removes the old files."""
+        if snapshot_format not in SNAPSHOT_FORMATS:
+            raise ValueError(f"Unknown snapshot format: {snapshot_format}")
+        old_files = [self.users_file, self.accounts_file,
+                     self._previous(self.users_file), self._previous(self.accounts_file)]
+        self._use_format(snapshot_format)
+        self._checkpoints = []  # Checksums of the old files are meaningless now
+        if not self.save_snapshot(fsync):
+            return False
+        for path in old_files:
+            if os.path.exists(path) and path not in (self.users_file, self.accounts_file):
+                os.remove(path)
+        return True
+
+    def _use_format(self, snapshot_format: str):
+        extension = SNAPSHOT_FORMATS[snapshot_format]
+        self.snapshot_format = snapshot_format
+        self.users_file = os.path.join(self.data_dir, "users" + extension)
+        self.accounts_file = os.path.join(self.data_dir, "accounts" + extension)
+
+    def _encode_users(self, users: List[User]) -> bytes:
+        if self.snapshot_format == "binary":
+            return binary_snapshot.encode_users(users)
+        user_data = {
+            user.username: {
+                "password_hash": user.password_hash.hex(),
+                "salt": user.salt.hex(),
+                "role": user.role,
+                "account_id": user.account_id
+            }
+            for user in users
+        }
+        return json.dumps(user_data, indent=4).encode()
+
+    def _encode_accounts(self, accounts: List[AccountVersion]) -> bytes:
+        if self.snapshot_format == "binary":
+            return binary_snapshot.encode_accounts(accounts)
+        account_data = {
+            account.account_id: {
+                "owner_username": account.owner_username,
+                "balance_cents": account.balance,
+                "transactions": account.transactions[:account.length]
+            }
+            for account in accounts
+        }
+        return json.dumps(account_data, indent=4).encode()
+
+    # ========== CHECKPOINTS ==========
+
+    def _read_manifest(self) -> List[dict]:
+        if not os.path.exists(self.checkpoint_file):
+            return []
+        try:
+            with open(self.checkpoint_file, "r") as f:
+                return json.load(f)["checkpoints"]
+        except (json.JSONDecodeError, KeyError) as e:
+            print(f"❌ Warning: Failed to load '{self.checkpoint_file}'. Error: {e}")
+            return []
+
+    def _load_checkpoint(self) -> int:
+        """Loads the newest snapshot files matching a checkpoint entry. Returns its sequence number."""
+        candidates = [(self.users_file, self.accounts_file, self.schedules_file),
+                      (self._previous(self.users_file), self._previous(self.accounts_file),
+                       self._previous(self.schedules_file))]
+        if not any(os.path.exists(path) for files in candidates for path in files[:2]):
+            for other_format, extension in SNAPSHOT_FORMATS.items():
+                if os.path.exists(os.path.join(self.data_dir, "accounts" + extension)):
+                    raise RuntimeError(f"'{self.data_dir}' holds {other_format} snapshots; "
+                                       f"convert them with convert_snapshot.py first.")
+            return 0  # A new bank
+
+        for users_file, accounts_file, schedules_file in candidates:
+            try:
+                with self._mapped(users_file) as users_buffer, self._mapped(accounts_file) as accounts_buffer, \
+                        self._mapped(schedules_file, missing_ok=True) as schedules_buffer:
+                    users_crc, accounts_crc = zlib.crc32(users_buffer), zlib.crc32(accounts_buffer)
+                    if self._checkpoints:
+                        # Checkpoints from before scheduled payments have no schedules file
+                        match = [c for c in self._checkpoints
+                                 if c["users_crc"] == users_crc and c["accounts_crc"] == accounts_crc
+                                 and c.get("schedules_crc", zlib.crc32(b"")) == zlib.crc32(schedules_buffer)]
+                        if not match:
+                            print(f"❌ Warning: '{accounts_file}' does not match any checkpoint; trying an older one.")
+                            continue
+                        seq = match[0]["seq"]
+                    else:
+                        seq = 0  # Written before checkpoints existed; the journal is replayed in full
+                    self._load_snapshot(users_buffer, accounts_buffer)
+                    self.schedules.update(decode_schedules(schedules_buffer))
+            except FileNotFoundError:
+                continue
+            except (ValueError, KeyError) as e:  # Includes json.JSONDecodeError
+                print(f"❌ Warning: Failed to load '{accounts_file}'. Error: {e}")
+                self.users.clear()
+                self.accounts.clear()
+                self.schedules.clear()
+                continue
+            return seq
+
+        # Starting empty would overwrite the damaged files at the next checkpoint
+        raise RuntimeError(f"No valid checkpoint found next to '{self.accounts_file}'; refusing to start empty.")
+
+    def _load_snapshot(self, users_buffer, accounts_buffer):
+        # Millions of long-lived objects are created and none are garbage;
+        # cyclic GC passes during the load would only rescan them
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self._decode_snapshot(users_buffer, accounts_buffer)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def _decode_snapshot(self, users_buffer, accounts_buffer):
+        if self.snapshot_format == "binary":
+            self.users.update(binary_snapshot.decode_users(users_buffer))
+            self.accounts.update(binary_snapshot.decode_accounts(accounts_buffer))
+            return
+        user_data, account_data = json.loads(users_buffer[:]), json.loads(accounts_buffer[:])
+        for username, data in user_data.items():
+            self.users[username] = user_from_record(data, username)
+        for account_id, data in account_data.items():
+            self.accounts[account_id] = Account(
+                account_id=account_id,
+                owner_username=data["owner_username"],
+                balance=balance_cents(data),
+                transactions=data.get("transactions", [])  # Default to empty list
+            )
+
+    @staticmethod
+    def _previous(path: str) -> str:
+        """users.json -> users.prev.json, journal.log -> journal.prev.log"""
+        root, ext = os.path.splitext(path)
+        return f"{root}.prev{ext}"
+
+    @staticmethod
+    @contextmanager
+    def _mapped(path: str, missing_ok: bool = False):
+        """Maps a file read-only; the buffer is only valid inside the block. Missing files read as empty if allowed."""
+        if missing_ok and not os.path.exists(path):
+            yield b""
+            return
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield b""  # Empty files cannot be mapped
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped
+
+    # ========== COVERED STATE ==========
+
+    def _cover_all(self):
+        """Takes the loaded data as covered: nothing is being changed yet."""
+        self._covered_users = dict(self.users)
+        self._covered_accounts = {account_id: (account.length, account.balance)
+                                  for account_id, account in self.accounts.items()}
+        self._covered_schedules = dict(self.schedules)
+
+    def _cover(self, records: List[dict]):
+        """Moves the covered state past records just written.
+
+        Users and scheduled payments are rebuilt from their records, as the
+        objects in memory may have changed again since.
+        """
+        for record in records:
+            op = record["op"]
+            if op == "tx":
+                self._covered_accounts[record["account_id"]] = (record["index"] + 1, balance_cents(record))
+            elif op == "tx_update":
+                self._covered_accounts[record["account_id"]] = (record["length"], balance_cents(record))
+            elif op == "account":
+                self._covered_accounts.setdefault(record["account_id"], (0, balance_cents(record)))
+            elif op == "user":
+                self._covered_users[record["username"]] = user_from_record(record)
+            elif op == "schedule":
+                schedule = ScheduledPayment.from_record(record["schedule"])
+                self._covered_schedules[schedule.schedule_id] = schedule
+            elif op == "schedule_delete":
+                self._covered_schedules.pop(record["schedule_id"], None)
+
+    # ========== JOURNAL ==========
+
+    def compact(self, fsync: bool = False) -> bool:
+        """Folds the journal into a new checkpoint and starts a fresh journal."""
+        if not self.journal or not self._journal_size:
+            return True
+        return self.save_snapshot(fsync)
+
+    def close(self):
+        """Compacts the journal so the next start loads from snapshots only."""
+        self.compact()
+
+    def _replay_journal(self, path: str, after_seq: int):
+        """Applies the records of a journal file written after the given sequence number."""
+        for record in read_journal(path, truncate=path == self.journal_file):
+            seq = record.get("seq", 0)
+            if path == self.journal_file:
+                self._journal_size += 1
+            if seq and seq <= after_seq:
+                continue  # Already part of the checkpoint
+            self._apply_record(record)
+            self._seq = max(self._seq, seq)
+
+    @staticmethod
+    def _write_json_atomic(path: str, data, indent: Optional[int] = None, fsync: bool = False):
+        """Writes JSON to a temporary file and renames it over the target."""
+        write_atomic(path, json.dumps(data, indent=indent).encode(), fsync)
@@ -0,0 +1,152 @@
+"""Secondary indexes over users for admin queries: by role, by account presence and by username prefix.
+
+Usernames are kept in one sorted collection per (role, has_account)
+partition. A query seeks to its start position in every partition that
+matches the filter (a bisect each) and merges them in username order, so
+a page costs O(partitions * log n + limit) however many users there are,
+and a prefix search stops at the first username past the prefix.
+"""
+import heapq
+import threading
+from bisect import bisect_left, bisect_right, insort
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from models import User
+
+Partition = Tuple[str, bool]  # (role, has_account)
+
+
+class SortedStrings:
+    """Sorted set of strings stored as a list of bounded chunks.
+
+    Inserting into one big sorted list moves every later entry, which adds
+    up to seconds per thousand inserts at a million entries; chunks of at
+    most 2 * LOAD entries keep each insert to a small copy.
+    """
+    LOAD = 1000
+
+    def __init__(self, items: Iterable[str] = ()):
+        ordered = sorted(set(items))
+        self._chunks: List[List[str]] = [ordered[i:i + self.LOAD] for i in range(0, len(ordered), self.LOAD)]
+        self._maxes: List[str] = [chunk[-1] for chunk in self._chunks]
+        self._len = len(ordered)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __contains__(self, value: str) -> bool:
+        i = bisect_left(self._maxes, value)
+        if i == len(self._maxes):
+            return False
+        chunk = self._chunks[i]
+        return chunk[bisect_left(chunk, value)] == value
+
+    def add(self, value: str):
+        if not self._chunks:
+            self._chunks.append([value])
+            self._maxes.append(value)
+            self._len = 1
+            return
+        i = min(bisect_left(self._maxes, value), len(self._maxes) - 1)
+        chunk = self._chunks[i]
+        j = bisect_left(chunk, value)
+        if j < len(chunk) and chunk[j] == value:
+            return
+        insort(chunk, value)
+        self._maxes[i] = chunk[-1]
+        self._len += 1
+        if len(chunk) > 2 * self.LOAD:
+            self._chunks[i:i + 1] = [chunk[:self.LOAD], chunk[self.LOAD:]]
+            self._maxes[i:i + 1] = [chunk[self.LOAD - 1], chunk[-1]]
+
+    def discard(self, value: str) -> bool:
+        """Removes value if present; returns whether it was."""
+        i = bisect_left(self._maxes, value)
+        if i == len(self._maxes):
+            return False
+        chunk = self._chunks[i]
+        j = bisect_left(chunk, value)
+        if chunk[j] != value:
+            return False
+        del chunk[j]
+        self._len -= 1
+        if chunk:
+            self._maxes[i] = chunk[-1]
+        else:
+            del self._chunks[i], self._maxes[i]
+        return True
+
+    def iter_from(self, start: str, inclusive: bool = True) -> Iterator[str]:
+        """Values >= start (or > start), in order."""
+        find = bisect_left if inclusive else bisect_right
+        i = find(self._maxes, start)
+        if i == len(self._chunks):
+            return
+        chunk = self._chunks[i]
+        yield from islice(chunk, find(chunk, start), None)
+        for chunk in islice(self._chunks, i + 1, None):
+            yield from chunk
+
+
+class UserIndex:
+    """Usernames partitioned by role and account presence, each partition sorted."""
+
+    def __init__(self, users: Iterable[User] = ()):
+        grouped: Dict[Partition, List[str]] = {}
+        for user in users:
+            grouped.setdefault(self.partition(user), []).append(user.username)
+        self._partitions: Dict[Partition, SortedStrings] = {key: SortedStrings(names)
+                                                            for key, names in grouped.items()}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def partition(user: User) -> Partition:
+        return user.role, bool(user.account_id)
+
+    def update(self, user: User):
+        """Files a new or changed user under its current role and account presence."""
+        key = self.partition(user)
+        with self._lock:
+            for other, names in self._partitions.items():
+                if other != key and names.discard(user.username):
+                    break
+            names = self._partitions.get(key)
+            if names is None:
+                names = self._partitions[key] = SortedStrings()
+            names.add(user.username)
+
+    def count(self, role: Optional[str] = None, has_account: Optional[bool] = None) -> int:
+        """Users matching the filters, without a prefix."""
+        with self._lock:
+            return sum(len(names) for key, names in self._partitions.items()
+                       if self._matches(key, role, has_account))
+
+    def page(self, role: Optional[str] = None, has_account: Optional[bool] = None, prefix: str = "",
+             after: Optional[str] = None, limit: int = 50) -> Tuple[List[Tuple[str, str, bool]], Optional[str]]:
+        """One page of (username, role, has_account) in username order, and the cursor of the next page.
+
+        `after` is the last username of the previous page; the cursor is
+        None when nothing is left.
+        """
+        inclusive = after is None or after < prefix
+        start = prefix if inclusive else after
+        with self._lock:
+            streams = [self._rows(key, names.iter_from(start, inclusive))
+                       for key, names in self._partitions.items() if self._matches(key, role, has_account)]
+            rows = []
+            for row in heapq.merge(*streams):
+                if not row[0].startswith(prefix) or len(rows) > limit:
+                    break
+                rows.append(row)
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        return rows[:limit], next_cursor
+
+    @staticmethod
+    def _rows(key: Partition, names: Iterator[str]) -> Iterator[Tuple[str, str, bool]]:
+        role, has_account = key
+        for name in names:
+            yield name, role, has_account
+
+    @staticmethod
+    def _matches(key: Partition, role: Optional[str], has_account: Optional[bool]) -> bool:
+        return (role is None or key[0] == role) and (has_account is None or key[1] == has_account)
@@ -0,0 +1,171 @@
+"""Sliding-window velocity limits on transfers.
+
+A rule caps how many transfers, and how many cents, an account may send
+(scope "sender") or receive (scope "recipient") within a rolling window,
+e.g. at most 20 transfers or $5,000.00 sent per hour. Every account a rule
+has seen activity for gets a SlidingWindow: a ring of fixed-width buckets
+holding a count and a sum each, plus running totals of the whole ring.
+Checking a transfer reads the totals and recording one updates a single
+bucket, so neither depends on the length of the account's history; moving
+the window forward clears only the buckets it passes over.
+
+The window moves one bucket at a time, so a rule of W seconds with B
+buckets counts the activity of the last W - W/B to W seconds. Windows live
+in memory only and are rebuilt at startup from the ledger entries inside
+the longest window.
+
+Rules are written as scope:window:max_count:max_amount, e.g.
+"sender:3600:20:5000.00" or "recipient:86400::20000" (blank = no cap).
+"""
+from array import array
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from models import Account, KIND_CODES, TYPE_CODES
+from money import to_cents
+
+SCOPES = ("sender", "recipient")
+
+
+@dataclass(slots=True)
+class VelocityRule:
+    """At most max_count transfers and max_amount cents per window seconds, per account."""
+    name: str
+    scope: str  # One of SCOPES
+    window: float  # Seconds
+    max_count: Optional[int] = None
+    max_amount: Optional[int] = None  # Cents
+    buckets: int = 20  # Resolution of the window
+
+    @classmethod
+    def parse(cls, spec: str) -> "VelocityRule":
+        """Reads a "scope:window:max_count:max_amount" rule; raises ValueError if it is malformed."""
+        parts = spec.split(":")
+        if len(parts) != 4 or parts[0] not in SCOPES:
+            raise ValueError(f"Invalid velocity rule: {spec!r}")
+        scope, window, max_count, max_amount = parts
+        rule = cls(spec, scope, float(window), int(max_count) if max_count else None,
+                   to_cents(max_amount) if max_amount else None)
+        if rule.window <= 0 or (rule.max_count is None and rule.max_amount is None):
+            raise ValueError(f"Invalid velocity rule: {spec!r}")
+        return rule
+
+
+class SlidingWindow:
+    """Transfer count and amount over a rolling window, kept in a ring of buckets."""
+
+    __slots__ = ("bucket_seconds", "size", "buckets", "head", "count", "total")
+
+    def __init__(self, window: float, buckets: int):
+        self.bucket_seconds = window / buckets
+        self.size = buckets
+        self.buckets = array("q", bytes(16 * buckets))  # Count and sum of bucket i at 2i and 2i + 1
+        self.head = 0  # Number of the newest bucket (seconds // bucket_seconds)
+        self.count = 0  # Totals over every bucket in the ring
+        self.total = 0
+
+    def advance(self, now: float):
+        """Moves the window to end at `now`, emptying the buckets that fell out of it."""
+        bucket = int(now // self.bucket_seconds)
+        if bucket <= self.head:
+            return
+        if bucket - self.head >= self.size:
+            self.buckets = array("q", bytes(16 * self.size))
+            self.count = self.total = 0
+        else:
+            buckets = self.buckets
+            for number in range(self.head + 1, bucket + 1):
+                slot = 2 * (number % self.size)
+                self.count -= buckets[slot]
+                self.total -= buckets[slot + 1]
+                buckets[slot] = buckets[slot + 1] = 0
+        self.head = bucket
+
+    def add(self, timestamp: float, amount: int):
+        """Counts a transfer made at `timestamp`; ones already outside the window are ignored."""
+        bucket = int(timestamp // self.bucket_seconds)
+        if bucket > self.head:
+            self.advance(timestamp)
+        elif bucket <= self.head - self.size:
+            return
+        slot = 2 * (bucket % self.size)
+        self.buckets[slot] += 1
+        self.buckets[slot + 1] += amount
+        self.count += 1
+        self.total += amount
+
+
+class VelocityLimits:
+    """Sliding windows for every rule and account, checked and updated in the transfer path.
+
+    Callers hold the account locks of the sender and recipients while they
+    check and record a transfer, which is also what guards their windows.
+    """
+
+    def __init__(self, rules: Iterable[VelocityRule] = ()):
+        self.rules: List[VelocityRule] = list(rules)
+        self._windows: List[Dict[str, SlidingWindow]] = [{} for _ in self.rules]  # Per rule, by account ID
+
+    def check(self, sender_id: str, transfers: Sequence[Tuple[str, int]], now: float) -> Optional[VelocityRule]:
+        """The first rule that the (recipient account ID, cents) transfers would break, or None."""
+        if not self.rules:
+            return None
+        incoming: Dict[str, list] = {}
+        for recipient_id, amount in transfers:
+            totals = incoming.setdefault(recipient_id, [0, 0])
+            totals[0] += 1
+            totals[1] += amount
+        outgoing = [(sender_id, len(transfers), sum(amount for _, amount in transfers))]
+        for rule, windows in zip(self.rules, self._windows):
+            for account_id, count, amount in (outgoing if rule.scope == "sender" else
+                                              ((r, c, a) for r, (c, a) in incoming.items())):
+                window = windows.get(account_id)
+                if window is None:
+                    seen_count = seen_amount = 0
+                else:
+                    window.advance(now)
+                    seen_count, seen_amount = window.count, window.total
+                if ((rule.max_count is not None and seen_count + count > rule.max_count)
+                        or (rule.max_amount is not None and seen_amount + amount > rule.max_amount)):
+                    return rule
+        return None
+
+    def record(self, sender_id: str, transfers: Sequence[Tuple[str, int]], now: float):
+        """Counts transfers that were made."""
+        for rule, windows in zip(self.rules, self._windows):
+            for recipient_id, amount in transfers:
+                account_id = sender_id if rule.scope == "sender" else recipient_id
+                window = windows.get(account_id)
+                if window is None:
+                    window = windows[account_id] = SlidingWindow(rule.window, rule.buckets)
+                window.add(now, amount)
+
+    def rebuild(self, accounts: Iterable[Account], now: float) -> int:
+        """Refills every window from the transfer entries of the last (longest) window; returns entries read.
+
+        Only the tail of each ledger is read: the window's start is found by
+        bisecting the ledger's timestamps.
+        """
+        for windows in self._windows:
+            windows.clear()
+        if not self.rules:
+            return 0
+        since = now - max(rule.window for rule in self.rules)
+        transfer, credit = KIND_CODES["transfer"], TYPE_CODES["credit"]
+        read = 0
+        for account in accounts:
+            ledger = account.transactions
+            recent = ledger.positions(since)
+            by_scope: Dict[str, List[int]] = {"sender": [], "recipient": []}
+            kinds, types = ledger.kinds, ledger.types
+            for position in recent:
+                read += 1
+                if kinds[position] == transfer:
+                    by_scope["recipient" if types[position] == credit else "sender"].append(position)
+            for rule, windows in zip(self.rules, self._windows):
+                positions = by_scope[rule.scope]
+                if positions:
+                    window = windows[account.account_id] = SlidingWindow(rule.window, rule.buckets)
+                    window.advance(now)  # Up front, so adding older entries never moves the ring
+                    for position in positions:
+                        window.add(ledger.timestamps[position], ledger.amounts[position])
+        return read
@@ -0,0 +1,94 @@
+"""Throughput and memory of the streaming ledger export.
+
+Builds a synthetic bank whose entries carry real encrypted descriptions,
+then dumps the whole ledger through export.write_export with several
+settings, reporting rows/s and output size. Finally it traces the Python
+heap while exporting a quarter of the accounts and all of them: the peak
+should be the same, since only a few chunks are ever held.
+
+Usage:
+    python benchmarks/export_ledger.py [--accounts 2000] [--transactions 500] [--workers 4]
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "banking_system"))
+
+from crypto_utils import CryptoManager  # noqa: E402
+from database import Database  # noqa: E402
+from export import ledger_chunks, write_export  # noqa: E402
+from models import Account, Ledger, User  # noqa: E402
+from snapshot_formats import DESCRIPTIONS  # noqa: E402
+
+def build(db: Database, accounts: int, transactions: int, tokens: dict):
+    """Fills the database's mappings directly with clients and their ledgers."""
+    rng = random.Random(42)
+    start = 1_600_000_000.0
+    for i in range(accounts):
+        username, account_id = f"client{i:07d}", f"acct{i:07d}"
+        descriptions = [rng.choice(DESCRIPTIONS) for _ in range(transactions)]
+        ledger = Ledger.from_columns(
+            array("d", sorted(float(int(start + rng.random() * 1e8)) for _ in range(transactions))),
+            array("q", (rng.randint(100, 200_000) for _ in range(transactions))),
+            array("b", (rng.randint(0, 1) for _ in range(transactions))),
+            array("b", bytes(transactions)),
+            descriptions,
+            [len(tokens[d]) for d in descriptions],
+            b"".join(tokens[d] for d in descriptions)
+        )
+        db.users[username] = User(username, b"", b"", "client", account_id)
+        db.accounts[account_id] = Account(account_id, username, sum(ledger.amounts), ledger)
+
+def export(db: Database, path: str, fmt: str, keyring_path, workers: int, limit=None) -> dict:
+    with db.snapshot() as view:
+        accounts = list(view.accounts())[:limit]
+        return write_export([path], ledger_chunks(accounts), fmt, path.endswith(".gz"), keyring_path, workers)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--accounts", type=int, default=2_000)
+    parser.add_argument("--transactions", type=int, default=500, help="Ledger entries per account")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Encoding processes for the parallel runs")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as data_dir:
+        keyring_path = os.path.join(data_dir, "keyring.json")
+        crypto = CryptoManager(keyring_path)
+        tokens = {description: crypto.encrypt_data(description) for description in DESCRIPTIONS}
+        db = Database(data_dir)
+        start = time.perf_counter()
+        build(db, args.accounts, args.transactions, tokens)
+        print(f"Built {args.accounts} accounts x {args.transactions} entries in {time.perf_counter() - start:.1f}s")
+
+        runs = [("csv", "", None, 0), ("csv", ".gz", None, 0), ("jsonl", ".gz", None, 0),
+                ("csv", ".gz", None, args.workers), ("csv", ".gz", keyring_path, 0),
+                ("csv", ".gz", keyring_path, args.workers)]
+        for fmt, suffix, keys, workers in runs:
+            path = os.path.join(data_dir, f"ledger.{fmt}{suffix}")
+            start = time.perf_counter()
+            result = export(db, path, fmt, keys, workers)
+            elapsed = time.perf_counter() - start
+            label = f"{fmt}{suffix}{' decrypted' if keys else ''}, {workers or 'no'} workers"
+            print(f"{label:<34} {result['rows'] / elapsed:12,.0f} rows/s  {result['bytes'] / 1e6:8.1f} MB  "
+                  f"({elapsed:.2f}s)", flush=True)
+            os.remove(path)
+
+        for limit in (args.accounts // 4, args.accounts):
+            path = os.path.join(data_dir, "ledger.csv.gz")
+            tracemalloc.start()
+            result = export(db, path, "csv", None, 0, limit)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{'peak heap, ' + format(result['rows'], ',') + ' rows':<34} {peak / 1e6:12.2f} MB")
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Memory per transaction: list of dicts versus the columnar Ledger.
+
+Builds the same synthetic history both ways and measures the heap growth
+with tracemalloc.
+
+Usage:
+    python benchmarks/ledger_memory.py [--transactions 100000] [--no-encrypted]
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "banking_system"))
+
+from models import Ledger, TIMESTAMP_FORMAT  # noqa: E402
+
+DESCRIPTIONS = ["Salary", "Rent", "Groceries", "Deposit - cash", "Withdrawal - ATM", "Transfer", "Utilities"]
+
+def synthetic_history(count: int, encrypted: bool):
+    """Yields realistic-looking transactions: repeated descriptions, fresh ciphertext per entry."""
+    rng = random.Random(42)
+    start = datetime(2020, 1, 1)
+    for i in range(count):
+        transaction = {
+            "timestamp": (start + timedelta(minutes=37 * i)).strftime(TIMESTAMP_FORMAT),
+            "amount_cents": rng.randint(100, 200_000),
+            "type": rng.choice(("credit", "debit")),
+            # Built at runtime like real input, so equal strings are distinct objects until interned
+            "description": "".join(rng.choice(DESCRIPTIONS))
+        }
+        if encrypted:
+            # Same size as a key-ID-prefixed Fernet token of a short description, hex encoded
+            transaction["encrypted"] = os.urandom(103).hex()
+        yield transaction
+
+def measure(build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del result
+    return used
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transactions", type=int, default=100_000)
+    parser.add_argument("--no-encrypted", action="store_true", help="Leave out encrypted descriptions")
+    args = parser.parse_args()
+    n, encrypted = args.transactions, not args.no_encrypted
+
+    dicts = measure(lambda: list(synthetic_history(n, encrypted)))
+    ledger = measure(lambda: Ledger(synthetic_history(n, encrypted)))
+    print(f"{n} transactions ({'with' if encrypted else 'without'} encrypted descriptions)")
+    print(f"  list of dicts: {dicts / n:8.1f} bytes/transaction ({dicts / 2**20:.1f} MiB)")
+    print(f"  Ledger:        {ledger / n:8.1f} bytes/transaction ({ledger / 2**20:.1f} MiB)")
+    print(f"  reduction:     {dicts / ledger:8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Load generator for banking_system/server.py.
+
+Opens several connections, keeps a fixed number of pipelined requests in
+flight on each, and reports requests per second and latency percentiles.
+
+Usage:
+    python banking_system/server.py --data-dir /tmp/bank &
+    python benchmarks/loadgen.py [--connections 16] [--pipeline 8] [--duration 10] [--op transfer]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from typing import Dict, List
+
+class Client:
+    """One pipelining connection to the bank server."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.ids = itertools.count(1)
+        self.waiting: Dict[int, asyncio.Future] = {}
+        self.receiver = asyncio.create_task(self._receive())
+
+    @classmethod
+    async def connect(cls, host: str, port: int) -> "Client":
+        reader, writer = await asyncio.open_connection(host, port, limit=1 << 20)
+        return cls(reader, writer)
+
+    async def call(self, op: str, args: dict = None, session: str = None) -> dict:
+        request_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[request_id] = future
+        request = {"id": request_id, "op": op, "args": args or {}, "session": session}
+        self.writer.write(json.dumps(request).encode() + b"\n")
+        await self.writer.drain()
+        return await future
+
+    async def _receive(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            future = self.waiting.pop(response.get("id"), None)
+            if future is not None and not future.done():
+                future.set_result(response)
+        for future in self.waiting.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Server closed the connection"))
+
+    async def close(self):
+        self.writer.close()
+        self.receiver.cancel()
+
+async def setup(host: str, port: int, users: int) -> List[str]:
+    """Registers and funds the load-test users, returning one session per user."""
+    client = await Client.connect(host, port)
+    names = [f"load{i}" for i in range(users)]
+    await asyncio.gather(*(client.call("register", {"username": n, "password": "pw"}) for n in names),
+                         client.call("register", {"username": "load-teller", "password": "pw", "role": "employee"}))
+    teller = (await client.call("login", {"username": "load-teller", "password": "pw"}))["result"]["session"]
+    await asyncio.gather(*(client.call("process_transaction",
+                                       {"username": n, "amount": 1_000_000, "type": "deposit", "description": "load"},
+                                       session=teller) for n in names))
+    logins = await asyncio.gather(*(client.call("login", {"username": n, "password": "pw"}) for n in names))
+    await client.close()
+    return [response["result"]["session"] for response in logins]
+
+async def worker(client: Client, sessions: List[str], op: str, pipeline: int, deadline: float,
+                 latencies: List[float], errors: List[int]):
+    """Keeps `pipeline` requests in flight on one connection until the deadline."""
+    rng = random.Random()
+
+    async def one_stream():
+        while time.perf_counter() < deadline:
+            session = rng.choice(sessions)
+            if op == "transfer":
+                args = {"recipient": f"load{rng.randrange(len(sessions))}", "amount": 1, "description": "load"}
+            else:
+                args = {}
+            start = time.perf_counter()
+            response = await client.call(op, args, session=session)
+            latencies.append(time.perf_counter() - start)
+            if not response.get("ok"):
+                errors[0] += 1
+
+    await asyncio.gather(*(one_stream() for _ in range(pipeline)))
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+async def run(args):
+    sessions = await setup(args.host, args.port, args.users)
+    clients = [await Client.connect(args.host, args.port) for _ in range(args.connections)]
+    latencies: List[float] = []
+    errors = [0]
+
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*(worker(c, sessions, args.op, args.pipeline, deadline, latencies, errors) for c in clients))
+    elapsed = time.perf_counter() - start
+    for client in clients:
+        await client.close()
+
+    latencies.sort()
+    print(f"{len(latencies)} '{args.op}' requests in {elapsed:.2f}s over {args.connections} connections "
+          f"x {args.pipeline} pipelined")
+    print(f"  throughput: {len(latencies) / elapsed:.0f} req/s, errors: {errors[0]}")
+    print("  latency ms: " + ", ".join(f"p{label}={percentile(latencies, p) * 1000:.2f}"
+                                      for label, p in (("50", 0.5), ("95", 0.95), ("99", 0.99), ("99.9", 0.999))) +
+          f", max={latencies[-1] * 1000 if latencies else 0:.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for the bank server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument("--pipeline", type=int, default=8, help="In-flight requests per connection")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--op", default="transfer", choices=["transfer", "balance"])
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Reports on a running bank: live reads against snapshot read views.
+
+Worker threads make random transfers between registered clients while a
+reporting thread audits every ledger over and over (reconcile.reconcile).
+Money only moves between accounts, so every consistent audit finds the
+same total, no balance that disagrees with its ledger and as many transfer
+credits as debits. Three runs:
+
+    no reports   transfer throughput alone
+    live         audits reading db.accounts directly, as transfers change them
+    snapshot     audits of db.snapshot() read views
+
+Usage:
+    python benchmarks/read_views.py [--users 200] [--threads 4] [--duration 5] [--engine json]
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "banking_system"))
+
+from bank_system import BankingSystem  # noqa: E402
+from database import Database, ENGINES  # noqa: E402
+from reconcile import reconcile  # noqa: E402
+
+OPENING_BALANCE = 1_000_000
+
+def consistent(report: dict, total: int) -> bool:
+    return (report["total_balance"] == total and not report["mismatches"]
+            and report["transfer_credits"] == report["transfer_debits"])
+
+def run(users: int, threads: int, duration: float, engine: str, reports: str) -> dict:
+    """Transfers for `duration` seconds with the given kind of reporting ("none", "live" or "snapshot")."""
+    with tempfile.TemporaryDirectory() as data_dir:
+        options = {"journal": True} if engine == "json" else {}
+        bank = BankingSystem(Database(data_dir, engine=engine, flush_interval=0.01, **options))
+        names = [f"user{i}" for i in range(users)]
+        for name in names:
+            bank.register_user(name, "password")
+        bank.register_user("teller", "password", "employee")
+        teller = bank.login("teller", "password")
+        for name in names:
+            bank.process_transaction(teller, name, OPENING_BALANCE, "deposit", "opening balance")
+        sessions = [bank.login(name, "password") for name in names]
+        total = OPENING_BALANCE * users
+
+        stop = threading.Event()
+        transfers = [0] * threads
+
+        def transfer(worker: int):
+            rng = random.Random(worker)
+            while not stop.is_set():
+                if bank.transfer_money(rng.choice(sessions), rng.choice(names), rng.randint(1, 500), "report"):
+                    transfers[worker] += 1
+
+        audits = {"audits": 0, "torn": 0, "seconds": 0.0}
+
+        def report():
+            while not stop.is_set():
+                start = time.perf_counter()
+                if reports == "live":
+                    result = reconcile(account for _, account in bank.db.accounts.items())
+                else:
+                    with bank.db.snapshot() as view:
+                        result = reconcile(view.accounts())
+                audits["seconds"] += time.perf_counter() - start
+                audits["audits"] += 1
+                audits["torn"] += not consistent(result, total)
+
+        workers = [threading.Thread(target=transfer, args=(i,)) for i in range(threads)]
+        if reports != "none":
+            workers.append(threading.Thread(target=report))
+        for worker in workers:
+            worker.start()
+        time.sleep(duration)
+        stop.set()
+        for worker in workers:
+            worker.join()
+
+        with bank.db.snapshot() as view:
+            final = reconcile(view.accounts())
+        bank.db.close()
+    return {"transfers_per_second": sum(transfers) / duration, "conserved": consistent(final, total), **audits}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=4, help="Transferring threads")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per run")
+    parser.add_argument("--engine", default="json", choices=list(ENGINES))
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    conserved = True
+    for reports in ("none", "live", "snapshot"):
+        result = run(args.users, args.threads, args.duration, args.engine, reports)
+        conserved &= result["conserved"]
+        line = f"{reports:<9} {result['transfers_per_second']:10.0f} transfers/s"
+        if result["audits"]:
+            line += (f"   {result['audits']} audits ({result['seconds'] / result['audits'] * 1e3:.1f} ms each), "
+                     f"{result['torn']} inconsistent")
+        print(line, flush=True)
+    print("✅ Total money conserved." if conserved else "❌ Total money changed.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Month-end run of standing orders: N monthly payments all due on the same day.
+
+Builds a bank of synthetic clients whose standing orders (spread over the
+clients) all fall on the last day of the month, stores it with the chosen
+engine, then measures:
+
+    open      loading the bank, schedules included
+    heapify   building the due-time heap over every order
+    idle tick a tick the day before, when nothing is due
+    month-end the tick that makes every payment, persisted with one commit
+    reopen    loading the bank again, with the tick's records to replay
+
+Usage:
+    python benchmarks/scheduled_payments.py [--orders 1000000] [--clients 100000] [--engine json]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "banking_system"))
+
+from bank_system import BankingSystem  # noqa: E402
+from database import Database, ENGINES  # noqa: E402
+from models import ScheduledPayment  # noqa: E402
+from snapshot_formats import synthetic_bank  # noqa: E402
+
+MONTH_END = datetime(2024, 1, 31, 9, 0)
+DESCRIPTIONS = ["Rent", "Savings", "Gym", "Insurance", "Phone", "Allowance", "Loan repayment"]
+
+def build(data_dir: str, engine: str, orders: int, clients: int) -> int:
+    """Stores the synthetic bank; returns the cents every client needs for its orders."""
+    users, accounts = synthetic_bank(clients, 0)
+    usernames = list(users)
+    rng = random.Random(7)
+    schedules = {}
+    for i in range(orders):
+        owner = usernames[i % clients]
+        recipient = usernames[(i % clients + rng.randrange(1, clients)) % clients]
+        schedule = ScheduledPayment(f"{i:012x}", owner, recipient, rng.randint(100, 50_000),
+                                    rng.choice(DESCRIPTIONS), MONTH_END.timestamp(), "monthly", 31)
+        schedules[schedule.schedule_id] = schedule
+    funding = 50_000 * -(-orders // clients)
+    for account in accounts.values():
+        account.balance = funding
+
+    options = {"journal": True} if engine == "json" else {}
+    storage = ENGINES[engine](data_dir, **options)
+    storage.load()
+    storage.import_data(users.values(), accounts.values(), schedules.values())
+    storage.close()
+    return funding * clients
+
+def open_bank(data_dir: str, engine: str) -> BankingSystem:
+    options = {"journal": True} if engine == "json" else {}
+    return BankingSystem(Database(data_dir, engine=engine, **options))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=1_000_000, help="Standing orders due at month-end")
+    parser.add_argument("--clients", type=int, default=100_000, help="Accounts the orders are spread over")
+    parser.add_argument("--engine", default="json", choices=list(ENGINES))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        start = time.perf_counter()
+        total = build(data_dir, args.engine, args.orders, args.clients)
+        print(f"Built {args.orders} orders over {args.clients} clients ({args.engine}) "
+              f"in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        bank = open_bank(data_dir, args.engine)
+        print(f"{'open':<10} {time.perf_counter() - start:10.3f} s")
+
+        start = time.perf_counter()
+        queued = len(bank.db.payment_schedule)
+        print(f"{'heapify':<10} {time.perf_counter() - start:10.3f} s   ({queued} orders)")
+
+        start = time.perf_counter()
+        idle = bank.run_due_payments(MONTH_END.timestamp() - 86_400)
+        print(f"{'idle tick':<10} {(time.perf_counter() - start) * 1e6:10.1f} µs  ({idle['paid']} paid)")
+
+        start = time.perf_counter()
+        result = bank.run_due_payments(MONTH_END.timestamp())
+        elapsed = time.perf_counter() - start
+        print(f"{'month-end':<10} {elapsed:10.3f} s   ({result['paid']} paid, {result['failed']} failed, "
+              f"{result['paid'] / elapsed:,.0f} payments/s, {elapsed / max(result['paid'], 1) * 1e6:.1f} µs each)")
+        bank.db.close()
+        del bank
+
+        start = time.perf_counter()
+        bank = open_bank(data_dir, args.engine)
+        print(f"{'reopen':<10} {time.perf_counter() - start:10.3f} s")
+        next_runs = {datetime.fromtimestamp(s.next_run).date() for s in bank.db.schedules.values()}
+        balances = sum(account.balance for _, account in bank.db.accounts.items())
+        print(f"Next run(s): {', '.join(map(str, sorted(next_runs)))}")
+        print("✅ Total money conserved." if balances == total else f"❌ Total money changed: {balances} != {total}")
+        bank.db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Snapshot save/load time and size: pretty-printed JSON versus the binary format.
+
+Builds N synthetic clients (one user and one account each, with a short
+history including encrypted descriptions), then saves and reloads them
+through JSONStorage in both snapshot formats.
+
+Usage:
+    python benchmarks/snapshot_formats.py [--sizes 10000,100000,1000000] [--transactions 2] [--formats json,binary]
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "banking_system"))
+
+from models import Account, Ledger, User  # noqa: E402
+from storage import JSONStorage, SNAPSHOT_FORMATS  # noqa: E402
+
+DESCRIPTIONS = ["Salary", "Rent", "Groceries", "Deposit - cash", "Withdrawal - ATM", "Transfer", "Utilities"]
+
+def synthetic_bank(size: int, transactions: int):
+    """Returns (users, accounts) dicts shaped like real data."""
+    rng = random.Random(42)
+    users, accounts = {}, {}
+    start = 1_600_000_000.0
+    for i in range(size):
+        username = f"client{i:07d}"
+        account_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        users[username] = User(username=username, password_hash=rng.randbytes(44), salt=rng.randbytes(16),
+                               role="client", account_id=account_id)
+        ledger = Ledger.from_columns(
+            array("d", sorted(start + rng.random() * 1e8 for _ in range(transactions))),
+            array("q", (rng.randint(100, 200_000) for _ in range(transactions))),
+            array("b", (rng.randint(0, 1) for _ in range(transactions))),
+            array("b", bytes(transactions)),
+            [rng.choice(DESCRIPTIONS) for _ in range(transactions)],
+            [103] * transactions,  # Size of a key-ID-prefixed Fernet token of a short description
+            rng.randbytes(103 * transactions)
+        )
+        accounts[account_id] = Account(account_id=account_id, owner_username=username,
+                                       balance=sum(ledger.amounts), transactions=ledger)
+    return users, accounts
+
+def measure(data_dir: str, snapshot_format: str, users: dict, accounts: dict) -> dict:
+    storage = JSONStorage(data_dir, snapshot_format=snapshot_format)
+    storage.import_data(users.values(), accounts.values())
+
+    start = time.perf_counter()
+    storage.save_snapshot()
+    save_time = time.perf_counter() - start
+    size = os.path.getsize(storage.users_file) + os.path.getsize(storage.accounts_file)
+
+    del storage
+    gc.collect()
+    reloaded = JSONStorage(data_dir, snapshot_format=snapshot_format)
+    start = time.perf_counter()
+    reloaded.load()
+    load_time = time.perf_counter() - start
+    assert len(reloaded.accounts) == len(accounts)
+    return {"save": save_time, "load": load_time, "size": size}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated account counts")
+    parser.add_argument("--transactions", type=int, default=2, help="Transactions per account")
+    parser.add_argument("--formats", default=",".join(SNAPSHOT_FORMATS))
+    args = parser.parse_args()
+    formats = args.formats.split(",")
+
+    print(f"{'accounts':>9} {'format':>7} {'save s':>8} {'load s':>8} {'size MiB':>9}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        users, accounts = synthetic_bank(size, args.transactions)
+        results = {}
+        for snapshot_format in formats:
+            with tempfile.TemporaryDirectory() as data_dir:
+                results[snapshot_format] = result = measure(data_dir, snapshot_format, users, accounts)
+            print(f"{size:>9} {snapshot_format:>7} {result['save']:8.2f} {result['load']:8.2f} "
+                  f"{result['size'] / 2**20:9.1f}", flush=True)
+        if "json" in results and "binary" in results:
+            json_result, binary_result = results["json"], results["binary"]
+            print(f"{'':>9} {'ratio':>7} {json_result['save'] / binary_result['save']:7.1f}x "
+                  f"{json_result['load'] / binary_result['load']:7.1f}x "
+                  f"{json_result['size'] / binary_result['size']:8.1f}x")
+        del users, accounts
+        gc.collect()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Startup time and memory: the binary snapshot engine versus lazily loaded shards.
+
+Builds N synthetic clients, stores them with JSONStorage (binary
+snapshots) and with ShardedStorage, then measures for each how long it
+takes to open the bank and serve a few logins, and how much memory that
+allocated (tracemalloc peak; tracing also slows down the eager load).
+
+Usage:
+    python benchmarks/startup_memory.py [--sizes 10000,100000] [--lookups 100]
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "banking_system"))
+
+from sharded_storage import ShardedStorage  # noqa: E402
+from snapshot_formats import synthetic_bank  # noqa: E402
+from storage import JSONStorage  # noqa: E402
+
+def open_engine(engine: str, data_dir: str):
+    if engine == "sharded":
+        return ShardedStorage(data_dir)
+    return JSONStorage(data_dir, journal=True, snapshot_format="binary")
+
+def measure(engine: str, data_dir: str, usernames: list, lookups: int) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    storage = open_engine(engine, data_dir)
+    storage.load()
+    startup = time.perf_counter() - start
+    for username in random.Random(7).sample(usernames, lookups):
+        storage.accounts[storage.users[username].account_id].balance  # What a login and balance check touch
+    total = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"startup": startup, "first_requests": total - startup, "peak": peak}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000", help="Comma-separated account counts")
+    parser.add_argument("--lookups", type=int, default=100, help="Users looked up after startup")
+    args = parser.parse_args()
+
+    print(f"{'accounts':>9} {'engine':>8} {'startup s':>10} {'lookups s':>10} {'peak MiB':>9}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        users, accounts = synthetic_bank(size, 2)
+        with tempfile.TemporaryDirectory() as data_dir:
+            snapshot = JSONStorage(data_dir, journal=True, snapshot_format="binary")
+            snapshot.import_data(users.values(), accounts.values())
+            sharded = ShardedStorage(data_dir)
+            sharded.load()
+            sharded.import_data(users.values(), accounts.values())
+            usernames = list(users)
+            del users, accounts, snapshot, sharded
+
+            for engine in ("binary", "sharded"):
+                result = measure(engine, data_dir, usernames, min(args.lookups, size))
+                print(f"{size:>9} {engine:>8} {result['startup']:10.3f} {result['first_requests']:10.3f} "
+                      f"{result['peak'] / 2**20:9.1f}", flush=True)
+
+if __name__ == "__main__":
+    main()
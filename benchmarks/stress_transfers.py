@@ -0,0 +1,99 @@
+"""Concurrency stress check: many threads transferring between a small set of accounts.
+
+Runs thousands of random transfers from a thread pool against one
+BankingSystem and verifies that no money is created or destroyed, both in
+memory and after reloading the data from storage.
+
+Usage:
+    python benchmarks/stress_transfers.py [--users 20] [--threads 16] [--transfers 5000] [--engine json]
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "banking_system"))
+
+from bank_system import BankingSystem  # noqa: E402
+from database import Database, ENGINES  # noqa: E402
+
+STARTING_BALANCE = 100_000  # Cents
+
+def check_ledgers(accounts) -> bool:
+    """Every balance must equal its credits minus its debits."""
+    ok = True
+    for account in accounts:
+        credits = sum(tx["amount_cents"] for tx in account.transactions if tx["type"] == "credit")
+        debits = sum(tx["amount_cents"] for tx in account.transactions if tx["type"] == "debit")
+        if credits - debits != account.balance:
+            print(f"❌ Ledger mismatch for {account.owner_username}: {credits - debits} != {account.balance}")
+            ok = False
+    return ok
+
+def run(users: int, threads: int, transfers: int, engine: str, data_dir: str) -> bool:
+    options = {"journal": True} if engine == "json" else {}
+    if engine == "sharded":
+        options = {"cache_size": max(1, users // 4), "checkpoint_every": 200}  # Exercise eviction and checkpoints
+    bank = BankingSystem(Database(data_dir, engine=engine, flush_interval=0.01, **options))
+
+    names = [f"user{i}" for i in range(users)]
+    for name in names:
+        bank.register_user(name, "password")
+    bank.register_user("teller", "password", "employee")
+
+    teller = bank.login("teller", "password")
+    for name in names:
+        bank.process_transaction(teller, name, STARTING_BALANCE, "deposit", "opening balance")
+    sessions = [bank.login(name, "password") for name in names]
+    expected_total = STARTING_BALANCE * users
+
+    def worker(seed: int) -> int:
+        rng = random.Random(seed)
+        session = rng.choice(sessions)
+        recipient = rng.choice(names)
+        return int(bank.transfer_money(session, recipient, rng.randint(1, 20_000), "stress"))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        succeeded = sum(pool.map(worker, range(transfers)))
+    elapsed = time.perf_counter() - start
+    print(f"{succeeded}/{transfers} transfers succeeded in {elapsed:.2f}s "
+          f"({transfers / elapsed:.0f} transfers/s, {threads} threads, {engine})")
+
+    ok = True
+    live_total = sum(bank.db.accounts[bank.db.users[name].account_id].balance for name in names)
+    if live_total != expected_total:
+        print(f"❌ In-memory total is {live_total}, expected {expected_total}")
+        ok = False
+    ok &= check_ledgers(bank.db.accounts[bank.db.users[name].account_id] for name in names)
+    bank.db.close()
+
+    reloaded = Database(data_dir, engine=engine, **options)
+    stored_total = sum(reloaded.accounts[reloaded.users[name].account_id].balance for name in names)
+    if stored_total != expected_total:
+        print(f"❌ Stored total is {stored_total}, expected {expected_total}")
+        ok = False
+    ok &= check_ledgers(reloaded.accounts[reloaded.users[name].account_id] for name in names)
+    reloaded.close()
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--transfers", type=int, default=5000)
+    parser.add_argument("--engine", default="json", choices=list(ENGINES))
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as data_dir:
+        ok = run(args.users, args.threads, args.transfers, args.engine, data_dir)
+    print("✅ Total money conserved." if ok else "❌ Consistency check failed.")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""Benchmark suite: timed scenarios against a synthetic population, with JSON results.
+
+Generates a population with workload.py, stores it with the chosen engine
+and times the main operations: Database.load_data (opening the bank),
+save_data, register_user, login, transfer_money, process_transaction,
+list_users (first page; the first call builds the user indexes) and
+list_users_prefix (a page of clients by username prefix). Users and
+counterparties are drawn with the population's Zipf skew. Results are
+printed as a table and can be written as JSON to compare runs across
+commits.
+
+With --baseline, each scenario's median latency is compared with the
+baseline file's, and the run fails (exit status 1) if any scenario got
+slower by more than --max-regression percent.
+
+Usage:
+    python benchmarks/suite.py [--users 10000] [--accounts 9000] [--transactions 100000] [--engine json]
+        [--ops 1000] [--output results.json] [--baseline baseline.json] [--max-regression 20]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "banking_system"))
+
+from bank_system import BankingSystem  # noqa: E402
+from database import Database, ENGINES  # noqa: E402
+from workload import PASSWORD, ZipfPicker, generate_population, write_population  # noqa: E402
+
+def engine_options(engine: str) -> dict:
+    return {"journal": True} if engine == "json" else {}
+
+def summarize(latencies: List[float]) -> dict:
+    """Throughput and latency percentiles (milliseconds) of one scenario."""
+    ordered = sorted(latencies)
+    total = sum(ordered)
+
+    def percentile(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+
+    return {
+        "ops": len(ordered),
+        "seconds": round(total, 6),
+        "ops_per_s": round(len(ordered) / total, 1) if total else None,
+        "mean_ms": round(total / len(ordered) * 1000, 4),
+        "median_ms": round(percentile(50), 4),
+        "p95_ms": round(percentile(95), 4),
+        "max_ms": round(ordered[-1] * 1000, 4)
+    }
+
+def timed(operation: Callable[[int], object], count: int) -> dict:
+    """Calls operation(i) for i in range(count), timing each call."""
+    latencies = []
+    for i in range(count):
+        start = time.perf_counter()
+        operation(i)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+def run_scenarios(data_dir: str, engine: str, usernames: List[str], skew: float, ops: int,
+                  slow_ops: int, repeats: int) -> Dict[str, dict]:
+    rng = random.Random(7)
+    picker = ZipfPicker(len(usernames), skew, rng)
+    clients = [usernames[picker.pick()] for _ in range(ops)]
+    counterparties = [usernames[picker.pick()] for _ in range(ops)]
+    results: Dict[str, dict] = {}
+
+    def open_and_close(_):
+        Database(data_dir, engine=engine, **engine_options(engine)).close()
+
+    results["load_data"] = timed(open_and_close, repeats)
+
+    bank = BankingSystem(Database(data_dir, engine=engine, **engine_options(engine)))
+    try:
+        results["save_data"] = timed(lambda _: bank.db.save_data(), repeats)
+        results["register_user"] = timed(lambda i: bank.register_user(f"bench{i:07d}", PASSWORD), slow_ops)
+        results["login"] = timed(lambda i: bank.login(clients[i], PASSWORD), slow_ops)
+
+        # Sessions are issued directly so setup does not pay PBKDF2 per client
+        sessions = {name: bank.sessions.issue(bank.db.users[name]) for name in set(clients)}
+        results["transfer_money"] = timed(
+            lambda i: bank.transfer_money(sessions[clients[i]], counterparties[i], rng.randint(1, 500), "bench"),
+            ops)
+
+        bank.register_user("bench_teller", PASSWORD, "employee")
+        teller = bank.sessions.issue(bank.db.users["bench_teller"])
+        results["process_transaction"] = timed(
+            lambda i: bank.process_transaction(teller, clients[i], rng.randint(100, 10_000), "deposit", "bench"),
+            ops)
+
+        admin = bank.sessions.issue(bank.db.users["admin"])
+        results["list_users"] = timed(lambda _: bank.list_users(admin), repeats)
+        prefixes = [name[:10] for name in clients]  # "client0001": up to 1000 matches each
+        results["list_users_prefix"] = timed(lambda i: bank.list_users(admin, "client", prefix=prefixes[i]), ops)
+    finally:
+        bank.db.close()
+    return results
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], max_regression: float) -> List[str]:
+    """Scenarios whose median latency grew by more than max_regression percent."""
+    failures = []
+    print(f"\n{'scenario':<20} {'baseline ms':>12} {'now ms':>10} {'change':>8}")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:<20} {'-':>12} {result['median_ms']:10.3f} {'new':>8}")
+            continue
+        change = (result["median_ms"] - before["median_ms"]) / before["median_ms"] * 100
+        flag = ""
+        if change > max_regression:
+            failures.append(name)
+            flag = "  ❌"
+        print(f"{name:<20} {before['median_ms']:12.3f} {result['median_ms']:10.3f} {change:+7.1f}%{flag}")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--accounts", type=int, default=9_000)
+    parser.add_argument("--transactions", type=int, default=100_000, help="Ledger entries in total")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of account activity")
+    parser.add_argument("--engine", default="json", choices=list(ENGINES))
+    parser.add_argument("--ops", type=int, default=1000, help="Calls per transfer/transaction scenario")
+    parser.add_argument("--slow-ops", type=int, default=20, help="Calls per PBKDF2-bound scenario "
+                                                                  "(register_user, login)")
+    parser.add_argument("--repeats", type=int, default=3, help="Calls per whole-bank scenario "
+                                                               "(load_data, save_data, list_users)")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="Results JSON of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=20.0,
+                        help="Allowed median latency increase per scenario, in percent")
+    args = parser.parse_args()
+    if args.users <= args.accounts:
+        parser.error("--users must exceed --accounts; the extra users are staff, including the admin")
+
+    users, accounts = generate_population(args.users, args.accounts, args.transactions, args.skew)
+    usernames = [account.owner_username for account in accounts.values()]
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as data_dir:
+        write_population(data_dir, args.engine, users, accounts, **engine_options(args.engine))
+        del users, accounts
+        results = run_scenarios(data_dir, args.engine, usernames, args.skew, args.ops, args.slow_ops, args.repeats)
+
+    print(f"{'scenario':<20} {'ops':>6} {'ops/s':>10} {'median ms':>10} {'p95 ms':>10} {'max ms':>10}")
+    for name, result in results.items():
+        print(f"{name:<20} {result['ops']:>6} {result['ops_per_s'] or 0:>10.1f} {result['median_ms']:>10.3f} "
+              f"{result['p95_ms']:>10.3f} {result['max_ms']:>10.3f}")
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "engine": args.engine,
+            "population": {"users": args.users, "accounts": args.accounts, "transactions": args.transactions,
+                           "skew": args.skew}
+        },
+        "scenarios": results
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"\nResults written to '{args.output}'.")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("population") != report["meta"]["population"] or \
+                baseline["meta"].get("engine") != args.engine:
+            print("❌ Warning: the baseline was measured with a different population or engine.")
+        failures = compare(results, baseline["scenarios"], args.max_regression)
+        if failures:
+            print(f"❌ Slower than the baseline by more than {args.max_regression:g}%: {', '.join(failures)}")
+            sys.exit(1)
+        print(f"✅ No scenario is more than {args.max_regression:g}% slower than the baseline.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Cost of velocity limits: transfer throughput with the rules off and on.
+
+Three measurements:
+
+    transfers  random transfer_money calls between registered clients, once
+               without rules and once with sender and recipient rules per hour
+               and per day (caps high enough that few transfers are refused)
+    check      VelocityLimits.check + record alone, over many accounts
+    rebuild    refilling the windows at startup from synthetic ledgers whose
+               entries are spread over the last two days
+
+Usage:
+    python benchmarks/velocity_limits.py [--users 50] [--transfers 20000] [--accounts 100000] [--engine json]
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "banking_system"))
+
+from bank_system import BankingSystem  # noqa: E402
+from database import Database, ENGINES  # noqa: E402
+from models import Account, KIND_CODES, Ledger  # noqa: E402
+from velocity import VelocityLimits, VelocityRule  # noqa: E402
+
+RULES = ["sender:3600:1000:100000", "sender:86400:5000:1000000",
+         "recipient:3600:2000:200000", "recipient:86400:10000:2000000"]
+
+def transfer_throughput(users: int, transfers: int, engine: str, rules: list) -> tuple:
+    """(transfers/s, transfers refused) for one run on a fresh bank."""
+    with tempfile.TemporaryDirectory() as data_dir:
+        options = {"journal": True} if engine == "json" else {}
+        bank = BankingSystem(Database(data_dir, engine=engine, flush_interval=0.01, **options),
+                             velocity_rules=[VelocityRule.parse(rule) for rule in rules])
+        names = [f"user{i}" for i in range(users)]
+        for name in names:
+            bank.register_user(name, "password")
+        bank.register_user("teller", "password", "employee")
+        teller = bank.login("teller", "password")
+        for name in names:
+            bank.process_transaction(teller, name, 10_000_000, "deposit", "opening balance")
+        sessions = [bank.login(name, "password") for name in names]
+
+        rng = random.Random(1)
+        plan = [(rng.choice(sessions), rng.choice(names), rng.randint(1, 2_000)) for _ in range(transfers)]
+        start = time.perf_counter()
+        made = sum(bank.transfer_money(session, recipient, amount, "velocity") for session, recipient, amount in plan)
+        elapsed = time.perf_counter() - start
+        bank.db.close()
+    return transfers / elapsed, transfers - made
+
+def check_cost(accounts: int, calls: int) -> float:
+    """Microseconds per check + record pair."""
+    limits = VelocityLimits(VelocityRule.parse(rule) for rule in RULES)
+    rng = random.Random(2)
+    ids = [f"acct{i}" for i in range(accounts)]
+    pairs = [(rng.choice(ids), ((rng.choice(ids), rng.randint(1, 2_000)),)) for _ in range(calls)]
+    now = time.time()
+    start = time.perf_counter()
+    for i, (sender, transfers) in enumerate(pairs):
+        moment = now + i * 0.001
+        if limits.check(sender, transfers, moment) is None:
+            limits.record(sender, transfers, moment)
+    return (time.perf_counter() - start) / calls * 1e6
+
+def rebuild_cost(accounts: int, entries: int) -> tuple:
+    """(seconds, entries read) to rebuild the windows from recent synthetic ledgers."""
+    rng = random.Random(3)
+    now = time.time()
+    transfer = KIND_CODES["transfer"]
+    bank = []
+    for i in range(accounts):
+        ledger = Ledger.from_columns(
+            array("d", sorted(float(int(now - rng.random() * 172_800)) for _ in range(entries))),
+            array("q", (rng.randint(1, 2_000) for _ in range(entries))),
+            array("b", (rng.randint(0, 1) for _ in range(entries))),
+            array("b", [transfer] * entries),
+            ["velocity"] * entries  # No encrypted descriptions
+        )
+        bank.append(Account(f"acct{i}", f"user{i}", 0, ledger))
+    limits = VelocityLimits(VelocityRule.parse(rule) for rule in RULES)
+    start = time.perf_counter()
+    read = limits.rebuild(bank, now)
+    return time.perf_counter() - start, read
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50, help="Registered clients transferring between them")
+    parser.add_argument("--transfers", type=int, default=20_000)
+    parser.add_argument("--accounts", type=int, default=100_000, help="Accounts for the check and rebuild runs")
+    parser.add_argument("--entries", type=int, default=20, help="Ledger entries per account for the rebuild")
+    parser.add_argument("--engine", default="json", choices=list(ENGINES))
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    for label, rules in (("rules off", []), (f"{len(RULES)} rules", RULES)):
+        rate, refused = transfer_throughput(args.users, args.transfers, args.engine, rules)
+        print(f"{label:<10} {rate:10.0f} transfers/s  ({1e6 / rate:.1f} µs each, {refused} refused)", flush=True)
+    print(f"{'check':<10} {check_cost(args.accounts, 200_000):10.2f} µs per check + record "
+          f"({len(RULES)} rules, {args.accounts} accounts)", flush=True)
+    seconds, read = rebuild_cost(args.accounts, args.entries)
+    print(f"{'rebuild':<10} {seconds:10.3f} s   ({read} recent entries, {args.accounts} accounts)")
+
+if __name__ == "__main__":
+    main()
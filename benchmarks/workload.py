@@ -0,0 +1,152 @@
+"""Synthetic bank populations for benchmarks.
+
+generate_population() builds N users, M of them clients with an account,
+and a transaction history with a realistic skew: activity follows a Zipf
+distribution, so a few accounts are very busy and most are quiet, and
+busy accounts are also the most common counterparties. Every account
+opens with a deposit and transfers never overdraw, so the result passes
+reconcile.py. All users share one password, hashed once, so logins can be
+benchmarked without paying PBKDF2 for every generated user.
+
+Usage (writes a data directory that main.py, server.py or reconcile.py can open):
+    python benchmarks/workload.py --data-dir /tmp/bank [--users 10000] [--accounts 9000]
+        [--transactions 100000] [--skew 1.1] [--engine json]
+"""
+import argparse
+import os
+import random
+import sys
+import uuid
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "banking_system"))
+
+from crypto_utils import derive_password_hash  # noqa: E402
+from database import ENGINES  # noqa: E402
+from models import Account, Ledger, User  # noqa: E402
+
+PASSWORD = "password"  # Shared by every generated user
+DESCRIPTIONS = ["Salary", "Rent", "Groceries", "Transfer", "Utilities", "Dinner", "Refund", "Invoice"]
+START = 1_600_000_000.0  # Epoch seconds of the first transaction
+SECONDS_PER_TRANSACTION = 37.0
+TOKEN_SIZE = 103  # Size of a key-ID-prefixed Fernet token of a short description
+
+
+class ZipfPicker:
+    """Draws indices 0..n-1 with probability proportional to 1 / (rank + 1) ** skew."""
+
+    def __init__(self, n: int, skew: float, rng: random.Random):
+        self.cumulative = list(accumulate(1.0 / (rank + 1) ** skew for rank in range(n)))
+        self.rng = rng
+        order = list(range(n))
+        rng.shuffle(order)  # Busy accounts are spread over the population, not the first IDs
+        self.order = order
+
+    def pick(self) -> int:
+        target = self.rng.random() * self.cumulative[-1]
+        return self.order[min(bisect_left(self.cumulative, target), len(self.order) - 1)]
+
+
+def generate_population(users: int, accounts: int, transactions: int, skew: float = 1.1,
+                        seed: int = 42) -> Tuple[Dict[str, User], Dict[str, Account]]:
+    """Returns (users by username, accounts by ID).
+
+    The first `accounts` users are clients with an account; the rest are
+    employees, plus one admin. `transactions` counts ledger entries, so a
+    transfer (one debit, one credit) counts twice.
+    """
+    if accounts > users:
+        raise ValueError("Every account needs its own user")
+    rng = random.Random(seed)
+    salt = rng.randbytes(16)
+    password_hash = derive_password_hash(PASSWORD, salt)
+
+    user_map: Dict[str, User] = {}
+    account_ids: List[str] = []
+    for i in range(users):
+        if i < accounts:
+            username = f"client{i:07d}"
+            account_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+            account_ids.append(account_id)
+            user_map[username] = User(username, password_hash, salt, "client", account_id)
+        else:
+            username = "admin" if i == users - 1 else f"employee{i:07d}"
+            user_map[username] = User(username, password_hash, salt, "admin" if i == users - 1 else "employee")
+
+    # Columns per account, filled in time order
+    columns = [([], [], [], [], []) for _ in account_ids]  # timestamps, amounts, types, kinds, descriptions
+    balances = [0] * len(account_ids)
+    clock = START
+
+    def post(index: int, amount: int, type_code: int, kind_code: int, description: str):
+        timestamps, amounts, types, kinds, descriptions = columns[index]
+        timestamps.append(clock)
+        amounts.append(amount)
+        types.append(type_code)
+        kinds.append(kind_code)
+        descriptions.append(description)
+        balances[index] += amount if type_code == 0 else -amount
+
+    # Opening deposits, then skewed transfers that never overdraw
+    for index in range(len(account_ids)):
+        post(index, rng.randint(10_000, 1_000_000), 0, 1, "Deposit - opening balance")
+        clock += SECONDS_PER_TRANSACTION
+    if len(account_ids) > 1:
+        picker = ZipfPicker(len(account_ids), skew, rng)
+        for _ in range(max(0, transactions - len(account_ids)) // 2):
+            sender, recipient = picker.pick(), picker.pick()
+            if sender == recipient or balances[sender] < 100:
+                continue
+            amount = rng.randint(100, min(balances[sender], 200_000))
+            description = rng.choice(DESCRIPTIONS)
+            post(sender, amount, 1, 0, description)
+            post(recipient, amount, 0, 0, description)
+            clock += SECONDS_PER_TRANSACTION
+
+    account_map: Dict[str, Account] = {}
+    for index, (account_id, (timestamps, amounts, types, kinds, descriptions)) in enumerate(
+            zip(account_ids, columns)):
+        count = len(amounts)
+        ledger = Ledger.from_columns(array("d", timestamps), array("q", amounts), array("b", types),
+                                     array("b", kinds), [sys.intern(d) for d in descriptions],
+                                     [TOKEN_SIZE] * count, rng.randbytes(TOKEN_SIZE * count))
+        account_map[account_id] = Account(account_id=account_id, owner_username=f"client{index:07d}",
+                                          balance=balances[index], transactions=ledger)
+    return user_map, account_map
+
+
+def write_population(data_dir: str, engine: str, users: Dict[str, User], accounts: Dict[str, Account],
+                     **options):
+    """Stores a generated population with the given storage engine."""
+    storage = ENGINES[engine](data_dir, **options)
+    storage.load()
+    try:
+        storage.import_data(users.values(), accounts.values())
+    finally:
+        storage.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic bank population.")
+    parser.add_argument("--data-dir", required=True)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--accounts", type=int, default=9_000)
+    parser.add_argument("--transactions", type=int, default=100_000, help="Ledger entries in total")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of account activity")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--engine", default="json", choices=list(ENGINES))
+    args = parser.parse_args()
+
+    users, accounts = generate_population(args.users, args.accounts, args.transactions, args.skew, args.seed)
+    os.makedirs(args.data_dir, exist_ok=True)
+    write_population(args.data_dir, args.engine, users, accounts)
+    entries = sum(len(account.transactions) for account in accounts.values())
+    print(f"✅ Wrote {len(users)} users, {len(accounts)} accounts and {entries} transactions "
+          f"to '{args.data_dir}' ({args.engine}). Every password is '{PASSWORD}'.")
+
+
+if __name__ == "__main__":
+    main()